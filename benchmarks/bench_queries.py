@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+#
+#  bench_queries.py
+#
+#  Time the four query functions, write_csv_output and dTdz_2D_cross_section on synthetic models in each
+#  source layout (see synthetic_models.py) and grid size, fully offline. For each model, size and engine the
+#  stages are: opening the model (init_ctm), each query on a cold registry (model opened by the query) and
+#  warm (model already loaded), writing its CSV output, and the gradients of the cross-section.
+#  Results are written as JSON ({"meta": {...}, "results": [{model, size, engine, stage, seconds, ...}]})
+#  and can be compared with an earlier run.
+#  Example:
+#  python benchmarks/bench_queries.py --sizes small,medium --output bench_results.json
+#  python benchmarks/bench_queries.py --sizes small,medium --compare bench_results.json
+#
+
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from pyctm import init_ctm, default_registry, write_csv_output, dTdz_2D_cross_section
+from pyctm import query_0D_point, query_1D_vertical_profile, query_2D_vertical_cross_section, query_2D_horizontal_slice
+from pyctm.query_2d_horizontal_slice import write_slice_csv
+from synthetic_models import LAYOUTS, GRID_SIZES, write_synthetic_model
+
+### Import Packages
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# query parameters, inside the synthetic model domain
+POINT = dict(lat = 40, lon = -115, dep = 10000)
+PROFILE = dict(lat = 40, lon = -115, z_start = 0, z_end = 20000, z_step = 1000)
+SECTION = dict(lat_start = 40, lon_start = -115, lat_end = 42, lon_end = -113, z_start = 0, z_end = 20000)
+SLICE = dict(lat_start = 40, lon_start = -115, lat_end = 42, lon_end = -113, z_slice = 10000)
+
+## Best wall time of repeated calls
+#  - inputs: function, number of calls, setup function called before each call (not timed)
+#  - returns: minimum time (s), and the result of the last call
+def best_time(func, repeat = 3, setup = None):
+    best = np.inf
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+## Write the CSV output of a profile or cross-section as its call_func does
+#  - inputs: query DataFrame, query type, model name, output directory
+#  - returns: None
+def write_query_csv(df, qtype, modelname, outdir):
+    if qtype == '1D_vertical':
+        df = df.drop(columns = ['longitude[°]', 'latitude[°]'])
+        df = df.rename(columns = {'depth[m]': '# Depth(m)', 'temperature[°C]': 'Temperature(°C)'})
+        write_csv_output(df, os.path.join(outdir, 'matprops_final.csv'), qtype, modelname,
+                         dummy_outfile = os.path.join(outdir, 'matprops.csv'), longitude = PROFILE['lon'], latitude = PROFILE['lat'])
+    else:
+        write_csv_output(section_columns(df), os.path.join(outdir, 'xs_data_final.csv'), qtype, modelname,
+                         dummy_outfile = os.path.join(outdir, 'xs_data.csv'))
+
+## Cross-section columns as written by call_func (and read by dTdz_2D_cross_section)
+def section_columns(df):
+    return df.rename(columns = {'longitude[°]': '# Lon', 'latitude[°]': 'Lat',
+                                'depth[m]': 'Depth(m)', 'temperature[°C]': 'Temperature(°C)'})
+
+## Time all stages on one model file
+#  - inputs: model name, model path, engine, number of repeats, output directory for the CSV files
+#  - returns: dictionary of {stage: seconds}
+def bench_model(modelname, modelpath, engine, repeat, outdir):
+
+    stages = {}
+    stages['open'], _ = best_time(lambda: init_ctm(modelname, modelpath), repeat)
+
+    queries = {'query_0D_point': lambda: query_0D_point(POINT['lat'], POINT['lon'], POINT['dep'], modelname, modelpath, engine = engine),
+               'query_1D_vertical_profile': lambda: query_1D_vertical_profile(*PROFILE.values(), modelname, modelpath, engine = engine),
+               'query_2D_vertical_cross_section': lambda: query_2D_vertical_cross_section(*SECTION.values(), modelname, modelpath, engine = engine),
+               'query_2D_horizontal_slice': lambda: query_2D_horizontal_slice(*SLICE.values(), modelname, modelpath, engine = engine)}
+
+    results = {}
+    for name, func in queries.items():
+        stages[name + '.cold'], _ = best_time(func, repeat, setup = default_registry.clear)
+        stages[name + '.warm'], results[name] = best_time(func, repeat)
+
+    stages['write_csv_output.1D_vertical'], _ = best_time(
+        lambda: write_query_csv(results['query_1D_vertical_profile'], '1D_vertical', modelname, outdir), repeat)
+    stages['write_csv_output.2D_vertical'], _ = best_time(
+        lambda: write_query_csv(results['query_2D_vertical_cross_section'], '2D_vertical', modelname, outdir), repeat)
+    stages['write_csv_output.2D_horizontal'], _ = best_time(
+        lambda: write_slice_csv(results['query_2D_horizontal_slice'], os.path.join(outdir, 'hs_data.csv'), modelname, SLICE['z_slice']), repeat)
+
+    section = section_columns(results['query_2D_vertical_cross_section'])
+    stages['dTdz_2D_cross_section'], _ = best_time(lambda: dTdz_2D_cross_section(section), repeat)
+    stages['dTdz_2D_cross_section.field'], _ = best_time(lambda: dTdz_2D_cross_section(section, field = True), repeat)
+
+    default_registry.clear()
+    return stages
+
+## Description of the environment, stored with the results
+#  - returns: dictionary
+def bench_meta(args):
+    try:
+        commit = subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'], capture_output = True,
+                                text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'xarray': xr.__version__,
+            'machine': platform.machine(),
+            'repeat': args.repeat}
+
+## Print the change of each stage against an earlier run
+#  - inputs: current results, earlier results, ratio above which a stage is flagged
+#  - returns: number of flagged stages
+def compare_results(results, baseline, threshold = 1.2):
+
+    key = lambda r: (r['model'], r['size'], r['engine'], r['stage'])
+    base = {key(r): r['seconds'] for r in baseline}
+    nslow = 0
+    for rec in results:
+        if key(rec) not in base:
+            continue
+        ratio = rec['seconds'] / base[key(rec)]
+        flag = ' SLOWER' if ratio > threshold else ''
+        nslow += bool(flag)
+        print("{:<14s} {:<7s} {:<7s} {:<40s} {:9.4f} s -> {:9.4f} s {:6.2f}x{:}".format(
+            *key(rec), base[key(rec)], rec['seconds'], ratio, flag))
+    return nslow
+
+# Make a function to allow batch mode
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser(description = 'Benchmark the query pipeline on synthetic models')
+    par.add_argument('--sizes', type = str, default = 'small,medium')  # Add argument of comma-separated grid sizes: small, medium, large
+    par.add_argument('--models', type = str, default = ','.join(LAYOUTS))  # Add argument of comma-separated model layouts
+    par.add_argument('--engines', type = str, default = 'xarray,fast') # Add argument of comma-separated interpolation engines
+    par.add_argument('--repeat', type = int, default = 3)              # Add argument of number of timed calls per stage (best is kept)
+    par.add_argument('--output', type = str, required = False)         # Add argument of JSON output path
+    par.add_argument('--compare', type = str, required = False)        # Add argument of JSON results of an earlier run to compare with
+    par.add_argument('--threshold', type = float, default = 1.2)       # Add argument of slowdown ratio flagged by --compare
+    args = par.parse_args(argv)                                        # Extract arguments
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes.split(','):
+            grid = GRID_SIZES[size]
+            for modelname in args.models.split(','):
+                modelpath = write_synthetic_model(modelname, os.path.join(tmp, '{:}_{:}.nc'.format(modelname, size)), *grid)
+                for engine in args.engines.split(','):
+                    stages = bench_model(modelname, modelpath, engine, args.repeat, tmp)
+                    for stage, seconds in stages.items():
+                        results.append({'model': modelname, 'size': size, 'grid': list(grid), 'engine': engine,
+                                        'stage': stage, 'seconds': seconds})
+                        print("{:<14s} {:<7s} {:<7s} {:<40s} {:9.4f} s".format(modelname, size, engine, stage, seconds))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': bench_meta(args), 'results': results}, f, indent = 1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nCompared with {:} ({:})".format(args.compare, baseline['meta'].get('commit')))
+        compare_results(results, baseline['results'], args.threshold)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    call_func()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+#  bench_write_csv_output.py
+#
+#  Compare the streaming write_csv_output with the previous writer (to_csv, then readlines() and rewrite
+#  with the header, once for the plain file and once more with dummy columns) on a synthetic horizontal slice.
+#  Example:
+#  python benchmarks/bench_write_csv_output.py --nrows 1000000
+#
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pyctm.write_csv_output import write_csv_output, get_csv_header
+
+### Import Packages
+import argparse
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+## Previous writer, kept here for comparison
+def write_csv_output_rewrite(df, outfile, qtype, modelname, **kwargs):
+    df.to_csv(outfile, index = None, float_format = "%.6f", na_rep = np.nan)
+    qtext = get_csv_header(df, qtype, modelname, **kwargs)
+    with open(outfile, "r") as f:
+        lines = f.readlines()
+    with open(outfile, "w") as f:
+        f.write(qtext)
+        f.writelines(lines)
+
+## Previous call_func sequence: plain file, add dummy columns, dummy file
+def write_previous(df, final_outpath, outpath):
+    df = df.copy()
+    write_csv_output_rewrite(df, final_outpath, '2D_horizontal', 'Lee_2026', z = 10000.0)
+    df[['dummy1', 'dummy2']] = np.nan
+    write_csv_output_rewrite(df, outpath, '2D_horizontal', 'Lee_2026', z = 10000.0)
+
+## Streaming writer, both files in one pass
+def write_streaming(df, final_outpath, outpath):
+    write_csv_output(df, final_outpath, '2D_horizontal', 'Lee_2026', dummy_outfile = outpath, z = 10000.0)
+
+## Synthetic horizontal slice with about nrows rows, in the call_func column layout
+def make_slice(nrows):
+    n = int(np.sqrt(nrows))
+    lon, lat = np.meshgrid(np.linspace(-125, -110, n), np.linspace(30, 45, n), indexing = 'ij')
+    temp = 250 + 20 * np.sin(lon) * np.cos(lat)
+    return pd.DataFrame({'# Lon': lon.ravel(), 'Lat': lat.ravel(), 'Temperature(°C)': temp.ravel()})
+
+## Wall time of one call, and peak traced memory of a second call (tracing slows the code down)
+def measure(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+# Make a function to allow batch mode
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser()
+    par.add_argument('--nrows', type = int, default = 1000000)        # Add argument of number of rows of the slice
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    df = make_slice(args.nrows)
+    with tempfile.TemporaryDirectory() as tmp:
+        final_outpath = os.path.join(tmp, 'slice_data_final.csv')
+        outpath = os.path.join(tmp, 'slice_data.csv')
+
+        results = {}
+        for name, func in (('previous', write_previous), ('streaming', write_streaming)):
+            results[name] = measure(func, df, final_outpath, outpath)
+
+    print("{:,} rows".format(len(df)))
+    for name, (elapsed, peak) in results.items():
+        print("{:<10s} {:8.2f} s {:10.1f} MB peak".format(name, elapsed, peak / 1e6))
+    print("speedup {:.2f}x, peak memory {:.2f}x lower".format(results['previous'][0] / results['streaming'][0],
+                                                             results['previous'][1] / results['streaming'][1]))
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    call_func()
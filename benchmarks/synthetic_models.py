@@ -0,0 +1,62 @@
+#
+#  synthetic_models.py
+#
+#  Synthetic thermal models in each source layout understood by init_ctm, for benchmarks and tests.
+#  The temperature field is smooth (linear in depth with lateral variations), so every query has
+#  well-defined values; the grids cover lon -125..-110, lat 30..45 and depth 0..60 km.
+#
+
+### Import Packages
+import numpy as np
+import xarray as xr
+
+# model names by layout
+LAYOUTS = ('Lee_2026', 'Shinevar_2018', 'Shinevar_2024', 'Boyd_2019', 'Suietal_2025')
+
+# grid sizes (longitude, latitude, depth) by name
+GRID_SIZES = {'small': (61, 61, 31),
+              'medium': (161, 161, 61),
+              'large': (321, 321, 121)}
+
+## Synthetic temperature field
+#  - inputs: longitudes (°), latitudes (°), depths (m)
+#  - returns: temperatures (°C) with shape (longitude, latitude, depth)
+def synthetic_temperature(lons, lats, deps):
+    lo, la, z = np.meshgrid(lons, lats, deps, indexing = 'ij')
+    return 15 + 0.025 * z * (1 + 0.05 * np.sin(np.radians(8 * lo))) + 2 * np.cos(np.radians(6 * la))
+
+## Write a synthetic model in the source layout of a model
+#  - inputs: model name (one of LAYOUTS), output NetCDF path, number of longitudes, latitudes and depths
+#  - returns: output path
+def write_synthetic_model(modelname, outpath, nlon = 61, nlat = 61, ndep = 31):
+
+    lons = np.linspace(-125, -110, nlon)
+    lats = np.linspace(30, 45, nlat)
+    deps = np.linspace(0, 60000, ndep)
+
+    # Boyd (2019) does not start at the surface
+    if modelname == 'Boyd_2019':
+        deps = deps + 500
+    temp = synthetic_temperature(lons, lats, deps)
+
+    if modelname == 'Lee_2026':
+        # depth in km, (depth, latitude, longitude)
+        xdata = xr.Dataset({'temperature_diffused': (('depth', 'latitude', 'longitude'), temp.transpose(2, 1, 0))},
+                           coords = {'longitude': lons, 'latitude': lats, 'depth': deps / 1000})
+    elif modelname in ('Shinevar_2018', 'Shinevar_2024'):
+        # depth in m, (longitude, latitude, depth)
+        xdata = xr.Dataset({'temperature': (('longitude', 'latitude', 'depth'), temp)},
+                           coords = {'longitude': lons, 'latitude': lats, 'depth': deps})
+    elif modelname == 'Boyd_2019':
+        # dimk/dimj/diml dimensions with capitalized variables, depth in m, (depth, latitude, longitude)
+        xdata = xr.Dataset({'Temperature': (('diml', 'dimj', 'dimk'), temp.transpose(2, 1, 0)),
+                            'Longitude': ('dimk', lons), 'Latitude': ('dimj', lats), 'Depth': ('diml', deps)})
+    elif modelname == 'Suietal_2025':
+        # dimk/dimj/diml dimensions with capitalized variables, depth in km, (longitude, latitude, depth)
+        xdata = xr.Dataset({'Temperature': (('dimk', 'dimj', 'diml'), temp),
+                            'Longitude': ('dimk', lons), 'Latitude': ('dimj', lats), 'Depth': ('diml', deps / 1000)})
+    else:
+        raise ValueError('Undefined model name', modelname)
+
+    xdata.to_netcdf(outpath)
+    return outpath
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+#
+#  ctm_batch.py
+#
+#  Command line script for batch runs; the code is in pyctm.ctm_batch (also run by 'ctm batch').
+#
+
+import sys
+
+from pyctm.ctm_batch import *
+from pyctm.ctm_batch import call_func
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    sys.exit(call_func())
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+#
+#  ctm_client.py
+#
+#  Command line script for the query server client; the code is in pyctm.ctm_client (also run by 'ctm client').
+#
+
+from pyctm.ctm_client import *
+from pyctm.ctm_client import call_func
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    call_func()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+#
+#  ctm_serve.py
+#
+#  Command line script for the query server; the code is in pyctm.ctm_serve (also run by 'ctm serve').
+#
+
+from pyctm.ctm_serve import *
+from pyctm.ctm_serve import call_func
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    call_func()
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+#
+#  query_2d_map.py
+#
+#  Command line script for isotherm-depth and dT/dz maps; the code is in pyctm.query_2d_map (also run by 'ctm map').
+#
+
+from pyctm.query_2d_map import *
+from pyctm.query_2d_map import call_func
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
@@ -1,75 +1,165 @@
 ### Import Packages
+import json
+import numpy as np
 import xarray as xr
+from xarray.backends import BackendArray
+from xarray.coding.variables import lazy_elemwise_func
+from xarray.core import indexing
+
+from .profiling import profile_stage
+
+# value of the "ctm_format" attribute of models written by compile_ctm
+COMPILED_FORMAT = "pyctm-compiled-1"
+# file extensions of memory-mapped models (flat C-ordered array with a "<path>.json" sidecar)
+MEMMAP_SUFFIXES = (".npy", ".bin", ".raw")
+
+## lazily indexed view of a memory-mapped array, so that xarray (e.g. the sortby in Dataset.interp)
+## only reads the cells a query needs instead of copying the whole array
+class MemmapArray(BackendArray):
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+
+    # the array is read-only, so copies (e.g. by xarray's align) can share it
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.OUTER_1VECTOR, self.data.__getitem__)
+
+## open a memory-mapped model written by compile_ctm
+#  - inputs: path of the .npy or raw binary array (the axes, dtype and shape are read from "<path>.json")
+#  - returns: Xarray Dataset on the memory-mapped array; only the pages touched by a query are read from disk
+def open_memmap_ctm(modelpath):
+
+    with open(str(modelpath) + ".json") as f:
+        meta = json.load(f)
+    if meta.get("ctm_format") != COMPILED_FORMAT:
+        raise ValueError('Undefined model format', meta.get("ctm_format"))
+
+    shape = tuple(meta["shape"])
+    if str(modelpath).endswith(".npy"):
+        data = np.load(modelpath, mmap_mode = "r")
+    else:
+        data = np.memmap(modelpath, dtype = np.dtype(meta["dtype"]), mode = "r", shape = shape)
+    if data.shape != shape:
+        raise ValueError('Model array does not match its sidecar', modelpath)
+
+    coords = {name: (name, np.asarray(vals, dtype = float)) for name, vals in meta["axes"].items()}
+    attrs = {"ctm_format": COMPILED_FORMAT, "ctm_modelname": meta["modelname"], "ctm_source": meta["source"]}
+    data = indexing.LazilyIndexedArray(MemmapArray(data))
+    return xr.Dataset({meta["variable"]: (meta["dims"], data)}, coords = coords, attrs = attrs)
+
+## cast the data variables of a model to another floating-point type (e.g. float32 to halve the memory);
+## lazily loaded arrays stay lazy and are cast as their cells are read, so the full-precision array is never held
+#  - inputs: Xarray Dataset, data type (None to keep the types of the file)
+#  - returns: Xarray Dataset; the coordinates keep their type
+def cast_ctm(xdata, dtype = None):
+
+    if dtype is None:
+        return xdata
+    dtype = np.dtype(dtype)
+    for name, var in xdata.data_vars.items():
+        if var.dtype == dtype:
+            continue
+        data = var.variable._data
+        if isinstance(data, np.ndarray):
+            data = data.astype(dtype)
+        else:
+            # files opened by xarray cache what they read: cache the cast cells instead
+            cache = isinstance(data, indexing.MemoryCachedArray)
+            data = lazy_elemwise_func(data.array if cache else data, lambda a: np.asarray(a).astype(dtype), dtype)
+            data = indexing.MemoryCachedArray(data) if cache else data
+        xdata[name] = xr.Variable(var.dims, data, var.attrs, var.encoding)
+    return xdata
 
 ## initalize Xarray Dataset from netCDF file
 #  - inputs: model name (Lee_2025 or Shinevar_2018 or Boyd_2019 or Suietal_2025) and model path
+#    (source NetCDF, or a NetCDF/Zarr store or memory-mapped array written by compile_ctm), data type of the
+#    temperatures (e.g. 'float32'; default as in the file)
 #  - returns: Xarray Dataset corresponding to the model
-def init_ctm(modelname, modelpath):
+def init_ctm(modelname, modelpath, dtype = None):
     
     # open dataset
-    xdata = xr.open_dataset(modelpath)
-
-    if modelname == 'Lee_2026':
-        # configure: change unit to meters and rename all variables
-        xdata = xdata.assign_coords({"depth": xdata.depth * 1000})
-        xdata = xdata.rename_dims({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]"})
+    with profile_stage("open"):
+        if str(modelpath).endswith(MEMMAP_SUFFIXES):
+            return cast_ctm(open_memmap_ctm(modelpath), dtype)
+        elif str(modelpath).rstrip("/").endswith(".zarr"):
+            xdata = xr.open_dataset(modelpath, engine = "zarr")
+        else:
+            xdata = xr.open_dataset(modelpath)
+
+    # compiled models are already normalized; those of another format version must be compiled again
+    if xdata.attrs.get("ctm_format") == COMPILED_FORMAT:
+        return cast_ctm(xdata, dtype)
+    elif "ctm_format" in xdata.attrs:
+        raise ValueError('Undefined model format', xdata.attrs["ctm_format"])
+
+    # rename to the common coordinate and variable names
+    with profile_stage("normalize"):
+        if modelname == 'Lee_2026':
+            # configure: change unit to meters and rename all variables
+            xdata = xdata.assign_coords({"depth": xdata.depth * 1000})
+            xdata = xdata.rename_dims({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]"})
         
-        xdata = xdata.rename_vars({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]",
-                                   "temperature_diffused": "temperature[°C]"})
-
-    elif modelname == 'Shinevar_2018':
-        # configure: rename all variables
-        xdata = xdata.rename_dims({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]"})
+            xdata = xdata.rename_vars({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]",
+                                       "temperature_diffused": "temperature[°C]"})
+
+        elif modelname == 'Shinevar_2018':
+            # configure: rename all variables
+            xdata = xdata.rename_dims({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]"})
         
-        xdata = xdata.rename_vars({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]",
-                                   "temperature": "temperature[°C]"})
-
-    elif modelname == 'Shinevar_2024':
-        # configure: rename all variables
-        xdata = xdata.rename_dims({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]"})
+            xdata = xdata.rename_vars({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]",
+                                       "temperature": "temperature[°C]"})
+
+        elif modelname == 'Shinevar_2024':
+            # configure: rename all variables
+            xdata = xdata.rename_dims({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]"})
         
-        xdata = xdata.rename_vars({"longitude": "longitude[°]", 
-                                   "latitude": "latitude[°]",
-                                   "depth": "depth[m]",
-                                   "temperature": "temperature[°C]"})
-
-    elif modelname == 'Boyd_2019':
-        # configure: rename all variables
-        xdata = xdata.rename_dims({"dimk": "longitude[°]", 
-                                   "dimj": "latitude[°]",
-                                   "diml": "depth[m]"})
+            xdata = xdata.rename_vars({"longitude": "longitude[°]", 
+                                       "latitude": "latitude[°]",
+                                       "depth": "depth[m]",
+                                       "temperature": "temperature[°C]"})
+
+        elif modelname == 'Boyd_2019':
+            # configure: rename all variables
+            xdata = xdata.rename_dims({"dimk": "longitude[°]", 
+                                       "dimj": "latitude[°]",
+                                       "diml": "depth[m]"})
         
-        xdata = xdata.rename_vars({"Longitude": "longitude[°]", 
-                                   "Latitude": "latitude[°]",
-                                   "Depth": "depth[m]",
-                                   "Temperature": "temperature[°C]"})
+            xdata = xdata.rename_vars({"Longitude": "longitude[°]", 
+                                       "Latitude": "latitude[°]",
+                                       "Depth": "depth[m]",
+                                       "Temperature": "temperature[°C]"})
         
-        xdata = xdata.set_coords(['longitude[°]', 'latitude[°]', 'depth[m]'])
+            xdata = xdata.set_coords(['longitude[°]', 'latitude[°]', 'depth[m]'])
 
-    elif modelname == 'Suietal_2025':
-        # configure: rename all variables
-        xdata = xdata.rename_dims({'dimk': 'longitude[°]', 
-                                   'dimj': 'latitude[°]',
-                                   'diml': 'depth[m]'})
+        elif modelname == 'Suietal_2025':
+            # configure: rename all variables
+            xdata = xdata.rename_dims({'dimk': 'longitude[°]', 
+                                       'dimj': 'latitude[°]',
+                                       'diml': 'depth[m]'})
         
-        xdata = xdata.rename_vars({'Longitude': 'longitude[°]', 
-                                   'Latitude': 'latitude[°]',
-                                   'Depth': 'depth[m]',
-                                   'Temperature': 'temperature[°C]'})
+            xdata = xdata.rename_vars({'Longitude': 'longitude[°]', 
+                                       'Latitude': 'latitude[°]',
+                                       'Depth': 'depth[m]',
+                                       'Temperature': 'temperature[°C]'})
         
-        xdata = xdata.set_coords(['longitude[°]', 'latitude[°]', 'depth[m]'])
-        xdata = xdata.assign_coords({'depth[m]': xdata['depth[m]'] * 1000.0})
+            xdata = xdata.set_coords(['longitude[°]', 'latitude[°]', 'depth[m]'])
+            xdata = xdata.assign_coords({'depth[m]': xdata['depth[m]'] * 1000.0})
         
         
     # return
-    return xdata
+    return cast_ctm(xdata, dtype)
@@ -1,5 +1,29 @@
 ### Import package
-import xarray as xr
+import weakref
+import numpy as np
+
+from .profiling import profile_stage
+
+# coordinate extents of the models checked so far, by id of the Dataset
+# (an entry is dropped when its Dataset is garbage collected)
+_extents_cache = {}
+
+## get the extent of a model coordinate, computed once per loaded model
+#  - inputs: Xarray dataset (or GridInterpolator), coordinate ("longitude", "latitude", "depth")
+#  - returns: (min, max) of the coordinate
+def get_model_extent(xdata, coord):
+
+    key = id(xdata)
+    extents = _extents_cache.get(key)
+    if extents is None:
+        extents = _extents_cache[key] = {}
+        weakref.finalize(xdata, _extents_cache.pop, key, None)
+
+    if coord not in extents:
+        vals = np.asarray(xdata[coord])
+        extents[coord] = (vals.min(), vals.max())
+
+    return extents[coord]
 
 ## check if a query value is within model coordinates
 #  - inputs: Xarray dataset, value to test, coordinate to test ("longitude", "latitude", "depth")
@@ -8,9 +32,10 @@ def check_inbounds_value(xdata, value, coord):
 
     # first, make sure this is a valid coordinate
     if coord in xdata.coords:
-        
+
         # test for out of bounds value
-        if (value < xdata[coord].min()) or (value > xdata[coord].max()):
+        vmin, vmax = get_model_extent(xdata, coord)
+        if (value < vmin) or (value > vmax):
             result = False
             raise ValueError("Error {:}={:} is out of model domain".format(coord, value))
         else:
@@ -28,14 +53,33 @@ def check_inbounds_value(xdata, value, coord):
 #  - inputs: Xarray dataset, values to test as a dictionary of {coord: vals}
 #  - returns: test result (True or false)
 def check_inbounds_values(xdata, values):
-    
+
     # initialize
     result = False
 
-    # test all value / coordinate pairs
-    for coord, vals in values.items():
-        for val in vals:
-            result = check_inbounds_value(xdata, val, coord)
+    # test all values of each coordinate at once, and report the first one out of bounds
+    with profile_stage("bounds_check"):
+        for coord, vals in values.items():
+            vals = np.atleast_1d(np.asarray(vals, dtype = float))
+            if vals.size == 0:
+                continue
+            valid = check_inbounds_mask(xdata, {coord: vals})
+            result = check_inbounds_value(xdata, vals[np.argmin(valid)], coord)
 
     # return
     return result
+
+## vectorized bounds check of many query points
+#  - inputs: Xarray dataset, values to test as a dictionary of {coord: array}; the arrays are broadcast together
+#  - returns: boolean mask, True where every coordinate is within the model (NaN values are invalid)
+def check_inbounds_mask(xdata, values):
+
+    mask = True
+    for coord, vals in values.items():
+        if coord not in xdata.coords:
+            raise NameError("{:} not in model coordinates".format(coord))
+        vmin, vmax = get_model_extent(xdata, coord)
+        vals = np.asarray(vals, dtype = float)
+        mask = mask & (vals >= vmin) & (vals <= vmax)
+
+    return np.asarray(mask)
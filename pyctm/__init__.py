@@ -1,6 +1,57 @@
-from .Initiation import init_ctm
-from .Value_check import check_inbounds_values
-from .test_plot import test_plot
-from .calculate_geodesic_track import calculate_geodesic_track
-from .write_csv_output import write_csv_output
-from .dTdz_2D_cross_section import dTdz_2D_cross_section
+import importlib
+import sys
+import types
+
+# public names and the modules defining them; a module is only imported when one of its names is first used,
+# so "import pyctm" stays fast and e.g. matplotlib (test_plot) and pyproj are only loaded by queries needing them
+_exports = {}
+for _module, _names in {
+        "Initiation": ["init_ctm", "cast_ctm"],
+        "Value_check": ["check_inbounds_values", "check_inbounds_mask", "get_model_extent"],
+        "test_plot": ["test_plot"],
+        "calculate_geodesic_track": ["calculate_geodesic_track", "calculate_geodesic_polyline"],
+        "write_csv_output": ["write_csv_output"],
+        "dTdz_2D_cross_section": ["dTdz_2D_cross_section", "dTdz_profiles"],
+        "model_registry": ["CTMModel", "ModelRegistry", "default_registry", "get_model"],
+        "compile_ctm": ["compile_ctm", "normalize_ctm"],
+        "grid_interpolator": ["GridInterpolator", "get_grid_interpolator", "grid_node_indices"],
+        "query_size": ["estimate_query_size", "check_query_size"],
+        "result_cache": ["ResultCache", "get_result_cache", "result_caches"],
+        "binary_output": ["write_binary_grid", "read_binary_output"],
+        "query_result": ["QueryResult"],
+        "surface_layer": ["SURFACE_LAYERS", "set_surface_layer", "surface_depth", "with_surface_layer", "query_dataset",
+                          "cast_result"],
+        "shared_model": ["SharedCTM", "AttachedCTM", "share_model", "attach_shared_model", "detach_shared_models"],
+        "profiling": ["profile_stage", "profiling", "enable_profiling", "disable_profiling", "report_profile",
+                      "profile_summary", "format_profile", "collect_profile", "propagate_profile", "add_profile_hook",
+                      "remove_profile_hook"],
+        "query_0d_point": ["query_0D_point", "query_0D_points", "query_0D_points_file"],
+        "query_1d_depth_profile": ["query_1D_vertical_profile", "query_1D_vertical_profiles", "write_profiles"],
+        "query_2d_cross_section": ["query_2D_vertical_cross_section"],
+        "query_2d_horizontal_slice": ["query_2D_horizontal_slice", "query_2D_horizontal_stack"],
+        "query_2d_map": ["query_2D_map", "isotherm_depths", "write_map_csv"],
+        "compare_models": ["compare_models", "write_comparison"]}.items():
+    _exports.update(dict.fromkeys(_names, _module))
+del _module, _names
+
+__all__ = list(_exports)
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module("." + _exports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
+
+# submodules named like the function they define (write_csv_output, test_plot, ...) are set as package
+# attributes when first imported; keep the name for the function, as with the previous eager imports
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        if name in _exports and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
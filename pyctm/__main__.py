@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#
+#  pyctm command line tools ('ctm', also installed as 'pyctm')
+#  Example:
+#  ctm point --lat 40 --lon -115 --z 10000 --modelname 'Lee_2025' --modelpath 'ThermalModel_WUS_v2.nc'
+#  ctm compile --modelname 'Boyd_2019' --modelpath 'NCM_TemperatureVolume_250929_ll.nc' --outpath 'boyd2019.npy'
+#  ctm batch --manifest nightly.jsonl --workers 8 --report nightly_report.jsonl
+#
+
+### Import Packages
+import argparse
+import importlib
+import sys
+
+# query subcommands: module of pyctm with the call_func running the subcommand, and help text;
+# the module is only imported when its subcommand runs
+QUERY_COMMANDS = {"point": ("query_0d_point", "query the model at a point, or at all points of a CSV file"),
+                  "profile": ("query_1d_depth_profile", "query a vertical profile"),
+                  "hslice": ("query_2d_horizontal_slice", "query a horizontal slice, or a stack of slices"),
+                  "xsection": ("query_2d_cross_section", "query a vertical cross-section"),
+                  "map": ("query_2d_map", "map isotherm depths and the depth-averaged dT/dz over a region"),
+                  "compare": ("compare_models", "run the same point, profile, slice or cross-section query on several models")}
+
+# subcommands of the query server and batch runner (ctm_plotting/ctm_serve.py, ctm_client.py, ctm_batch.py),
+# run in the same way
+TOOL_COMMANDS = {"serve": ("ctm_serve", "serve queries with the models kept loaded"),
+                 "client": ("ctm_client", "run a query on a running 'ctm serve'"),
+                 "batch": ("ctm_batch", "run a manifest of queries on a process pool")}
+
+## Compile a model into the query-ready format
+def run_compile(args):
+    from .compile_ctm import compile_ctm
+    compile_ctm(args.modelname, args.modelpath, args.outpath, dtype = args.dtype)
+
+# Make a function to allow batch mode
+def main(argv = None):
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # query and server subcommands take the arguments of their scripts
+    commands = dict(QUERY_COMMANDS, **TOOL_COMMANDS)
+    if argv and argv[0] in commands:
+        module = importlib.import_module("pyctm." + commands[argv[0]][0])
+        return module.call_func(argv[1:])
+
+    par = argparse.ArgumentParser(prog = "ctm")
+    sub = par.add_subparsers(dest = "command", required = True)
+    for name, (module, text) in commands.items():
+        sub.add_parser(name, help = text + " (see 'ctm {:} -h')".format(name), add_help = False)
+
+    comp = sub.add_parser("compile", help = "write a model as a pre-normalized, query-ready NetCDF4/Zarr store or memory-mapped array")
+    comp.add_argument('--modelname', type = str, required = True)     # Add argument of model name: Lee_2026, Shinevar_2018, ...
+    comp.add_argument('--modelpath', type = str, required = True)     # Add argument of input model path
+    comp.add_argument('--outpath', type = str, required = True)       # Add argument of output path (.nc, .zarr, or .npy/.bin for a memory-mapped array)
+    comp.add_argument('--dtype', type = str, default = None)          # Add argument of temperature data type (e.g. float32), default as in the source
+    comp.set_defaults(func = run_compile)
+
+    args = par.parse_args(argv)                                       # Extract arguments
+    args.func(args)
+
+# Make sure the following is not calling when it is being imported
+if __name__ == "__main__":
+    sys.exit(main())
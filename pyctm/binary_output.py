@@ -0,0 +1,85 @@
+### Import Packages
+import json
+import os
+import numpy as np
+
+from .profiling import profile_stage
+
+# value of the "ctm_format" attribute of binary query outputs
+OUTPUT_FORMAT = "pyctm-output-1"
+
+## Write the JSON sidecar of a binary output; it is written last, so an output is only readable once its
+## array is complete
+#  - inputs: output path, sidecar dictionary
+#  - returns: None
+def write_sidecar(outpath, meta):
+    tmppath = str(outpath) + ".json.tmp"
+    with open(tmppath, "w") as f:
+        json.dump(meta, f, ensure_ascii = False)
+    os.replace(tmppath, str(outpath) + ".json")
+
+## Write a gridded query result (e.g. a stack of horizontal slices) as a flat C-ordered array with a JSON sidecar,
+## like the memory-mapped models of compile_ctm; no text is formatted
+#  - inputs: Xarray Dataset, output path, query type, model name, dimension order of the array, data type
+#    (default: that of the result), variable to write
+#  - returns: output path; the query, dimensions, shape, dtype and axes are written to "<output path>.json"
+def write_binary_grid(xi, outpath, qtype, modelname, dims, dtype = None, var = "temperature[°C]"):
+
+    with profile_stage("write_binary"):
+        values = np.ascontiguousarray(xi[var].transpose(*dims).values, dtype = dtype)
+        values.tofile(outpath)
+
+        meta = {"ctm_format": OUTPUT_FORMAT,
+                "query": qtype,
+                "modelname": modelname,
+                "variable": var,
+                "dims": list(dims),
+                "shape": list(values.shape),
+                "dtype": values.dtype.str,
+                "axes": {name: xi[name].values.tolist() for name in dims}}
+        write_sidecar(outpath, meta)
+    return outpath
+
+## Make a chunk writer for binary point output: one row per point, all columns in one floating-point type
+#  - inputs: output path, query type, model name, dictionary of {query column: output column}, data type of the
+#    columns (default: that of the temperatures of the first chunk)
+#  - returns: function taking a query DataFrame per chunk, and None to close the output and write its sidecar
+def binary_points_writer(outpath, qtype, modelname, columns, dtype = None):
+
+    f = open(outpath, "wb")
+    state = {"rows": 0, "dtype": None if dtype is None else np.dtype(dtype)}
+
+    def write(df):
+        if df is None:
+            f.close()
+            meta = {"ctm_format": OUTPUT_FORMAT,
+                    "query": qtype,
+                    "modelname": modelname,
+                    "columns": list(columns.values()),
+                    "shape": [state["rows"], len(columns)],
+                    "dtype": (state["dtype"] or np.dtype(float)).str}
+            write_sidecar(outpath, meta)
+            return
+        if state["dtype"] is None:
+            state["dtype"] = np.result_type(df["temperature[°C]"].dtype, np.float32)
+        np.ascontiguousarray(df[list(columns)].to_numpy(dtype = state["dtype"])).tofile(f)
+        state["rows"] += len(df)
+
+    return write
+
+## Read a binary output
+#  - inputs: output path
+#  - returns: read-only array memory-mapped from the file (rows x columns for point outputs, the grid for gridded
+#    outputs), and the sidecar dictionary ("columns" names the columns of point outputs, "axes" gives the
+#    coordinates of gridded outputs)
+def read_binary_output(outpath):
+
+    with open(str(outpath) + ".json") as f:
+        meta = json.load(f)
+    if meta.get("ctm_format") != OUTPUT_FORMAT:
+        raise ValueError('Undefined output format', meta.get("ctm_format"))
+
+    shape = tuple(meta["shape"])
+    if 0 in shape:
+        return np.empty(shape, dtype = np.dtype(meta["dtype"])), meta
+    return np.memmap(outpath, dtype = np.dtype(meta["dtype"]), mode = "r", shape = shape), meta
@@ -6,16 +6,46 @@ from pyproj import Geod
 #  - inputs: start longitude and latitude, end longitude and latitude, number of points
 #  - returns: longitude and latitude arrays along this track
 def calculate_geodesic_track(lonA, latA, lonB, latB, npts):
-    
+
     # define ellipse for geodesic
     g = Geod(ellps="WGS84")
 
-    # sample points along geodesic (including start and end points)
-    pts = g.npts(lonA, latA, lonB, latB, npts, initial_idx=0, terminus_idx=0)
-    
-    # extract arrays
-    glons = np.array([x[0] for x in pts])
-    glats = np.array([x[1] for x in pts])
+    # sample points along geodesic (including start and end points), returned as arrays
+    pts = g.inv_intermediate(lonA, latA, lonB, latB, npts, initial_idx=0, terminus_idx=0, return_back_azimuth=False)
+
+    # return
+    return np.asarray(pts.lons), np.asarray(pts.lats)
+
+## Calculate a geodesic track along a polyline of lon, lat vertices, with points equally spaced along the
+## whole track; all segments are sampled in one vectorized call
+#  - inputs: longitude and latitude arrays of the vertices (at least two), number of points
+#  - returns: longitude and latitude arrays along this track
+def calculate_geodesic_polyline(lons, lats, npts):
+
+    lons = np.asarray(lons, dtype = float)
+    lats = np.asarray(lats, dtype = float)
+    if lons.size < 2 or lons.size != lats.size:
+        raise ValueError('Undefined polyline', lons.size)
+
+    # a single segment keeps the points of calculate_geodesic_track
+    if lons.size == 2:
+        return calculate_geodesic_track(lons[0], lats[0], lons[1], lats[1], npts)
+
+    # define ellipse for geodesic
+    g = Geod(ellps="WGS84")
+
+    # azimuths and lengths of all segments
+    az, _, seg = g.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    ends = np.cumsum(seg)
+
+    # distance of each point along the track, its segment, and its distance from the start of the segment
+    dist = np.linspace(0, ends[-1], npts)
+    iseg = np.minimum(np.searchsorted(ends, dist, side = "right"), lons.size - 2)
+    along = dist - (ends[iseg] - seg[iseg])
+
+    # all points in one forward calculation; the vertices at the ends are kept exactly
+    glons, glats, _ = g.fwd(lons[iseg], lats[iseg], az[iseg], along)
+    glons[[0, -1]], glats[[0, -1]] = lons[[0, -1]], lats[[0, -1]]
 
     # return
     return glons, glats
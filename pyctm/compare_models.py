@@ -0,0 +1,256 @@
+#
+#  compare_models.py: the same query on several models ('ctm compare')
+#  Example:
+#  ctm compare xsection --model Lee_2026=ThermalModel_WUS_v2.nc --model Shinevar_2018=Shinevar_2018_Temperature.nc
+#      --lat_start 40 --lon_start -115 --lat_end 42 --lon_end -113 --z_start 0 --z_end 20000 --diffs --stats --outpath xs_compare.csv
+#
+
+from .model_registry import get_model, default_registry
+from .surface_layer import query_dataset, cast_result
+from .Value_check import check_inbounds_values
+from .query_size import check_query_size, MAX_POINTS
+from .query_0d_point import model_abbr
+from .query_2d_cross_section import parse_waypoint
+from .profiling import profile_stage, profiling, propagate_profile
+from .query_result import QueryResult
+
+### Import Packages
+import argparse
+import itertools
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import xarray as xr
+
+# spread statistics over the models
+SPREAD_STATS = ('mean', 'std', 'min', 'max', 'range')
+
+## Sample points of a query, shared by all models
+#  - inputs: query type ('point', 'profile', 'xsection' or 'hslice'), query arguments by name (as for the
+#    query functions; xsection takes integer ntrack and ndep and waypoints, hslice takes spacing in degree and npts)
+#  - returns: dictionary of interpolation indexers {coord: value}, output dimensions, and title of the query
+def query_geometry(qtype, **params):
+
+    p = params
+    if qtype == 'point':
+        points = lambda val: xr.DataArray([val], dims = 'points')
+        indexers = {'longitude[°]': points(p['lon']), 'latitude[°]': points(p['lat']), 'depth[m]': points(p['z'])}
+        dims = ('points',)
+        title = 'Point at ({:.3f}, {:.3f}, {:.3f} m)'.format(p['lon'], p['lat'], p['z'])
+
+    elif qtype == 'profile':
+        from .query_1d_depth_profile import profile_depths
+        indexers = {'longitude[°]': p['lon'], 'latitude[°]': p['lat'],
+                    'depth[m]': profile_depths(p['z_start'], p['z_end'], p['z_step'])}
+        dims = ('depth[m]',)
+        title = '1D Profile at ({:.3f}, {:.3f})'.format(p['lon'], p['lat'])
+
+    elif qtype == 'xsection':
+        from .query_2d_cross_section import section_points
+        glons, glats, zvals = section_points(p['lat_start'], p['lon_start'], p['lat_end'], p['lon_end'], p['z_start'], p['z_end'],
+                                             p.get('ntrack', 121), p.get('ndep', 61), p.get('waypoints'))
+        indexers = {'longitude[°]': xr.DataArray(glons, dims = 'track index'),
+                    'latitude[°]': xr.DataArray(glats, dims = 'track index'),
+                    'depth[m]': zvals}
+        dims = ('track index', 'depth[m]')
+        title = 'Cross Section from ({:.3f}, {:.3f}) to ({:.3f}, {:.3f})'.format(p['lon_start'], p['lat_start'], p['lon_end'], p['lat_end'])
+
+    elif qtype == 'hslice':
+        from .query_2d_horizontal_slice import slice_lonlat
+        lon_vals, lat_vals = slice_lonlat(p['lat_start'], p['lon_start'], p['lat_end'], p['lon_end'],
+                                          p.get('spacing'), p.get('npts', 10000))
+        indexers = {'longitude[°]': lon_vals, 'latitude[°]': lat_vals, 'depth[m]': p['z']}
+        dims = ('longitude[°]', 'latitude[°]')
+        title = 'Horizontal Slice at {:.3f} m depth'.format(p['z'])
+
+    else:
+        raise ValueError('Undefined query type', qtype)
+
+    return indexers, dims, title
+
+## Interpolate one model at the sample points of a query
+#  - inputs: model name, model path or registered CTMModel, indexers and dimensions from query_geometry,
+#    interpolation engine, bounds policy ('raise': error when a point is outside the model, 'nan': NaN there),
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file)
+#  - returns: Xarray Dataset with the dimensions in the given order
+def interp_model(modelname, modelpath, indexers, dims, engine = 'xarray', bounds = 'raise', dtype = None):
+
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+    depths = np.atleast_1d(np.asarray(indexers['depth[m]'], dtype = float))
+    xdata = query_dataset(model, engine, depths)
+
+    # both engines give NaN outside the model
+    if bounds == 'raise':
+        try:
+            check_inbounds_values(xdata, {coord: np.asarray(val, dtype = float).ravel() for coord, val in indexers.items()})
+        except ValueError as e:
+            raise ValueError('{:}: {:}'.format(modelname, e))
+    elif bounds != 'nan':
+        raise ValueError('Undefined bounds policy', bounds)
+
+    with profile_stage("interp"):
+        xi = cast_result(xdata.interp(indexers), xdata)
+    return xi[['temperature[°C]']].transpose(*dims)
+
+## Query several models at the same sample points
+#  - inputs: query type ('point', 'profile', 'xsection' or 'hslice'), list of (model name, model path or
+#    registered CTMModel), query arguments as a dictionary, interpolation engine, whether to add the pairwise
+#    differences and the spread statistics, bounds policy ('raise' or 'nan'), number of threads interpolating
+#    the models (default: one per model), maximum number of points per model, data type of the model
+#    temperatures (e.g. 'float32'; default as in the model files)
+#  - returns: Xarray Dataset with one temperature variable per model (named by the model), 'A-B' differences
+#    for each pair of models, and mean, std, min, max and range over the models (NaN values are skipped)
+def compare_models(qtype, models, params, engine = 'xarray', diffs = False, stats = False, bounds = 'raise',
+                   workers = None, max_points = MAX_POINTS, dtype = None):
+
+    names = [name for name, path in models]
+    if len(set(names)) != len(names):
+        raise ValueError('Duplicate model names', names)
+
+    # geometry computed once for all models
+    with profile_stage("geometry"):
+        indexers, dims, title = query_geometry(qtype, **params)
+    sizes = {}
+    for coord, val in indexers.items():
+        if isinstance(val, xr.DataArray):
+            sizes[val.dims[0]] = val.size
+        elif np.ndim(val) == 1:
+            sizes[coord] = np.size(val)
+    check_query_size(int(np.prod(list(sizes.values()))), max_points)
+
+    # interpolate the models in parallel (file reads and NumPy release the GIL); each thread holds its model
+    # open while it interpolates, and its stages are profiled with those of the caller
+    @propagate_profile
+    def run(model):
+        with default_registry.hold():
+            return interp_model(model[0], model[1], indexers, dims, engine, bounds, dtype)
+    if len(models) > 1 and workers != 1:
+        with ThreadPoolExecutor(max_workers = workers or len(models)) as pool:
+            results = list(pool.map(run, models))
+    else:
+        results = [run(model) for model in models]
+
+    # aligned result: coordinates of the first model, one variable per model
+    out = results[0].drop_vars('temperature[°C]')
+    for name, xi in zip(names, results):
+        out[name] = (dims, xi['temperature[°C]'].values)
+
+    if diffs:
+        for a, b in itertools.combinations(names, 2):
+            out['{:}-{:}'.format(a, b)] = out[a] - out[b]
+
+    if stats:
+        temps = np.stack([out[name].values for name in names])
+        with warnings.catch_warnings():
+            # all-NaN points (outside every model) stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            spread = {'mean': np.nanmean(temps, axis = 0),
+                      'std': np.nanstd(temps, axis = 0),
+                      'min': np.nanmin(temps, axis = 0),
+                      'max': np.nanmax(temps, axis = 0)}
+        spread['range'] = spread['max'] - spread['min']
+        for stat in SPREAD_STATS:
+            out[stat] = (dims, spread[stat])
+
+    out.attrs['ctm_query'] = qtype
+    out.attrs['ctm_title'] = title
+    out.attrs['ctm_models'] = ','.join(names)
+    return out
+
+## Write a comparison as one CSV file (a row per sample point, a column per model) or NetCDF file
+#  - inputs: Dataset from compare_models, output path, format ('csv' or 'netcdf'; default from the extension)
+#  - returns: None
+def write_comparison(out, outpath, outformat = None):
+
+    if outformat is None:
+        outformat = 'netcdf' if outpath.endswith('.nc') else 'csv'
+
+    if outformat == 'netcdf':
+        with profile_stage("write_netcdf"):
+            out.to_netcdf(outpath)
+        return
+    if outformat != 'csv':
+        raise ValueError('Undefined output format', outformat)
+
+    names = out.attrs['ctm_models'].split(',')
+    rename = {'longitude[°]': '# Lon', 'latitude[°]': 'Lat', 'depth[m]': 'Depth(m)'}
+    with profile_stage("to_columns"):
+        df = QueryResult.from_dataset(out, list(rename) + list(out.data_vars)).rename(columns = rename)
+
+    head = "# Title: CTM Comparison {:}\n".format(out.attrs['ctm_title'])
+    head += "# CTM(abbr): {:}\n".format(', '.join(model_abbr.get(name, name) for name in names))
+    head += "# Data_type: T[°C]\n"
+    head += "# Total_pts: {:}\n".format(len(df))
+    if any('-' in var for var in out.data_vars if var not in names):
+        head += "# A-B: temperature difference between models A and B\n"
+    if 'mean' in out.data_vars:
+        head += "# mean, std, min, max, range: spread of the temperatures over the models\n"
+
+    with profile_stage("write_csv"):
+        with open(outpath, 'w') as f:
+            f.write(head)
+            df.to_dataframe().to_csv(f, index = False, float_format = "%.6f", na_rep = "nan", lineterminator = "\n")
+
+## Parse the models of the command line
+#  - inputs: list of 'NAME=PATH' strings
+#  - returns: list of (model name, model path)
+def parse_models(specs):
+    models = []
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        if not sep or not name or not path:
+            raise ValueError('Undefined model (expected NAME=PATH)', spec)
+        models.append((name, path))
+    return models
+
+# Make a function to allow batch mode
+#  - inputs: argument list (default sys.argv)
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser(prog = 'ctm compare', description = 'Run the same query on several models')
+    sub = par.add_subparsers(dest = 'query', required = True)
+    queries = {'point': ('lat', 'lon', 'z'),
+               'profile': ('lat', 'lon', 'z_start', 'z_end', 'z_step'),
+               'xsection': ('lat_start', 'lon_start', 'lat_end', 'lon_end', 'z_start', 'z_end'),
+               'hslice': ('lat_start', 'lon_start', 'lat_end', 'lon_end', 'z')}
+    for qtype, coords in queries.items():
+        q = sub.add_parser(qtype)
+        for coord in coords:
+            q.add_argument('--' + coord, type = float, required = True)   # Add argument of query coordinate (°, or m for depths)
+        if qtype == 'hslice':
+            q.add_argument('--spacing', type = float, required = False)   # Add argument of spacing (degree)
+            q.add_argument('--npts', type = int, default = 10000)         # Add argument of approximate number of points when there is no spacing
+        if qtype == 'xsection':
+            q.add_argument('--ntrack', type = int, default = 121)         # Add argument of number of track points
+            q.add_argument('--ndep', type = int, default = 61)            # Add argument of number of depths
+            q.add_argument('--waypoint', type = str, action = 'append')   # Add argument of polyline vertex as LAT,LON between start and end (repeat in order)
+        q.add_argument('--model', type = str, action = 'append', required = True)  # Add argument of model as NAME=PATH (repeat for each model)
+        q.add_argument('--outpath', type = str, required = True)          # Add argument of output path (.nc for NetCDF, CSV otherwise)
+        q.add_argument('--outformat', type = str, required = False,       # Add argument of output format (default from --outpath)
+                       choices = ['csv', 'netcdf'])
+        q.add_argument('--diffs', action = 'store_true')                  # Add argument to add the pairwise differences
+        q.add_argument('--stats', action = 'store_true')                  # Add argument to add the spread statistics
+        q.add_argument('--bounds', type = str, default = 'raise',         # Add argument of policy for points outside a model
+                       choices = ['raise', 'nan'])
+        q.add_argument('--engine', type = str, default = 'xarray',        # Add argument of interpolation engine: xarray or fast
+                       choices = ['xarray', 'fast'])
+        q.add_argument('--workers', type = int, required = False)         # Add argument of number of threads (default: one per model)
+        q.add_argument('--dtype', type = str, required = False,           # Add argument of data type of the temperatures (default as in the model files)
+                       choices = ['float32', 'float64'])
+        q.add_argument('--profile', type = str, nargs = '?', const = '-')  # Add argument of stage timings: summary on stderr, or JSON output path
+    args = par.parse_args(argv)                                           # Extract arguments
+
+    params = {key: val for key, val in vars(args).items() if key in queries[args.query] + ('spacing', 'npts', 'ntrack', 'ndep')}
+    if args.query == 'xsection':
+        params['waypoints'] = [parse_waypoint(v) for v in args.waypoint or []]
+
+    # optional stage timings
+    with profiling(args.profile):
+        out = compare_models(args.query, parse_models(args.model), params, engine = args.engine, diffs = args.diffs,
+                             stats = args.stats, bounds = args.bounds, workers = args.workers, dtype = args.dtype)
+        write_comparison(out, args.outpath, args.outformat)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    call_func()
@@ -0,0 +1,99 @@
+### Import Packages
+import json
+import os
+import numpy as np
+
+from .Initiation import init_ctm, COMPILED_FORMAT, MEMMAP_SUFFIXES
+from .surface_layer import surface_depth, with_surface_layer
+
+# default chunk sizes of compiled models
+COMPILED_CHUNKS = {"depth[m]": 8, "latitude[°]": 64, "longitude[°]": 64}
+
+# units of the normalized variables, recorded in the sidecar of memory-mapped models
+UNITS = {"longitude[°]": "degrees_east", "latitude[°]": "degrees_north", "depth[m]": "m", "temperature[°C]": "degC"}
+
+## Convert a model into the canonical query-ready layout
+#  - inputs: model name, model path
+#  - returns: Xarray Dataset with sorted longitude[°]/latitude[°]/depth[m] coordinates (depth in meters),
+#    a single temperature[°C] variable, and the surface layer of models that do not start at the surface (see surface_layer.py)
+def normalize_ctm(modelname, modelpath):
+
+    # open and rename with the per-model rules
+    xdata = init_ctm(modelname, modelpath)
+
+    # keep the temperature only, with sorted coordinates
+    # (the dimension order of the source is kept, as it sets the row order of the query output)
+    xdata = xdata[["temperature[°C]"]]
+    xdata = xdata.sortby(["longitude[°]", "latitude[°]", "depth[m]"])
+
+    # bake in the surface layer, extrapolated the same way as in the query scripts
+    xdata = with_surface_layer(xdata, surface_depth(modelname, xdata))
+
+    xdata.attrs["ctm_format"] = COMPILED_FORMAT
+    xdata.attrs["ctm_modelname"] = modelname
+    xdata.attrs["ctm_source"] = os.path.basename(str(modelpath))
+
+    return xdata
+
+## Write a normalized model as a flat C-ordered array with a JSON sidecar, for opening with np.memmap
+#  - inputs: normalized Xarray Dataset, output path (".npy" writes a NumPy file, ".bin"/".raw" the bare array)
+#  - returns: output path; the axes, dimensions, dtype and units are written to "<output path>.json"
+def write_memmap_ctm(xdata, outpath):
+
+    var = xdata["temperature[°C]"]
+    values = np.ascontiguousarray(var.values)
+    if str(outpath).endswith(".npy"):
+        np.save(outpath, values)
+    else:
+        values.tofile(outpath)
+
+    meta = {"ctm_format": COMPILED_FORMAT,
+            "modelname": xdata.attrs["ctm_modelname"],
+            "source": xdata.attrs["ctm_source"],
+            "variable": "temperature[°C]",
+            "dims": list(var.dims),
+            "shape": list(values.shape),
+            "dtype": values.dtype.str,
+            "axes": {name: xdata[name].values.tolist() for name in var.dims},
+            "units": UNITS}
+
+    # the sidecar is written last, so a model is only usable once its array is complete
+    tmppath = str(outpath) + ".json.tmp"
+    with open(tmppath, "w") as f:
+        json.dump(meta, f, ensure_ascii = False)
+    os.replace(tmppath, str(outpath) + ".json")
+    return outpath
+
+## Write a model once as a compiled store that init_ctm opens without any per-query transformation
+#  - inputs: model name, model path, output path (".zarr" writes Zarr, ".npy"/".bin"/".raw" a memory-mapped array,
+#    anything else chunked NetCDF4), chunk sizes, data type of the temperatures (default: as in the source)
+#  - returns: output path
+def compile_ctm(modelname, modelpath, outpath, chunks = None, dtype = None):
+
+    chunks = dict(COMPILED_CHUNKS, **(chunks or {}))
+    xdata = normalize_ctm(modelname, modelpath).load()
+    if dtype is not None:
+        xdata["temperature[°C]"] = xdata["temperature[°C]"].astype(dtype)
+
+    if str(outpath).endswith(MEMMAP_SUFFIXES):
+        write_memmap_ctm(xdata, outpath)
+        xdata.close()
+        return outpath
+
+    # chunk sizes cannot exceed the axis length
+    dims = xdata["temperature[°C]"].dims
+    sizes = [min(chunks[dim], xdata.sizes[dim]) for dim in dims]
+
+    if str(outpath).endswith(".zarr"):
+        try:
+            import zarr  # noqa: F401
+        except ImportError:
+            raise ImportError("Writing Zarr stores requires the zarr package")
+        encoding = {"temperature[°C]": {"chunks": sizes}}
+        xdata.to_zarr(outpath, mode = "w", encoding = encoding)
+    else:
+        encoding = {"temperature[°C]": {"chunksizes": sizes}}
+        xdata.to_netcdf(outpath, format = "NETCDF4", encoding = encoding)
+
+    xdata.close()
+    return outpath
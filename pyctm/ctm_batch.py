@@ -0,0 +1,250 @@
+#
+#  ctm_batch.py: batch runs ('ctm batch', ctm_plotting/ctm_batch.py)
+#
+#  Run a manifest of queries on a process pool. The jobs are grouped by model, so each model is opened
+#  once per worker, and each job runs the query script's call_func, so outputs are the same as running
+#  the scripts directly. One JSON line per job is appended to the report as each job finishes:
+#  {"id": ..., "command": ..., "status": "ok" or "error", "elapsed": seconds, "worker": pid, ...}.
+#  With --resume, jobs already reported as ok are skipped. With --profile, each record also has the stage
+#  timings of the job ("profile"), and the timings added up over all jobs are printed at the end.
+#  Manifest: JSON lines (.jsonl) or YAML (.yaml/.yml, requires PyYAML), one job per line / list item:
+#  {"id": "xs1", "command": "query_2d_cross_section",
+#   "args": {"lat_start": 40, "lon_start": -115, "lat_end": 42, "lon_end": -113, "z_start": 0, "z_end": 20000,
+#            "modelname": "Lee_2026", "modelpath": "ThermalModel_WUS_v2.nc", "outpath": "xs1.csv"}}
+#  "args" values are passed as --key value (lists are joined with commas); "argv" gives the arguments as a list
+#  instead. The id is optional (default: a hash of the job).
+#  Example:
+#  ctm batch --manifest nightly.jsonl --workers 8 --report nightly_report.jsonl
+#
+
+from .ctm_serve import run_request, commands
+from .profiling import profile_summary, format_profile
+
+### Import Packages
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# queue the worker processes put the report records on as each job finishes (set by the pool initializer)
+record_queue = None
+
+## Read a manifest
+#  - inputs: manifest path (.yaml/.yml for YAML, anything else JSON lines)
+#  - returns: list of job dictionaries
+def read_manifest(path):
+
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML manifests requires the PyYAML package")
+        with open(path) as f:
+            jobs = yaml.safe_load(f) or []
+        if isinstance(jobs, dict):
+            jobs = jobs.get('jobs', [])
+    else:
+        with open(path) as f:
+            jobs = [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    for job in jobs:
+        if not isinstance(job, dict) or 'command' not in job:
+            raise ValueError('Undefined job', job)
+        job['command'] = os.path.splitext(os.path.basename(job['command']))[0]
+        job.setdefault('id', hashlib.sha1(json.dumps(job, sort_keys = True).encode()).hexdigest()[:12])
+
+    ids = [job['id'] for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError('Duplicate job ids in manifest', path)
+    return jobs
+
+## Command line arguments of a job
+#  - inputs: job dictionary
+#  - returns: argument list for the query script's call_func
+def job_argv(job):
+
+    if 'argv' in job:
+        return [str(arg) for arg in job['argv']]
+
+    argv = []
+    for key, val in job.get('args', {}).items():
+        if val is None:
+            continue
+        if isinstance(val, (list, tuple)):
+            val = ','.join(str(v) for v in val)
+        argv += ['--' + key, str(val)]
+    return argv
+
+## Model of a job, used to group the jobs
+#  - inputs: argument list
+#  - returns: (model name, absolute model path)
+def job_model(argv):
+
+    model = {'--modelname': '', '--modelpath': ''}
+    for i, arg in enumerate(argv):
+        if arg in model and i + 1 < len(argv):
+            model[arg] = argv[i + 1]
+        elif arg.split('=', 1)[0] in model and '=' in arg:
+            key, val = arg.split('=', 1)
+            model[key] = val
+    path = model['--modelpath']
+    return (model['--modelname'], os.path.abspath(path) if path else '')
+
+## Split the jobs into tasks of a single model
+#  - inputs: list of jobs, number of workers
+#  - returns: list of job lists; each model's jobs are spread over at most one task per worker
+def group_jobs(jobs, workers):
+
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job_model(job_argv(job)), []).append(job)
+
+    tasks = []
+    for group in groups.values():
+        ntask = max(1, min(workers, len(group)))
+        size = -(-len(group) // ntask)
+        tasks += [group[i:i + size] for i in range(0, len(group), size)]
+    return tasks
+
+## Set the record queue of a worker process
+#  - inputs: multiprocessing queue
+#  - returns: None
+def init_worker(records):
+    global record_queue
+    record_queue = records
+
+## Run the jobs of one task in a worker process; each record is also put on the record queue of the worker
+## as soon as its job is done
+#  - inputs: list of jobs, whether to record the stage timings of each job
+#  - returns: list of report records
+def run_jobs(jobs, profile = False):
+
+    records = []
+    for job in jobs:
+        argv = job_argv(job)
+        t0 = time.time()
+        response = run_request({'command': job['command'], 'argv': argv, 'profile': profile})
+        record = {'id': job['id'], 'command': job['command'], 'status': response['status'],
+                  'start': t0, 'elapsed': response.get('elapsed', time.time() - t0), 'worker': os.getpid()}
+        for key in ('error', 'stdout', 'stderr', 'profile'):
+            if response.get(key):
+                record[key] = response[key]
+        records.append(record)
+        if record_queue is not None:
+            record_queue.put(record)
+    return records
+
+## Ids of the jobs reported as done in a previous run
+#  - inputs: report path
+#  - returns: set of job ids
+def completed_jobs(report):
+
+    done = set()
+    if os.path.exists(report):
+        with open(report) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue            # a line cut off by an interrupted run
+                if record.get('status') == 'ok':
+                    done.add(record['id'])
+                else:
+                    done.discard(record['id'])
+    return done
+
+## Run a manifest
+#  - inputs: list of jobs, report path, number of worker processes (0 runs in this process), resume after a previous run,
+#    whether to record stage timings
+#  - returns: dictionary with the number of jobs ok, failed and skipped, the wall time, and the stage timings
+#    added up over the jobs of this run (with profile)
+def run_batch(jobs, report, workers = None, resume = False, profile = False):
+
+    workers = os.cpu_count() if workers is None else workers
+    t0 = time.perf_counter()
+
+    done = completed_jobs(report) if resume else set()
+    todo = [job for job in jobs if job['id'] not in done]
+    summary = {'ok': 0, 'error': 0, 'skipped': len(jobs) - len(todo)}
+    stages = []
+    tasks = group_jobs(todo, max(workers, 1))
+
+    with open(report, 'a' if resume else 'w') as f:
+
+        def record(records):
+            for rec in records:
+                summary['ok' if rec['status'] == 'ok' else 'error'] += 1
+                stages.extend(dict(agg, stage = stage) for stage, agg in rec.get('profile', {}).items())
+                f.write(json.dumps(rec) + '\n')
+            f.flush()
+
+        if workers == 0:
+            for task in tasks:
+                for job in task:
+                    record(run_jobs([job], profile))
+        else:
+            # the records are written as the jobs finish, so --resume skips them even when the run is cut
+            # off in the middle of a task
+            records = multiprocessing.Queue()
+            reported, expected = set(), set()
+            failed = []
+            with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (records,)) as pool:
+                futures = {pool.submit(run_jobs, task, profile): task for task in tasks}
+                pending = set(futures)
+                while pending or expected - reported:
+                    try:
+                        rec = records.get(timeout = 0.1)
+                    except queue.Empty:
+                        pass
+                    else:
+                        reported.add(rec['id'])
+                        record([rec])
+                    for future in [future for future in pending if future.done()]:
+                        pending.discard(future)
+                        if future.exception() is not None:
+                            failed.append(future)
+                        else:
+                            expected.update(job['id'] for job in futures[future])
+
+            # the worker died (e.g. out of memory): report the task's jobs without a record as failed
+            for future in failed:
+                e = future.exception()
+                record([{'id': job['id'], 'command': job['command'], 'status': 'error',
+                         'error': '{:}: {:}'.format(type(e).__name__, e)}
+                        for job in futures[future] if job['id'] not in reported])
+
+    summary['elapsed'] = time.perf_counter() - t0
+    if profile:
+        summary['profile'] = profile_summary(stages)
+    return summary
+
+# Make a function to allow batch mode
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser(description = 'Run a manifest of CTM queries on a process pool')
+    par.add_argument('--manifest', type = str, required = True)         # Add argument of manifest path (.jsonl or .yaml)
+    par.add_argument('--report', type = str, required = False)          # Add argument of report path (default: <manifest>.report.jsonl)
+    par.add_argument('--workers', type = int, default = os.cpu_count()) # Add argument of number of worker processes (0 for none)
+    par.add_argument('--resume', action = 'store_true')                 # Add argument to skip the jobs already done in the report
+    par.add_argument('--profile', action = 'store_true')                # Add argument to record stage timings per job and in total
+    args = par.parse_args(argv)                                          # Extract arguments
+
+    jobs = read_manifest(args.manifest)
+    unknown = sorted({job['command'] for job in jobs} - set(commands))
+    if unknown:
+        par.error('unknown commands in manifest: {:}'.format(', '.join(unknown)))
+
+    report = args.report or os.path.splitext(args.manifest)[0] + '.report.jsonl'
+    summary = run_batch(jobs, report, args.workers, args.resume, args.profile)
+    if args.profile:
+        sys.stderr.write(format_profile(summary['profile']))
+
+    print("{:} jobs: {:} ok, {:} failed, {:} skipped in {:.1f} s (report: {:})".format(
+        len(jobs), summary['ok'], summary['error'], summary['skipped'], summary['elapsed'], report))
+    return 1 if summary['error'] else 0
+
@@ -0,0 +1,103 @@
+#
+#  ctm_client.py: query server client ('ctm client', ctm_plotting/ctm_client.py)
+#
+#  Thin client for ctm_serve.py: runs a query script on the server, which keeps the models loaded.
+#  Example:
+#  ctm_client.py query_2d_cross_section.py --lat_start 40 --lon_start -115 ... --outpath 'test2d_cross.csv'
+#
+
+### Import Packages
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# default server address
+DEFAULT_SOCKET = os.environ.get('CTM_SERVE_SOCKET', os.path.join(tempfile.gettempdir(), 'ctm-serve.sock'))
+
+# query scripts the server can run, and the same by their 'ctm' subcommand name
+COMMANDS = ('query_0d_point', 'query_1d_depth_profile', 'query_2d_cross_section', 'query_2d_horizontal_slice', 'query_2d_map',
+            'point', 'profile', 'xsection', 'hslice', 'map', 'compare', 'compare_models')
+
+# arguments holding file paths, made absolute before sending
+PATH_ARGS = ('--modelpath', '--outpath', '--infile', '--cache')
+
+## Make path arguments absolute, since the server does not share our working directory; relative paths are
+## joined to it as they are, so the server derives the other output paths (e.g. data -> data_final) from the
+## part we gave (the working directory is sent with the request)
+#  - inputs: argument list, working directory (default: ours)
+#  - returns: new argument list
+def absolute_paths(argv, cwd = None):
+
+    cwd = cwd or os.getcwd()
+    out = []
+    expect_path = False
+    for arg in argv:
+        if expect_path:
+            arg = os.path.join(cwd, arg)
+            expect_path = False
+        elif arg in PATH_ARGS:
+            expect_path = True
+        elif arg.split('=', 1)[0] in PATH_ARGS and '=' in arg:
+            key, val = arg.split('=', 1)
+            arg = key + '=' + os.path.join(cwd, val)
+        out.append(arg)
+    return out
+
+## Send one request to the server
+#  - inputs: request dictionary, Unix socket path, or TCP port on localhost (used when given)
+#  - returns: response dictionary
+def send_request(request, sockpath = DEFAULT_SOCKET, port = None):
+
+    if port:
+        sock = socket.create_connection(('127.0.0.1', port))
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(sockpath)
+
+    with sock:
+        sock.sendall((json.dumps(request) + '\n').encode())
+        with sock.makefile('rb') as f:
+            line = f.readline()
+
+    if not line:
+        raise ConnectionError('No response from ctm_serve')
+    return json.loads(line)
+
+# Make a function to allow batch mode
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser(description = 'Run a query script on a running ctm_serve.py')
+    par.add_argument('--socket', type = str, default = DEFAULT_SOCKET)   # Add argument of server Unix socket path
+    par.add_argument('--port', type = int, required = False)            # Add argument of server TCP port on localhost
+    par.add_argument('--profile', action = 'store_true')                # Add argument to print the stage timings of the query (JSON, on stderr)
+    par.add_argument('command', type = str)                              # Add argument of query script name, or 'stats'
+    par.add_argument('args', nargs = argparse.REMAINDER)                 # Arguments of the query script
+    args = par.parse_args(argv)                                          # Extract arguments
+
+    command = os.path.splitext(os.path.basename(args.command))[0]
+    if command not in COMMANDS + ('stats',):
+        par.error('unknown command {:}'.format(args.command))
+
+    cwd = os.getcwd()
+    request = {'command': command, 'argv': absolute_paths(args.args, cwd), 'cwd': cwd}
+    if args.profile:
+        request['profile'] = True
+    resp = send_request(request, args.socket, args.port)
+
+    # errors as the script would report them: its output (e.g. argparse usage and message) and exit code
+    if resp['status'] != 'ok':
+        sys.stdout.write(resp.get('stdout', ''))
+        sys.stderr.write(resp.get('stderr') or resp['error'] + '\n')
+        sys.exit(resp.get('exit_code', 1))
+
+    if command == 'stats':
+        print(json.dumps(resp['stats']))
+    else:
+        sys.stdout.write(resp['stdout'])
+        sys.stderr.write(resp.get('stderr', ''))
+    if 'profile' in resp and (args.profile or command == 'stats'):
+        sys.stderr.write(json.dumps(resp['profile'], indent = 1) + '\n')
+
@@ -0,0 +1,216 @@
+#
+#  ctm_serve.py: query server ('ctm serve', ctm_plotting/ctm_serve.py)
+#
+#  Long-running query server. Keeps the Python imports and the models loaded between requests and runs
+#  the query scripts' call_func on a worker pool, so outputs are the same as running the scripts directly.
+#  Protocol: one JSON request per line, {"command": "query_2d_cross_section" (or "xsection"), "argv": [...],
+#  "cwd": client working directory (paths in argv are absolute)}, answered by one JSON line
+#  {"status": "ok", "stdout": "...", "stderr": "...", "elapsed": seconds} or {"status": "error", "error": "...",
+#  "stdout": "...", "stderr": "...", "exit_code": N}, with all the output of the command (query sizes, --profile
+#  summaries, argparse usage and messages, ...) in stdout and stderr, and the exit code the script would have
+#  had when run directly (2 for invalid arguments; "--help" is answered with status "ok"). The command
+#  "stats" returns the model registry statistics, and the statistics of the result caches used by the
+#  requests ("cache", see --cache of the query scripts).
+#  With "profile": true in a request, the response also has the stage timings of that request
+#  ("profile": {stage: {calls, wall, cpu, peak_rss, rss_growth}}); with --profile, the server adds up the
+#  stage timings of all requests and returns them with "stats".
+#
+
+from .model_registry import default_registry
+from .profiling import collect_profile, profile_summary, add_profile_hook
+from .result_cache import result_caches
+from .write_csv_output import client_directory
+from .__main__ import QUERY_COMMANDS
+from .ctm_client import DEFAULT_SOCKET
+
+### Import Packages
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# query scripts by command name (query_0d_point, ...), and by their 'ctm' subcommand name (point, ...), with
+# the program name of their usage and error messages when run directly
+commands = {}
+programs = {}
+for name, (module, text) in QUERY_COMMANDS.items():
+    commands[module] = commands[name] = importlib.import_module('pyctm.' + module).call_func
+    programs[module], programs[name] = module + '.py', 'ctm ' + name
+
+# responses are single lines, which can be long for bulk point output
+LINE_LIMIT = 2**30
+
+# stage records of all requests, when the server runs with --profile
+profile_records = None
+
+# output streams of the request the current thread runs
+request_streams = threading.local()
+
+## Standard stream of the server that sends what is written in a request to the streams of that request
+## (query sizes, --profile summaries, warnings, ...), and everything else to the server's own stream
+#  - inputs: stream of the server, name of the stream ('stdout' or 'stderr')
+class RequestStream(io.TextIOBase):
+
+    def __init__(self, stream, name):
+        self.stream = stream
+        self.name = name
+
+    def target(self):
+        return getattr(request_streams, self.name, None) or self.stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def flush(self):
+        self.target().flush()
+
+## Route the standard streams through the requests (once)
+#  - returns: None
+def route_streams():
+    if not isinstance(sys.stdout, RequestStream):
+        sys.stdout = RequestStream(sys.stdout, 'stdout')
+    if not isinstance(sys.stderr, RequestStream):
+        sys.stderr = RequestStream(sys.stderr, 'stderr')
+
+## Capture the standard streams of the current thread
+#  - inputs: stream for stdout, stream for stderr
+#  - returns: context manager
+@contextlib.contextmanager
+def request_output(stdout, stderr):
+    route_streams()
+    request_streams.stdout, request_streams.stderr = stdout, stderr
+    try:
+        yield
+    finally:
+        request_streams.stdout = request_streams.stderr = None
+
+## Run one request
+#  - inputs: request dictionary
+#  - returns: response dictionary
+def run_request(request):
+
+    command = request.get('command')
+    if command == 'stats':
+        response = {'status': 'ok', 'stats': default_registry.stats()}
+        if result_caches():
+            response['cache'] = [cache.stats() for cache in result_caches()]
+        if profile_records is not None:
+            response['profile'] = profile_summary(list(profile_records))
+        return response
+    if command not in commands:
+        return {'status': 'error', 'error': 'Unknown command {:}'.format(command)}
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    t0 = time.perf_counter()
+    code = None
+    # the models of the request stay open until it is done, even when other requests evict them
+    with (collect_profile() if request.get('profile') else contextlib.nullcontext([])) as records, \
+         client_directory(request.get('cwd')), request_output(stdout, stderr), default_registry.hold():
+        try:
+            commands[command](list(request.get('argv', [])))
+        except SystemExit as e:
+            # argparse errors (usage and message on stderr) and --help (exit code 0), as when run directly
+            code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            if isinstance(e.code, str):
+                stderr.write(e.code + '\n')
+        except Exception as e:
+            return {'status': 'error', 'error': '{:}: {:}'.format(type(e).__name__, e),
+                    'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'exit_code': 1}
+
+    if code is not None:
+        # argparse names the server as the program
+        prog = os.path.basename(sys.argv[0])
+        out, err = [text.replace('usage: ' + prog, 'usage: ' + programs[command]).replace(prog + ': error:', programs[command] + ': error:')
+                    for text in (stdout.getvalue(), stderr.getvalue())]
+        if code:
+            lines = err.strip().splitlines()
+            return {'status': 'error', 'error': lines[-1] if lines else 'Invalid arguments for {:}'.format(command),
+                    'stdout': out, 'stderr': err, 'exit_code': code}
+        stdout, stderr = io.StringIO(out), io.StringIO(err)
+
+    response = {'status': 'ok', 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(),
+                'elapsed': time.perf_counter() - t0}
+    if request.get('profile'):
+        response['profile'] = profile_summary(records)
+    return response
+
+## Serve requests until stopped
+#  - inputs: Unix socket path, TCP port on localhost (used instead of the socket when given), number of workers
+#  - returns: None
+async def serve(sockpath = DEFAULT_SOCKET, port = None, workers = 4):
+
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers = workers)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {'status': 'error', 'error': 'Invalid JSON request'}
+                else:
+                    response = await loop.run_in_executor(pool, run_request, request)
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    if port:
+        server = await asyncio.start_server(handle, '127.0.0.1', port, limit = LINE_LIMIT)
+    else:
+        if os.path.exists(sockpath):
+            os.remove(sockpath)
+        server = await asyncio.start_unix_server(handle, sockpath, limit = LINE_LIMIT)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.shutdown(wait = False)
+        if not port and os.path.exists(sockpath):
+            os.remove(sockpath)
+
+# Make a function to allow batch mode
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser(description = 'Serve CTM queries with the models kept loaded')
+    par.add_argument('--socket', type = str, default = DEFAULT_SOCKET)   # Add argument of Unix socket path
+    par.add_argument('--port', type = int, required = False)            # Add argument of TCP port on localhost (instead of the socket)
+    par.add_argument('--workers', type = int, default = 4)              # Add argument of number of worker threads
+    par.add_argument('--model', type = str, action = 'append',          # Add argument of model to load at startup: NAME=PATH
+                     default = [])
+    par.add_argument('--max_models', type = int, default = 8)           # Add argument of number of models kept loaded
+    par.add_argument('--profile', action = 'store_true')                # Add argument to add up stage timings of all requests (see stats)
+    args = par.parse_args(argv)                                          # Extract arguments
+
+    # aggregate the stage timings of all requests
+    global profile_records
+    if args.profile:
+        profile_records = []
+        add_profile_hook(profile_records.append)
+
+    # warm up the registry
+    default_registry.configure(max_entries = args.max_models)
+    for spec in args.model:
+        name, path = spec.split('=', 1)
+        default_registry.register(name, path).xdata.load()
+
+    try:
+        asyncio.run(serve(args.socket, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
@@ -1,34 +1,71 @@
 # Import package
+import numpy as np
 import pandas as pd
 
+## Geothermal gradient of profiles stored as an array
+# - input: temperatures with depth along the last axis (e.g. the track index x depth array of a cross-section),
+#   depths (m) of the last axis; field = True for the gradient at every cell instead of one per profile
+# - returns: end-member gradient (T at deepest - T at shallowest) / depth range of each profile in °C/km,
+#   or the gradient at every cell (np.gradient, °C/km) with the shape of the temperatures
+def dTdz_profiles(temps, depths, field = False):
+
+    temps = np.asarray(temps, dtype = float)
+    depths = np.asarray(depths, dtype = float)
+
+    # work on increasing depths
+    order = np.argsort(depths, kind = "stable")
+    z, T = depths[order], temps[..., order]
+
+    if not field:
+        return (T[..., -1] - T[..., 0]) / (z[-1] - z[0]) * 1000
+
+    dTdz = np.full(T.shape, np.nan)
+    if z.size > 1:
+        dTdz[..., order] = np.gradient(T, z, axis = -1) * 1000
+    return dTdz
+
 ##  Calculate geothermal gradient for a 2D vertical slice
-# - input: Dataframe output from query_2D_vertical_cross_section()
-# - returns: Dataframe with geothermal gradient, latitude, and longitude
-def dTdz_2D_cross_section(df):
-    
-    df_copy = df.copy()                                                    # Make a copy of the queried dataframe
-    df_copy['lonlat'] = list(zip(df['# Lon'], df['Lat']))   # Make a new column to store longitude and latitude together
-
-    grouped = df_copy.groupby(['lonlat'])         # Group data by lonlat tuple
-    dTdz_dic = []                                 # Make an empty list to store results later
-    
-    # Loop through each profile to calculate linear dTdz
-    for lonlat, group in grouped:
-        group = group.sort_values('Depth(m)')      # Sort each group df by depth
-        z_min = group['Depth(m)'].iloc[0]          # Find minimum depth
-        z_max = group['Depth(m)'].iloc[-1]         # Find maximum depth
-        T_min = group['Temperature(°C)'].iloc[0]   # Find minimum temperature
-        T_max = group['Temperature(°C)'].iloc[-1]  # Find maximum temperature
-        
-        dTdz = ((T_max - T_min) / (z_max - z_min)) * 1000  # Calculate geothermal gradient, °C/km
-
-        # Store result to the dictionary
-        dTdz_dic.append({
-            'longitude[°]': lonlat[0][0],
-            'latitude[°]': lonlat[0][1],
-            'dTdz[°C/km]': dTdz})
-
-        # Convert dictionary to dataframe
-        df_dTdz = pd.DataFrame(dTdz_dic)
-
-    return df_dTdz
+# - input: Dataframe (or QueryResult) output from query_2D_vertical_cross_section() (columns '# Lon', 'Lat', 'Depth(m)', 'Temperature(°C)');
+#   field = True for the gradient at every row instead of one per profile
+# - returns: Dataframe with geothermal gradient, latitude, and longitude (one row per profile, sorted by longitude
+#   and latitude), or with the gradient and depth of every row in the input order when field = True
+def dTdz_2D_cross_section(df, field = False):
+
+    # number the profiles (unique longitude/latitude pairs) in sorted order, and sort the rows by profile and depth
+    codes = df[['# Lon', 'Lat']].groupby(['# Lon', 'Lat'], sort = True).ngroup().values
+    lon, lat = df['# Lon'].values, df['Lat'].values
+    z, T = df['Depth(m)'].values.astype(float), df['Temperature(°C)'].values.astype(float)
+    order = np.lexsort((z, codes))
+    codes, z, T = codes[order], z[order], T[order]
+
+    # first and last row of each profile
+    first = np.r_[True, codes[1:] != codes[:-1]]
+    last = np.r_[codes[1:] != codes[:-1], True]
+
+    if not field:
+        dTdz = (T[last] - T[first]) / (z[last] - z[first]) * 1000        # Calculate geothermal gradient, °C/km
+        return pd.DataFrame({'longitude[°]': lon[order][first],
+                             'latitude[°]': lat[order][first],
+                             'dTdz[°C/km]': dTdz})
+
+    # gradient at every row, with the same differences as np.gradient within each profile
+    grad = np.full(z.size, np.nan)
+    hs = np.diff(z, prepend = np.nan)                                      # spacing to the row above
+    hd = np.diff(z, append = np.nan)                                       # spacing to the row below
+    Tp = np.r_[np.nan, T[:-1]]
+    Tn = np.r_[T[1:], np.nan]
+
+    inner = ~first & ~last
+    grad[inner] = (hs[inner]**2 * Tn[inner] + (hd[inner]**2 - hs[inner]**2) * T[inner] - hd[inner]**2 * Tp[inner]) / \
+                  (hs[inner] * hd[inner] * (hd[inner] + hs[inner]))
+    top = first & ~last
+    grad[top] = (Tn[top] - T[top]) / hd[top]
+    bottom = last & ~first
+    grad[bottom] = (T[bottom] - Tp[bottom]) / hs[bottom]
+
+    dTdz = np.empty(z.size)
+    dTdz[order] = grad * 1000
+    return pd.DataFrame({'longitude[°]': lon,
+                         'latitude[°]': lat,
+                         'depth[m]': df['Depth(m)'].values,
+                         'dTdz[°C/km]': dTdz})
@@ -0,0 +1,178 @@
+### Import Packages
+import numpy as np
+import xarray as xr
+
+from .profiling import profile_stage
+
+# coordinate names of normalized models, in the axis order of the interpolation array
+GRID_COORDS = ("longitude[°]", "latitude[°]", "depth[m]")
+
+## One axis of a rectilinear model grid
+#  - inputs: strictly increasing coordinate values (at least two)
+#  - uniform axes are located with index arithmetic, others with a binary search
+class GridAxis:
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype = float)
+        if self.values.size < 2 or np.any(np.diff(self.values) <= 0):
+            raise ValueError("Grid axis must have at least two increasing values")
+        steps = np.diff(self.values)
+        self.origin = self.values[0]
+        self.step = (self.values[-1] - self.values[0]) / (self.values.size - 1)
+        self.uniform = bool(np.allclose(steps, self.step, rtol = 1e-9, atol = 0))
+
+    ## Locate query values on the axis
+    #  - inputs: array of query values
+    #  - returns: index of the lower grid node, weight of the upper node, and mask of values outside the axis
+    def locate(self, x):
+        x = np.asarray(x, dtype = float)
+        if self.uniform:
+            i = np.floor((x - self.origin) / self.step)
+            i = np.nan_to_num(i, nan = 0).astype(np.intp)
+        else:
+            i = np.searchsorted(self.values, x, side = "right") - 1
+        i = np.clip(i, 0, self.values.size - 2)
+        x0 = self.values[i]
+        w = (x - x0) / (self.values[i + 1] - x0)
+        outside = (x < self.values[0]) | (x > self.values[-1])
+        return i, w, outside
+
+
+## Trilinear interpolation on the raw model array
+#  - inputs: normalized Xarray Dataset, depth (m) of a virtual surface layer extrapolated from the first two
+#    depths (None for no layer, see surface_layer.py), name of the variable to interpolate
+#  - the surface layer is not stored: its values are extrapolated at the cell corners of the queries above the
+#    shallowest stored depth
+#  - used in place of the Dataset in the query functions: interp() returns the same Dataset that
+#    xarray's Dataset.interp would, and coords / [] give the coordinate arrays for the bounds checks.
+#    Results agree with xarray's linear interpolation to rounding error (within 1e-9 °C for CTM temperatures).
+#    float32 models are interpolated in float32 (within about 1e-4 °C of float64), others in float64.
+class GridInterpolator:
+
+    def __init__(self, xdata, surface = None, var = "temperature[°C]"):
+
+        # sorting copies the array, so only sort when needed (keeps shared or memory-mapped arrays as views)
+        if not all(np.all(np.diff(xdata[name].values) > 0) for name in GRID_COORDS):
+            xdata = xdata.sortby(list(GRID_COORDS))
+        self.var = var
+        self.dims = xdata[var].dims
+        # transpose the NumPy array, which stays a view of memory-mapped arrays
+        data = np.transpose(xdata[var].values, [self.dims.index(name) for name in GRID_COORDS])
+        depths = xdata["depth[m]"].values
+
+        # virtual surface layer: depth node 0 of the axis, before the stored depths
+        self.surface = None
+        if surface is not None and surface < depths[0]:
+            self.surface = (surface - depths[0], depths[1] - depths[0])
+            depths = np.insert(depths, 0, surface)
+
+        self.data = data
+        self.dtype = np.result_type(data.dtype, np.float32)
+        self.axes = {"longitude[°]": GridAxis(xdata["longitude[°]"].values),
+                     "latitude[°]": GridAxis(xdata["latitude[°]"].values),
+                     "depth[m]": GridAxis(depths)}
+        self.coords = {name: axis.values for name, axis in self.axes.items()}
+
+    def __getitem__(self, name):
+        return self.coords[name]
+
+    # values at grid nodes (index arrays, NumPy broadcasting applies); with a surface layer, depth node 0
+    # is extrapolated linearly like interp(..., kwargs = {'fill_value': 'extrapolate'})
+    def _nodes(self, i, j, k):
+        if self.surface is None:
+            return self.data[i, j, k]
+        above = k == 0
+        vals = self.data[i, j, np.maximum(k - 1, 0)]
+        if np.any(above):
+            top0, top1 = self.data[i, j, 0], self.data[i, j, 1]
+            vals = np.where(above, top0 + (top1 - top0) * self.surface[0] / self.surface[1], vals)
+        return vals
+
+    ## Interpolate at points given as broadcastable arrays
+    #  - inputs: longitudes, latitudes, depths (NumPy broadcasting applies)
+    #  - returns: array of interpolated values, NaN outside the model
+    def __call__(self, lons, lats, deps):
+
+        (i, wi, oi), (j, wj, oj), (k, wk, ok) = [self.axes[name].locate(x) for name, x in
+                                                 zip(GRID_COORDS, (lons, lats, deps))]
+        # weights in the type of the model, so the broadcast products of float32 models stay float32
+        wi, wj, wk = [np.asarray(w, dtype = self.dtype) for w in (wi, wj, wk)]
+
+        # weighted sum over the 8 corners of each cell
+        out = 0.0
+        for a, wa in ((0, 1 - wi), (1, wi)):
+            for b, wb in ((0, 1 - wj), (1, wj)):
+                wab = wa * wb
+                for c, wc in ((0, 1 - wk), (1, wk)):
+                    out = out + self._nodes(i + a, j + b, k + c) * (wab * wc)
+
+        out = np.array(out, dtype = self.dtype)
+        out[np.broadcast_to(oi | oj | ok, out.shape)] = np.nan
+        return out
+
+    ## Interpolate like xarray's Dataset.interp
+    #  - inputs: dictionary of {coord: value}, with scalars, 1D arrays (orthogonal) or
+    #    1D DataArrays sharing a new dimension (pointwise)
+    #  - returns: Xarray Dataset with the same dimensions and coordinates as Dataset.interp
+    def interp(self, indexers):
+
+        # output dimensions follow the model's dimension order
+        kinds = {}
+        for name in GRID_COORDS:
+            val = indexers[name]
+            if isinstance(val, xr.DataArray) and val.ndim == 1:
+                kinds[name] = (val.dims[0], val.values)
+            elif np.ndim(val) == 1:
+                kinds[name] = (name, np.asarray(val, dtype = float))
+            else:
+                kinds[name] = (None, float(val))
+        out_dims = []
+        for name in self.dims:
+            dim = kinds[name][0]
+            if dim is not None and dim not in out_dims:
+                out_dims.append(dim)
+
+        # reshape each coordinate to broadcast over the output dimensions
+        args, coords = [], {}
+        for name in GRID_COORDS:
+            dim, val = kinds[name]
+            if dim is None:
+                args.append(val)
+                coords[name] = val
+            else:
+                shape = [1] * len(out_dims)
+                shape[out_dims.index(dim)] = val.size
+                args.append(val.reshape(shape))
+                coords[name] = (dim, val)
+
+        return xr.Dataset({self.var: (out_dims, self(*args))}, coords = coords)
+
+
+## Find the model grid nodes matching query values
+#  - inputs: query values, model coordinate values (any order), tolerance
+#  - returns: indices of the matching nodes in the model coordinates, or None if any value is not on a node
+def grid_node_indices(vals, grid, atol = 1e-9):
+
+    vals = np.asarray(vals, dtype = float)
+    grid = np.asarray(grid, dtype = float)
+    order = np.argsort(grid, kind = "stable")
+    sgrid = grid[order]
+
+    # nearest node of each value
+    i = np.clip(np.searchsorted(sgrid, vals), 1, sgrid.size - 1)
+    i = np.where(np.abs(sgrid[i - 1] - vals) <= np.abs(sgrid[i] - vals), i - 1, i)
+
+    if np.all(np.abs(sgrid[i] - vals) <= atol):
+        return order[i]
+    return None
+
+
+## Get the grid interpolator of a registered model, building it on first use
+#  - inputs: CTMModel (with the surface layer of the model, if any)
+#  - returns: GridInterpolator
+def get_grid_interpolator(model):
+    key = ("grid_interpolator", model.surface)
+    if key not in model.cache:
+        with profile_stage("grid_interpolator"):
+            model.cache[key] = GridInterpolator(model.xdata, surface = model.surface)
+    return model.cache[key]
@@ -0,0 +1,112 @@
+# Import package
+import warnings
+import numpy as np
+
+from .dTdz_2D_cross_section import dTdz_profiles, dTdz_2D_cross_section
+
+# query types whose CSV header statistics are computed with the result
+HEADER_QUERIES = ('1D_vertical', '1D_profiles', '2D_horizontal', '2D_map', '2D_vertical')
+
+## Minimum, maximum and mean of values, skipping NaN like the pandas Series methods (same summation, in the type
+## of the values); the contiguous array is reduced in place, NaN values only cost a filled copy
+#  - inputs: array
+#  - returns: dictionary with T_min, T_max, T_mean
+def value_stats(values):
+
+    values = np.ravel(values)
+    mask = np.isnan(values)
+    nvalid = values.size - int(np.count_nonzero(mask))
+    if nvalid == 0:
+        return {"T_min": np.nan, "T_max": np.nan, "T_mean": np.nan}
+    if nvalid < values.size:
+        return {"T_min": np.where(mask, np.inf, values).min(),
+                "T_max": np.where(mask, -np.inf, values).max(),
+                "T_mean": np.where(mask, 0, values).sum(dtype = values.dtype) / values.dtype.type(nvalid)}
+    return {"T_min": values.min(),
+            "T_max": values.max(),
+            "T_mean": values.sum(dtype = values.dtype) / values.dtype.type(nvalid)}
+
+## Length of a track along its geodesic steps
+#  - inputs: longitude and latitude arrays of the track points
+#  - returns: length (m)
+def track_length(lons, lats):
+    from pyproj import Geod
+    return Geod(ellps = 'WGS84').line_length(lons, lats)
+
+## CSV header statistics of a gridded result, from the axes of the grid and one reduction of the temperatures
+#  - inputs: Xarray Dataset of the result, its temperatures (or map values) flattened in the order of the rows,
+#    query type (one of HEADER_QUERIES)
+#  - returns: dictionary of the header statistics (as from frame_stats)
+def grid_stats(xi, temps, qtype):
+
+    stats = value_stats(temps)
+
+    if qtype == '1D_vertical':
+        stats["depths"] = np.unique(xi["depth[m]"].values)
+
+    elif qtype == '1D_profiles':
+        stats["depths"] = np.unique(xi["depth[m]"].values)
+        stats["nsite"] = xi.sizes["site"]
+
+    elif qtype in ('2D_horizontal', '2D_map'):
+        stats["lons"] = np.unique(xi["longitude[°]"].values)
+        stats["lats"] = np.unique(xi["latitude[°]"].values)
+
+    elif qtype == '2D_vertical':
+        dims = tuple(xi.dims)
+        depths = xi["depth[m]"].values
+        stats["depths"] = np.unique(depths)
+
+        # track points in the order of the rows (the first and last rows are the ends of the track)
+        lons, lats = xi["longitude[°]"].values, xi["latitude[°]"].values
+        stats.update(lon1 = lons[0], lon2 = lons[-1], lat1 = lats[0], lat2 = lats[-1])
+        _, first = np.unique(np.stack([lons, lats], axis = 1), axis = 0, return_index = True)
+        track = np.sort(first)
+        stats["npts_track"] = track.size
+        stats["track_length"] = track_length(lons[track], lats[track])
+
+        # end-member gradient of each profile of the (track, depth) grid
+        grid = np.asarray(temps).reshape([xi.sizes[dim] for dim in dims])
+        grid = np.moveaxis(grid, dims.index("depth[m]"), -1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats["dTdz_max"] = np.nanmax(dTdz_profiles(grid, depths))
+
+    else:
+        raise ValueError('Undefined query type', qtype)
+
+    return stats
+
+## CSV header statistics of rows in the output columns of call_func, for results without precomputed statistics
+#  - inputs: DataFrame (or QueryResult), query type (one of HEADER_QUERIES; the values of a '2D_map' are in its
+#    third column)
+#  - returns: dictionary of the header statistics
+def frame_stats(df, qtype):
+
+    T = df[df.columns[2]] if qtype == '2D_map' else df['Temperature(°C)']
+    stats = {"T_min": T.min(), "T_max": T.max(), "T_mean": T.mean()}
+
+    if qtype == '1D_vertical':
+        stats["depths"] = np.sort(df['# Depth(m)'].unique())
+
+    elif qtype == '1D_profiles':
+        stats["depths"] = np.sort(df['Depth(m)'].unique())
+        stats["nsite"] = df['# Site'].nunique()
+
+    elif qtype in ('2D_horizontal', '2D_map'):
+        stats["lons"] = np.sort(df['# Lon'].unique())
+        stats["lats"] = np.sort(df['Lat'].unique())
+
+    elif qtype == '2D_vertical':
+        stats["depths"] = np.sort(df['Depth(m)'].unique())
+        stats.update(lon1 = df['# Lon'].iloc[0], lon2 = df['# Lon'].iloc[-1],
+                     lat1 = df['Lat'].iloc[0], lat2 = df['Lat'].iloc[-1])
+        track = df[['# Lon', 'Lat']].drop_duplicates()
+        stats["npts_track"] = len(track)
+        stats["track_length"] = track_length(track['# Lon'].values, track['Lat'].values)
+        stats["dTdz_max"] = dTdz_2D_cross_section(df)['dTdz[°C/km]'].max()
+
+    else:
+        raise ValueError('Undefined query type', qtype)
+
+    return stats
@@ -0,0 +1,204 @@
+### Import Packages
+import contextlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from .Initiation import init_ctm, cast_ctm
+from .surface_layer import surface_depth
+
+## Handle to a normalized model held by a registry
+#  - inputs: model name, absolute model path, file modification time, normalized Xarray Dataset, data type the
+#    temperatures were cast to (None: as in the file)
+#  - attributes: the inputs, plus nbytes (size of the dataset), surface (depth of the virtual surface layer added
+#    by the queries, or None; see surface_layer.py), cache (dict for objects derived from the dataset), users
+#    (number of open ModelRegistry.hold scopes using it) and evicted (removed from its registry, closed when
+#    the last user releases it)
+class CTMModel:
+
+    def __init__(self, modelname, modelpath, mtime, xdata, dtype = None):
+        self.modelname = modelname
+        self.modelpath = modelpath
+        self.mtime = mtime
+        self.xdata = xdata
+        self.dtype = None if dtype is None else np.dtype(dtype).name
+        self.nbytes = int(xdata.nbytes)
+        self.surface = surface_depth(modelname, xdata)
+        self.cache = {}
+        self.users = 0
+        self.evicted = False
+
+    # registry key of this model
+    @property
+    def key(self):
+        return (self.modelname, self.modelpath, self.mtime, self.dtype)
+
+    def __repr__(self):
+        return "CTMModel({:}, {:}, {:.1f} MB)".format(self.modelname, self.modelpath, self.nbytes / 1e6)
+
+
+## Process-wide store of normalized models with least-recently-used eviction
+#  - inputs: maximum number of models to keep, maximum total dataset size in bytes (None for no limit)
+#  - the most recently used model is always kept, even when it alone exceeds max_bytes
+#  - a model got inside a hold scope (e.g. one request of ctm_serve.py) is not closed when it is evicted
+#    while the scope is open, so other threads can evict it while it is queried
+class ModelRegistry:
+
+    def __init__(self, max_entries = 8, max_bytes = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self._scopes = threading.local()
+
+    ## Get a model, opening and normalizing it with init_ctm on a miss
+    #  - inputs: model name, model path (or a CTMModel, which is returned as is, or cast with cast_model),
+    #    data type of the temperatures (e.g. 'float32'; None: as in the file); each data type of a model is a
+    #    separate entry
+    #  - returns: CTMModel
+    def get(self, modelname, modelpath, dtype = None):
+
+        # already a handle
+        if isinstance(modelpath, CTMModel):
+            with self._lock:
+                return self._acquire(cast_model(modelpath, dtype))
+
+        # the file modification time is part of the key, so a rewritten model is reopened
+        path = os.path.abspath(modelpath)
+        key = (modelname, path, os.stat(path).st_mtime_ns, None if dtype is None else np.dtype(dtype).name)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return self._acquire(model)
+
+            self.misses += 1
+            model = CTMModel(modelname, path, key[2], init_ctm(modelname, path, dtype), dtype)
+
+            # drop stale entries of the same file
+            for old in [k for k in self._models if k[:2] == key[:2] and k[2] != key[2]]:
+                self._close(old)
+
+            self._models[key] = model
+            self._acquire(model)
+            self._evict()
+
+        return model
+
+    ## Keep the models got by the current thread open until the end of a block, even when they are evicted
+    #  - returns: context manager
+    @contextlib.contextmanager
+    def hold(self):
+
+        scopes = self._scopes.__dict__.setdefault('stack', [])
+        scopes.append([])
+        try:
+            yield
+        finally:
+            held = scopes.pop()
+            with self._lock:
+                for model in held:
+                    model.users -= 1
+                    if model.evicted and model.users == 0:
+                        model.xdata.close()
+
+    ## Register a model ahead of the first query
+    #  - inputs: model name, model path, data type of the temperatures
+    #  - returns: CTMModel handle that can be passed to the query functions in place of the path
+    def register(self, modelname, modelpath, dtype = None):
+        return self.get(modelname, modelpath, dtype)
+
+    ## Change the limits and evict models as needed
+    #  - inputs: maximum number of models, maximum total size in bytes
+    #  - returns: None
+    def configure(self, max_entries = None, max_bytes = None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    ## Remove all models and reset the counters
+    #  - returns: None
+    def clear(self):
+        with self._lock:
+            for key in list(self._models):
+                self._close(key)
+            self.hits = self.misses = self.evictions = 0
+
+    ## Registry statistics
+    #  - returns: dictionary with hits, misses, evictions, entries and nbytes
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(self._models),
+                    "nbytes": self.nbytes}
+
+    # total size of all registered models
+    @property
+    def nbytes(self):
+        return sum(m.nbytes for m in self._models.values())
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, key):
+        return key in self._models
+
+    # evict least recently used models until within limits
+    def _evict(self):
+        while len(self._models) > 1 and (
+                len(self._models) > self.max_entries or
+                (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            self._close(next(iter(self._models)))
+            self.evictions += 1
+
+    # count a use of a model by the innermost hold scope of the current thread
+    def _acquire(self, model):
+        scopes = getattr(self._scopes, 'stack', None)
+        if scopes:
+            model.users += 1
+            scopes[-1].append(model)
+        return model
+
+    # remove a model and release its file handle, or leave that to the last hold scope using it
+    def _close(self, key):
+        model = self._models.pop(key)
+        model.evicted = True
+        if model.users == 0:
+            model.xdata.close()
+
+
+## Model with its temperatures in a data type
+#  - inputs: CTMModel, data type (None: as the model is)
+#  - returns: the CTMModel itself when its temperatures already have this type, else a handle on the cast
+#    dataset, kept in the cache of the model
+def cast_model(model, dtype = None):
+
+    if dtype is None or all(var.dtype == np.dtype(dtype) for var in model.xdata.data_vars.values()):
+        return model
+
+    key = ("cast", np.dtype(dtype).name)
+    if key not in model.cache:
+        cast = CTMModel(model.modelname, model.modelpath, model.mtime, cast_ctm(model.xdata.copy(), dtype), dtype)
+        cast.surface = model.surface
+        model.cache[key] = cast
+    return model.cache[key]
+
+
+# default registry used by the query functions
+default_registry = ModelRegistry()
+
+## Get a model from the default registry
+#  - inputs: model name, model path or CTMModel, data type of the temperatures (None: as in the file)
+#  - returns: CTMModel
+def get_model(modelname, modelpath, dtype = None):
+    return default_registry.get(modelname, modelpath, dtype)
@@ -0,0 +1,218 @@
+### Import Packages
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# environment variable enabling the instrumentation for a whole process: "1" prints a summary on stderr
+# at exit, any other value is the path of a JSON report
+PROFILE_ENV = "CTM_PROFILE"
+
+# process-wide state: enabled flag, report output, and the records since profiling was enabled
+_state = {"enabled": False, "output": None, "records": []}
+_lock = threading.Lock()
+_hooks = []
+_local = threading.local()
+_null = contextlib.nullcontext()
+
+# peak resident set size of the process so far, in bytes (None where unavailable)
+def _peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# names of the stages open in this thread
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+## One timed stage; nested stages are named by their path, e.g. "model/open"
+class _Stage:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = _stack()
+        stack.append(self.name)
+        self.path = "/".join(stack)
+        self.rss0 = _peak_rss()
+        self.cpu0 = time.process_time()
+        self.wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall0
+        cpu = time.process_time() - self.cpu0
+        peak = _peak_rss()
+        _stack().pop()
+        _emit({"stage": self.path, "wall": wall, "cpu": cpu, "peak_rss": peak,
+               "rss_growth": None if peak is None else peak - self.rss0})
+        return False
+
+# pass a finished stage to the process-wide records, the collectors of this thread and the hooks
+def _emit(record):
+    if _state["enabled"]:
+        with _lock:
+            _state["records"].append(record)
+    for records in getattr(_local, "collectors", ()):
+        records.append(record)
+    for hook in list(_hooks):
+        hook(record)
+
+## Time a stage of a query: wall time, CPU time (process) and peak RSS
+#  - inputs: stage name
+#  - returns: context manager; does nothing unless profiling is enabled, collected in this thread, or hooked
+def profile_stage(name):
+    if _state["enabled"] or _hooks or getattr(_local, "collectors", None):
+        return _Stage(name)
+    return _null
+
+## Enable profiling in this process
+#  - inputs: report output: "-" for a summary on stderr, or a JSON file path
+#  - returns: None
+def enable_profiling(output = "-"):
+    with _lock:
+        _state.update(enabled = True, output = output, records = [])
+
+## Disable profiling
+#  - returns: records collected since profiling was enabled
+def disable_profiling():
+    with _lock:
+        records = _state["records"]
+        _state.update(enabled = False, output = None, records = [])
+    return records
+
+## Register a function called with each stage record (a dictionary with stage, wall, cpu, peak_rss and
+## rss_growth), e.g. for the query server or batch runner to aggregate the numbers; registering a hook
+## turns the instrumentation on
+#  - inputs: function
+#  - returns: None
+def add_profile_hook(func):
+    _hooks.append(func)
+
+## Remove a hook registered with add_profile_hook
+#  - inputs: function
+#  - returns: None
+def remove_profile_hook(func):
+    if func in _hooks:
+        _hooks.remove(func)
+
+## Collect the stages run by this thread in a block (works with profiling disabled), and by the functions it
+## hands to other threads with propagate_profile
+#  - returns: context manager yielding the list the records are appended to
+@contextlib.contextmanager
+def collect_profile():
+    if not hasattr(_local, "collectors"):
+        _local.collectors = []
+    records = []
+    _local.collectors.append(records)
+    try:
+        yield records
+    finally:
+        _local.collectors.remove(records)
+
+## Wrap a function run by another thread (e.g. on a thread pool) so its stages go to the collectors of this
+## thread, nested in the stages open here
+#  - inputs: function
+#  - returns: function
+def propagate_profile(func):
+
+    collectors = list(getattr(_local, "collectors", ()))
+    stack = list(_stack())
+    if not collectors:
+        return func
+
+    def run(*args, **kwargs):
+        previous = (getattr(_local, "collectors", []), _stack())
+        _local.collectors, _local.stack = previous[0] + collectors, list(stack)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.collectors, _local.stack = previous
+    return run
+
+## Aggregate stage records
+#  - inputs: list of records (default: the records since profiling was enabled)
+#  - returns: dictionary of {stage: {calls, wall, cpu, peak_rss, rss_growth}} in order of first use;
+#    times are summed, peak RSS and its growth are the maxima
+def profile_summary(records = None):
+
+    if records is None:
+        records = _state["records"]
+
+    summary = {}
+    for rec in records:
+        agg = summary.setdefault(rec["stage"], {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": None, "rss_growth": None})
+        agg["calls"] += rec.get("calls", 1)
+        agg["wall"] += rec["wall"]
+        agg["cpu"] += rec["cpu"]
+        for key in ("peak_rss", "rss_growth"):
+            if rec[key] is not None:
+                agg[key] = rec[key] if agg[key] is None else max(agg[key], rec[key])
+
+    return summary
+
+## Format an aggregated profile as a table
+#  - inputs: dictionary from profile_summary
+#  - returns: text
+def format_profile(summary):
+
+    lines = ["{:<36s} {:>6s} {:>10s} {:>10s} {:>14s} {:>12s}".format(
+             "stage", "calls", "wall (s)", "cpu (s)", "peak RSS (MB)", "growth (MB)")]
+    mb = lambda val: "{:.1f}".format(val / 1e6) if val is not None else "-"
+    for stage, agg in summary.items():
+        lines.append("{:<36s} {:>6d} {:>10.4f} {:>10.4f} {:>14s} {:>12s}".format(
+                     stage, agg["calls"], agg["wall"], agg["cpu"], mb(agg["peak_rss"]), mb(agg["rss_growth"])))
+    return "\n".join(lines) + "\n"
+
+## Report the profile: a summary table on stderr, or a JSON file with the summary and all records
+#  - inputs: output ("-" for stderr, or a JSON path; default: the output given to enable_profiling),
+#    records (default: the records since profiling was enabled)
+#  - returns: dictionary from profile_summary
+def report_profile(output = None, records = None):
+
+    output = output or _state["output"] or "-"
+    records = list(_state["records"]) if records is None else records
+    summary = profile_summary(records)
+
+    if output == "-":
+        sys.stderr.write(format_profile(summary))
+    else:
+        with open(output, "w") as f:
+            json.dump({"stages": summary, "records": records}, f, indent = 1)
+    return summary
+
+## Profile a block, e.g. a command line run with --profile; only the stages of this thread (and of the functions
+## it hands to other threads with propagate_profile) are reported, so concurrent queries of a server do not mix
+#  - inputs: report output ("-" for stderr, a JSON path, or None to leave profiling as it is)
+#  - returns: context manager; the report is written when the block ends, also after an error
+@contextlib.contextmanager
+def profiling(output):
+
+    if not output:
+        yield
+        return
+
+    # profiling enabled for the whole process also keeps the records of the block
+    with collect_profile() as records:
+        try:
+            yield
+        finally:
+            report_profile(output, records)
+
+
+# enable for the whole process from the environment
+if os.environ.get(PROFILE_ENV):
+    import atexit
+    enable_profiling("-" if os.environ[PROFILE_ENV] == "1" else os.environ[PROFILE_ENV])
+    atexit.register(lambda: _state["enabled"] and report_profile())
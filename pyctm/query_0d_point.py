@@ -0,0 +1,260 @@
+#
+#  query_0d_point.py: point queries ('ctm point', ctm_plotting/query_0d_point.py)
+#
+
+from .model_registry import get_model
+from .surface_layer import query_dataset, cast_result
+from .Value_check import check_inbounds_values, check_inbounds_mask
+from .profiling import profile_stage, profiling
+
+### Import Packages
+import pandas as pd
+import numpy as np
+import xarray as xr
+import json
+import argparse
+import os
+import sys
+
+# model name abbreviations used in the JSON output
+model_abbr = {'Lee_2026': 'lee2026',
+              'Shinevar_2018': 'shinevar2018',
+              'Shinevar_2024': 'shinevar2024',
+              'Boyd_2019': 'boyd2019',
+              'Suietal_2025': 'suietal2025'}
+
+## Query the model at a single point
+#  - Inputs: latitude, longitude, depth to query model, modelname, input model path (or registered CTMModel), and output JSON file path (optional),
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file)
+#  - Returns: None. Create a JSON file if output path is defined
+def query_0D_point(lat, lon, dep, modelname, modelpath, engine = 'xarray', dtype = None):
+
+    # initialize dataset, with the surface layer for models that need it
+    xdata = init_points_dataset(modelname, modelpath, engine, [dep], dtype)
+
+    # check validity of query
+    check_inbounds_values(xdata, {"longitude[°]": [lon], "latitude[°]": [lat], "depth[m]": [dep]})
+
+    # interpolate a single point
+    with profile_stage("interp"):
+        temp = float(xdata.interp({"longitude[°]": lon, "latitude[°]": lat, "depth[m]": dep})["temperature[°C]"])
+
+    # return in DataFrame format
+    return pd.DataFrame({"longitude[°]": [lon], "latitude[°]": [lat], "depth[m]": [dep], "temperature[°C]": [temp]})
+
+## Prepare the dataset for point queries (shared by all chunks of a bulk query)
+#  - Inputs: modelname, input model path (or registered CTMModel), interpolation engine ('xarray' or 'fast'),
+#    depths of the points (None when not known in advance), data type of the model temperatures
+#  - Returns: Xarray Dataset, or GridInterpolator for the fast engine
+def init_points_dataset(modelname, modelpath, engine = 'xarray', depths = None, dtype = None):
+
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+
+    # models that do not start at the surface (Boyd (2019)) get their surface layer when the query reaches above
+    # the shallowest stored depth; the fast engine stands in for the Dataset
+    xdata = query_dataset(model, engine, depths)
+
+    return xdata
+
+## Interpolate many points at once
+#  - Inputs: prepared Xarray Dataset, arrays of latitude, longitude, depth, and what to do with points outside
+#    the model: 'raise' (error on the first one) or 'nan' (NaN temperature for these rows)
+#  - Returns: DataFrame with temperature at these points (in the floating-point type of the model), in input order
+def interp_points(xdata, lats, lons, deps, bounds = 'raise'):
+
+    lats = np.asarray(lats, dtype = float)
+    lons = np.asarray(lons, dtype = float)
+    deps = np.asarray(deps, dtype = float)
+
+    # check validity of query, all points at once
+    values = {"longitude[°]": lons, "latitude[°]": lats, "depth[m]": deps}
+    if bounds == 'raise':
+        check_inbounds_values(xdata, values)
+    elif bounds == 'nan':
+        with profile_stage("bounds_check"):
+            valid = check_inbounds_mask(xdata, values)
+    else:
+        raise ValueError('Undefined bounds policy', bounds)
+
+    # one pointwise interpolation over all points
+    with profile_stage("interp"):
+        xi = xdata.interp({"longitude[°]": xr.DataArray(lons, dims = "points"),
+                           "latitude[°]": xr.DataArray(lats, dims = "points"),
+                           "depth[m]": xr.DataArray(deps, dims = "points")})
+        temps = cast_result(xi, xdata)["temperature[°C]"].values
+    if bounds == 'nan':
+        temps = np.where(valid, temps, np.nan)
+
+    return pd.DataFrame({"longitude[°]": lons, "latitude[°]": lats, "depth[m]": deps, "temperature[°C]": temps})
+
+## Query the model at many points with one vectorized interpolation
+#  - Inputs: arrays of latitude, longitude, depth, modelname, input model path (or registered CTMModel),
+#    interpolation engine, bounds policy ('raise' or 'nan', see interp_points), data type of the model temperatures
+#  - Returns: DataFrame with temperature at these points, in input order
+def query_0D_points(lats, lons, deps, modelname, modelpath, engine = 'xarray', bounds = 'raise', dtype = None):
+    return interp_points(init_points_dataset(modelname, modelpath, engine, deps, dtype), lats, lons, deps, bounds)
+
+## Query the model at all points of a CSV file, streaming the results in chunks
+#  - Inputs: input CSV path (columns lat, lon, z), output path (None for JSON lines on stdout), modelname,
+#    input model path (or registered CTMModel), output format ('csv', 'jsonl', 'parquet' or 'binary'; default from
+#    the output file extension), number of points per chunk, interpolation engine, stream used when there is no output path,
+#    bounds policy ('raise' or 'nan', see interp_points), data type of the model temperatures (and of binary output)
+#  - Returns: number of points queried
+def query_0D_points_file(infile, outpath, modelname, modelpath, outformat = None, chunksize = 100000, engine = 'xarray',
+                         stdout = None, bounds = 'raise', dtype = None):
+
+    xdata = init_points_dataset(modelname, modelpath, engine, dtype = dtype)
+
+    # output format from the file extension
+    if outformat is None:
+        ext = os.path.splitext(outpath)[1].lower() if outpath else '.jsonl'
+        outformat = {'.json': 'jsonl', '.jsonl': 'jsonl', '.parquet': 'parquet', '.bin': 'binary'}.get(ext, 'csv')
+
+    writer = points_writer(outpath, outformat, modelname, stdout, dtype)
+    npts = 0
+    try:
+        for chunk in pd.read_csv(infile, chunksize = chunksize, skipinitialspace = True):
+            df = interp_points(xdata, chunk['lat'].values, chunk['lon'].values, chunk['z'].values, bounds)
+            with profile_stage("write_points"):
+                writer(df)
+            npts += len(df)
+    finally:
+        writer(None)
+
+    return npts
+
+## Make a chunk writer for bulk point output
+#  - Inputs: output path (None for stdout), output format, modelname, stream used when there is no output path,
+#    data type of all columns of binary output (default: that of the temperatures)
+#  - Returns: function taking a query DataFrame per chunk, and None to close the output
+def points_writer(outpath, outformat, modelname, stdout = None, dtype = None):
+
+    rename = {'longitude[°]': 'lon',
+              'latitude[°]': 'lat',
+              'depth[m]': 'Z',
+              'temperature[°C]': 'temp'}
+
+    if outformat == 'binary':
+        if not outpath:
+            raise ValueError('Binary output requires an output path', outformat)
+        from .binary_output import binary_points_writer
+        return binary_points_writer(outpath, '0D_points', modelname, rename, dtype)
+
+    if outformat == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires the pyarrow package")
+        state = {'writer': None}
+
+        def write(df):
+            if df is None:
+                if state['writer'] is not None:
+                    state['writer'].close()
+                return
+            table = pa.Table.from_pandas(df.rename(columns = rename), preserve_index = False)
+            if state['writer'] is None:
+                state['writer'] = pq.ParquetWriter(outpath, table.schema)
+            state['writer'].write_table(table)
+
+        return write
+
+    if outformat not in ('csv', 'jsonl'):
+        raise ValueError('Undefined output format', outformat)
+
+    f = open(outpath, 'w') if outpath else (stdout or sys.stdout)
+    state = {'header': True}
+
+    def write(df):
+        if df is None:
+            if outpath:
+                f.close()
+            return
+        df = df.rename(columns = rename)
+        if outformat == 'csv':
+            df.to_csv(f, header = state['header'], index = False, float_format = "%.6f", na_rep = np.nan)
+            state['header'] = False
+        else:
+            if modelname in model_abbr:
+                df['model'] = model_abbr[modelname]
+            if len(df):
+                text = df.to_json(orient = 'records', lines = True)
+                f.write(text if text.endswith('\n') else text + '\n')
+
+    return write
+
+## Command line interface
+#  - inputs: argument list (default sys.argv), stream for printed output (default sys.stdout)
+def call_func(argv = None, stdout = None):
+    
+    par = argparse.ArgumentParser()
+    par.add_argument('--lat', type = float, required = False)         # Add argument of latitude (°)
+    par.add_argument('--lon', type = float, required = False)         # Add argument of longitude (°)
+    par.add_argument('--z', type = float, required = False)           # Add arugment of depth (m)
+    par.add_argument('--modelname', type = str, required = True)      # Add argument of model name: Lee_2025 or Shinevar_2018
+    par.add_argument('--modelpath', type = str, required = True)      # Add argument of input model path
+    par.add_argument('--outpath', type = str, required = False)       # Add argument of output file path and file name
+    par.add_argument('--engine', type = str, default = 'xarray',      # Add argument of interpolation engine: xarray or fast
+                     choices = ['xarray', 'fast'])
+    par.add_argument('--infile', type = str, required = False)        # Add argument of input CSV of points (columns lat, lon, z)
+    par.add_argument('--outformat', type = str, required = False,     # Add argument of bulk output format (default from --outpath)
+                     choices = ['csv', 'jsonl', 'parquet', 'binary'])
+    par.add_argument('--chunksize', type = int, default = 100000)     # Add argument of points per chunk for bulk queries
+    par.add_argument('--bounds', type = str, default = 'raise',       # Add argument of bulk policy for points outside the model
+                     choices = ['raise', 'nan'])
+    par.add_argument('--dtype', type = str, required = False,         # Add argument of data type of the temperatures (default as in the model file)
+                     choices = ['float32', 'float64'])
+    par.add_argument('--profile', type = str, nargs = '?', const = '-')# Add argument of stage timings: summary on stderr, or JSON output path
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    # optional stage timings
+    with profiling(args.profile):
+        # Bulk mode: query all points of the input file
+        if args.infile:
+            query_0D_points_file(args.infile, args.outpath, args.modelname, args.modelpath,
+                                 outformat = args.outformat, chunksize = args.chunksize, engine = args.engine,
+                                 stdout = stdout, bounds = args.bounds, dtype = args.dtype)
+            return
+
+        if args.lat is None or args.lon is None or args.z is None:
+            par.error('--lat, --lon and --z are required unless --infile is given')
+    
+        # Call the function
+        df = query_0D_point(
+            args.lat,
+            args.lon,
+            args.z,
+            args.modelname,
+            args.modelpath,
+            engine = args.engine,
+            dtype = args.dtype)
+
+        # Rename df column name
+        rename = {'longitude[°]': 'lon',
+                  'latitude[°]': 'lat',
+                  'depth[m]': 'Z',
+                  'temperature[°C]': 'temp'}
+        df = df.rename(columns = rename)
+
+        # Make it become a dictionary
+        df_dict = df.iloc[0].to_dict()
+
+        # Append model name to the output
+        if args.modelname in model_abbr:
+            df_dict['model'] = model_abbr[args.modelname]
+        
+        # Save as json file
+        if args.outpath:
+            with open(args.outpath, 'w') as f:
+                json.dump(df_dict, f, separators = (',', ':'))
+        # Or just print it if didn't define output path
+        else:
+                print(json.dumps(df_dict, separators = (',', ':')), file = stdout or sys.stdout)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
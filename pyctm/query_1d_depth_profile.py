@@ -0,0 +1,243 @@
+#
+#  query_1d_depth_profile.py: vertical profiles ('ctm profile', ctm_plotting/query_1d_depth_profile.py)
+#
+
+from .model_registry import get_model
+from .surface_layer import query_dataset, cast_result
+from .Value_check import check_inbounds_values
+from .write_csv_output import write_csv_output, derived_outpath
+from .profiling import profile_stage, profiling
+from .query_result import QueryResult
+from .header_stats import grid_stats
+from .result_cache import cached_outputs, query_params, csv_outpaths
+
+### Import Packages
+import pandas as pd
+import numpy as np
+import xarray as xr
+import argparse
+import os
+
+## depths of a vertical profile (the end depth is included)
+#  - inputs: start, end and step of the depths
+#  - returns: depth array
+def profile_depths(z_start, z_end, z_step):
+    return np.arange(z_start, z_end+z_step/10.0, z_step)
+
+## query the model along a vertical profile with fixed longitude and latitude
+#  - inputs: longitude, latitude, depths (start, stop, and step), model name, model path or registered CTMModel, interpolation engine ('xarray' or 'fast'); option to plot,
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file)
+#  - returns: QueryResult with temperature at these points (.to_dataframe() for a DataFrame); optional figure
+def query_1D_vertical_profile(lat, lon, z_start, z_end, z_step, modelname, modelpath, plot = False, engine = 'xarray', dtype = None):
+    
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+
+    # models that do not start at the surface (Boyd (2019)) get their surface layer when the query reaches above
+    # the shallowest stored depth; the fast engine stands in for the Dataset
+    xdata = query_dataset(model, engine, [z_start, z_end])
+
+    # check validity of query
+    check_inbounds_values(xdata, {"longitude[°]": [lon], "latitude[°]": [lat], "depth[m]": [z_start, z_end]})
+    zvals = profile_depths(z_start, z_end, z_step)
+    with profile_stage("interp"):
+        xi = cast_result(xdata.interp({"longitude[°]": lon, "latitude[°]": lat, "depth[m]": zvals}), xdata)
+
+    # define columns to return
+    with profile_stage("to_columns"):
+        df = QueryResult.from_dataset(xi, ['longitude[°]', 'latitude[°]', 'depth[m]', 'temperature[°C]'], '1D_vertical')
+
+    # return    
+    if plot: # optional plot
+        from .test_plot import test_plot
+        fig = test_plot(xi, '1D_vertical')
+        return df, fig
+    else:
+        return df
+
+## query the model along vertical profiles at many sites with one interpolation: the sites are a new dimension
+## of a pointwise interpolation sharing the depth vector, so the model is opened and checked once
+#  - inputs: latitudes and longitudes of the sites, depths (m, shared by all sites), model name, model path or registered CTMModel,
+#    interpolation engine ('xarray' or 'fast'), site names (default: their index), data type of the model temperatures
+#  - returns: Xarray Dataset with temperature on the (site, depth) grid, and the longitude and latitude of each site
+def query_1D_vertical_profiles(lats, lons, depths, modelname, modelpath, engine = 'xarray', names = None, dtype = None):
+
+    lats = np.atleast_1d(np.asarray(lats, dtype = float))
+    lons = np.atleast_1d(np.asarray(lons, dtype = float))
+    zvals = np.atleast_1d(np.asarray(depths, dtype = float))
+    names = [str(i) for i in range(lats.size)] if names is None else [str(name) for name in names]
+    if len(set(names)) != len(names):
+        raise ValueError('Duplicate site names', names)
+
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+    xdata = query_dataset(model, engine, zvals)
+
+    # check validity of query, all sites at once
+    check_inbounds_values(xdata, {"longitude[°]": lons, "latitude[°]": lats, "depth[m]": [zvals.min(), zvals.max()]})
+
+    with profile_stage("interp"):
+        xi = xdata.interp({"longitude[°]": xr.DataArray(lons, dims = "site"),
+                           "latitude[°]": xr.DataArray(lats, dims = "site"),
+                           "depth[m]": zvals})
+        xi = cast_result(xi, xdata)
+
+    return xi[["temperature[°C]"]].transpose("site", "depth[m]").assign_coords({"site": names})
+
+## output path of one site: '{site}' in the path is replaced by the site name, otherwise '_<site>' is added before
+## the extension
+#  - inputs: output path, site name
+#  - returns: output path for this site
+def site_outpath(outpath, site):
+    if '{site}' in outpath:
+        return outpath.replace('{site}', site)
+    root, ext = os.path.splitext(outpath)
+    return '{:}_{:}{:}'.format(root, site, ext)
+
+## path of the final CSV file of a profile (the file without dummy columns)
+#  - inputs: output path
+#  - returns: final output path
+def profile_final_outpath(outpath):
+    return derived_outpath(outpath, 'matprops', 'matprops_final')
+
+## output files written by call_func for many sites, for the result cache
+#  - inputs: output path, site names, layout ('files' or 'long')
+#  - returns: dictionary of {name: output path}
+def profiles_outpaths(outpath, names, layout = 'files'):
+    if layout == 'long':
+        return {'table': outpath}
+    outpaths = {}
+    for site in names:
+        path = site_outpath(outpath, site)
+        outpaths.update(csv_outpaths(path, profile_final_outpath(path), '_' + site))
+    return outpaths
+
+## write profiles of many sites: 'files' writes one pair of CSV files per site in the format of a single
+## profile (with its header and average dT/dz), 'long' one table with a row per site and depth
+#  - inputs: Dataset from query_1D_vertical_profiles, output path, model name, layout ('files' or 'long')
+#  - returns: None
+def write_profiles(xi, outpath, modelname, layout = 'files'):
+
+    temps = xi["temperature[°C]"].values
+    zvals = xi["depth[m]"].values
+    names = [str(site) for site in xi["site"].values]
+    lons, lats = xi["longitude[°]"].values, xi["latitude[°]"].values
+
+    if layout == 'files':
+        for k, site in enumerate(names):
+            df = QueryResult.from_dataset(xi.isel({"site": k}), ['depth[m]', 'temperature[°C]'], '1D_vertical')
+            df = df.rename(columns = {'depth[m]': '# Depth(m)', 'temperature[°C]': 'Temperature(°C)'})
+            path = site_outpath(outpath, site)
+            write_csv_output(df, profile_final_outpath(path), '1D_vertical', modelname, dummy_outfile = path,
+                             longitude = lons[k], latitude = lats[k])
+
+    elif layout == 'long':
+        nsite, ndep = temps.shape
+        df = QueryResult({'# Site': np.repeat(names, ndep),
+                           'Lon': np.repeat(lons, ndep),
+                           'Lat': np.repeat(lats, ndep),
+                           'Depth(m)': np.tile(zvals, nsite),
+                           'Temperature(°C)': temps.ravel()},
+                         stats = grid_stats(xi, temps.ravel(), '1D_profiles'))
+        write_csv_output(df, outpath, '1D_profiles', modelname)
+
+    else:
+        raise ValueError('Undefined output layout', layout)
+
+## read the sites of a multi-profile query
+#  - inputs: CSV path with columns lat, lon and optionally name
+#  - returns: latitudes, longitudes, names (default: the row number)
+def read_sites(infile):
+    sites = pd.read_csv(infile, skipinitialspace = True)
+    names = sites['name'].astype(str).tolist() if 'name' in sites else [str(i) for i in range(len(sites))]
+    return sites['lat'].values.astype(float), sites['lon'].values.astype(float), names
+
+# Make a function to allow batch mode
+#  - inputs: argument list (default sys.argv)
+def call_func(argv = None):
+    
+    par = argparse.ArgumentParser()
+    par.add_argument('--lat', type = float, required = False)         # Add argument of latitude (°)
+    par.add_argument('--lon', type = float, required = False)         # Add argument of longitude (°)
+    par.add_argument('--infile', type = str, required = False)        # Add argument of input CSV of sites (columns lat, lon, optional name)
+    par.add_argument('--z_start', type = float, required = False)     # Add arugment of starting depth (m)
+    par.add_argument('--z_end', type = float, required = False)       # Add arugment of ending depth (m)
+    par.add_argument('--z_step', type = float, required = False)      # Add arugment of depth interval (m)
+    par.add_argument('--z_list', type = str, required = False)        # Add argument of comma-separated depths (m) shared by the sites
+    par.add_argument('--modelname', type = str, required = True)      # Add argument of model name: Lee_2025 or Shinevar_2018
+    par.add_argument('--modelpath', type = str, required = True)      # Add argument of input model path
+    par.add_argument('--outpath', type = str, required = True)        # Add argument of output file path and file name
+    par.add_argument('--layout', type = str, default = 'files',       # Add argument of output of many sites: files per site or one long table
+                     choices = ['files', 'long'])
+    par.add_argument('--engine', type = str, default = 'xarray',      # Add argument of interpolation engine: xarray or fast
+                     choices = ['xarray', 'fast'])
+    par.add_argument('--dtype', type = str, required = False,         # Add argument of data type of the temperatures (default as in the model file)
+                     choices = ['float32', 'float64'])
+    par.add_argument('--profile', type = str, nargs = '?', const = '-')# Add argument of stage timings: summary on stderr, or JSON output path
+    par.add_argument('--cache', type = str, required = False)         # Add argument of result cache directory (default $CTM_CACHE_DIR)
+    
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    if args.z_list is None and (args.z_start is None or args.z_end is None or args.z_step is None):
+        par.error('--z_start, --z_end and --z_step are required unless --z_list is given')
+
+    # Many sites: one interpolation for all of them
+    if args.infile:
+        lats, lons, names = read_sites(args.infile)
+        if args.z_list:
+            zvals = [float(z) for z in args.z_list.split(',')]
+        else:
+            zvals = profile_depths(args.z_start, args.z_end, args.z_step)
+
+        def write_sites():
+            xi = query_1D_vertical_profiles(lats, lons, zvals, args.modelname, args.modelpath, engine = args.engine,
+                                            names = names, dtype = args.dtype)
+            write_profiles(xi, args.outpath, args.modelname, args.layout)
+
+        # the sites are part of the cache key, since the input file may change
+        params = dict(query_params(args), sites = [lats, lons, names])
+        with profiling(args.profile):
+            cached_outputs(args.cache, args.modelname, args.modelpath, '1D_vertical', params,
+                           profiles_outpaths(args.outpath, names, args.layout), write_sites)
+        return
+
+    if args.lat is None or args.lon is None or args.z_list is not None:
+        par.error('--lat, --lon, --z_start, --z_end and --z_step are required unless --infile is given')
+
+    final_outpath = profile_final_outpath(args.outpath)
+
+    def write():
+        # Call the function
+        df = query_1D_vertical_profile(
+             args.lat,
+             args.lon,
+             args.z_start,
+             args.z_end,
+             args.z_step,
+             args.modelname,
+             args.modelpath,
+             engine = args.engine,
+             dtype = args.dtype)
+
+        df = df.drop(columns = ['longitude[°]', 'latitude[°]'])
+
+        # Rename columns
+        rename = {'depth[m]': '# Depth(m)',
+                  'temperature[°C]': 'Temperature(°C)'}
+    
+        df = df.rename(columns = rename)
+
+        # Write the output csv file, and in the same pass the one with dummy columns
+        write_csv_output(df, final_outpath, '1D_vertical', args.modelname, dummy_outfile = args.outpath, longitude = args.lon, latitude = args.lat)
+
+    # optional stage timings; the files of a repeated query are copied from the result cache
+    with profiling(args.profile):
+        cached_outputs(args.cache, args.modelname, args.modelpath, '1D_vertical', query_params(args),
+                       csv_outpaths(args.outpath, final_outpath), write)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
@@ -0,0 +1,205 @@
+#
+#  query_2d_cross_section.py: vertical cross-sections ('ctm xsection', ctm_plotting/query_2d_cross_section.py)
+#
+
+from .model_registry import get_model
+from .surface_layer import query_dataset, cast_result
+from .Value_check import check_inbounds_values
+from .calculate_geodesic_track import calculate_geodesic_polyline
+from .query_size import check_query_size, report_query_size, MAX_POINTS
+from .write_csv_output import write_csv_output, derived_outpath
+from .profiling import profile_stage, profiling
+from .query_result import QueryResult
+from .result_cache import cached_outputs, query_params, csv_outpaths
+
+### Import Packages
+import pandas as pd
+import numpy as np
+import xarray as xr
+import argparse
+from pyproj import Geod
+
+## number of track points and depths sampling a cross-section at the native spacing of the model: one track
+## point per grid cell crossed in longitude or latitude, and the median depth spacing of the model over the depth range;
+## the points are equally spaced along the whole track, so a polyline is sampled at the spacing of its segment with the
+## shortest cells and no cell is skipped
+#  - inputs: Xarray Dataset (or GridInterpolator), longitude and latitude arrays of the track vertices, start and end depth
+#  - returns: number of track points, number of depths
+def native_sampling(xdata, lons, lats, z_start, z_end):
+
+    spacing = {}
+    for coord in ("longitude[°]", "latitude[°]", "depth[m]"):
+        nodes = np.sort(np.asarray(xdata[coord], dtype = float))
+        if coord == "depth[m]":
+            inside = nodes[(nodes >= min(z_start, z_end)) & (nodes <= max(z_start, z_end))]
+            nodes = inside if inside.size > 1 else nodes
+        spacing[coord] = np.median(np.diff(nodes))
+
+    # grid cells crossed by each segment of the track
+    cells = np.maximum(np.abs(np.diff(lons)) / spacing["longitude[°]"], np.abs(np.diff(lats)) / spacing["latitude[°]"])
+    if cells.size > 1:
+        # length of a cell along each segment; the shortest sets the spacing of the whole track
+        _, _, seg = Geod(ellps = "WGS84").inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+        crossed = cells > 0
+        cells = np.sum(seg) / np.min(seg[crossed] / cells[crossed]) if crossed.any() else 0
+    ntrack = max(int(np.ceil(np.sum(cells) - 1e-9)) + 1, 2)
+    ndep = max(int(np.ceil(np.abs(z_end - z_start) / spacing["depth[m]"] - 1e-9)) + 1, 2)
+
+    return ntrack, ndep
+
+## sample points of a vertical cross-section
+#  - inputs: start longitude and latitude, end longitude and latitude, start and end depth, number of track points
+#    and number of depths (or 'native' for the spacing of the model), list of (latitude, longitude) vertices between
+#    start and end for a polyline section, Dataset (or GridInterpolator) of the model for the 'native' sampling
+#  - returns: longitude and latitude arrays along the geodesic track, depth array
+def section_points(lat_start, lon_start, lat_end, lon_end, z_start, z_end, ntrack = 121, ndep = 61, waypoints = None,
+                   xdata = None):
+
+    # vertices of the track
+    vertices = [(lat_start, lon_start)] + [tuple(v) for v in (waypoints or [])] + [(lat_end, lon_end)]
+    lats, lons = np.array(vertices, dtype = float).T
+
+    # sampling at the spacing of the model
+    if 'native' in (ntrack, ndep):
+        if xdata is None:
+            raise ValueError('Undefined model for native sampling')
+        native = native_sampling(xdata, lons, lats, z_start, z_end)
+        ntrack = native[0] if ntrack == 'native' else ntrack
+        ndep = native[1] if ndep == 'native' else ndep
+
+    # calculate lon/lat points along a track
+    glons, glats = calculate_geodesic_polyline(lons, lats, int(ntrack))
+    
+    # define depth range
+    zvals = np.linspace(z_start, z_end, int(ndep))
+
+    return glons, glats, zvals
+
+## query the model along a vertical cross-section between lon/lat pairs
+#  - inputs: start longitude and latitude, end longitude and latitude, start and end depth, model name, and model path or registered CTMModel, interpolation engine ('xarray' or 'fast'); optional plotting,
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file), number of track points and
+#    number of depths (or 'native' for the spacing of the model), list of (latitude, longitude) vertices between start
+#    and end for a polyline section, maximum number of points (the size is printed from REPORT_POINTS points)
+#  - returns: QueryResult with temperature at these points (.to_dataframe() for a DataFrame); optional figure
+def query_2D_vertical_cross_section(lat_start, lon_start, lat_end, lon_end, z_start, z_end, modelname, modelpath, plot = False, engine = 'xarray',
+                                    dtype = None, ntrack = 121, ndep = 61, waypoints = None, max_points = MAX_POINTS):
+    
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+
+    # models that do not start at the surface (Boyd (2019)) get their surface layer when the query reaches above
+    # the shallowest stored depth; the fast engine stands in for the Dataset
+    xdata = query_dataset(model, engine, [z_start, z_end])
+
+    # check validity of query
+    waypoints = [tuple(v) for v in (waypoints or [])]
+    check_inbounds_values(xdata, {"longitude[°]": [lon_start, lon_end] + [v[1] for v in waypoints], 
+                                  "latitude[°]": [lat_start, lat_end] + [v[0] for v in waypoints], 
+                                  "depth[m]": [z_start, z_end]})
+
+    # lon/lat points along a track and depths
+    with profile_stage("geometry"):
+        glons, glats, zvals = section_points(lat_start, lon_start, lat_end, lon_end, z_start, z_end, ntrack, ndep, waypoints, xdata)
+
+    # estimate the size before interpolating
+    report_query_size(check_query_size(glons.size * zvals.size, max_points, 4))
+
+    # interpolate along track and vertically
+    with profile_stage("interp"):
+        xi = xdata.interp({"longitude[°]": xr.DataArray(glons, dims="track index"), 
+                      "latitude[°]": xr.DataArray(glats, dims="track index"),
+                      "depth[m]": zvals})
+        xi = cast_result(xi, xdata)
+
+    
+    # define columns to return
+    with profile_stage("to_columns"):
+        df = QueryResult.from_dataset(xi, ["longitude[°]", "latitude[°]", "depth[m]", "temperature[°C]"], "2D_vertical")
+
+    # return
+    if plot: # optional plot
+        from .test_plot import test_plot
+        fig = test_plot(xi, "2D_vertical")
+        return df, fig
+    else:
+        return df
+
+## Parse a polyline vertex of the command line
+#  - inputs: 'LAT,LON' string
+#  - returns: (latitude, longitude)
+def parse_waypoint(spec):
+    vals = spec.split(',')
+    if len(vals) != 2:
+        raise ValueError('Undefined waypoint (expected LAT,LON)', spec)
+    return float(vals[0]), float(vals[1])
+
+# Make a function to allow batch mode
+#  - inputs: argument list (default sys.argv)
+def call_func(argv = None):
+    
+    par = argparse.ArgumentParser()
+    par.add_argument('--lat_start', type = float, required = True)    # Add argument of starting latitude (°)
+    par.add_argument('--lon_start', type = float, required = True)    # Add argument of starting longitude (°)
+    par.add_argument('--lat_end', type = float, required = True)      # Add argument of ending latitude (°)
+    par.add_argument('--lon_end', type = float, required = True)      # Add argument of ending longitude (°)
+    par.add_argument('--z_start', type = float, required = True)      # Add arugment of starting depth (m)
+    par.add_argument('--z_end', type = float, required = True)        # Add arugment of ending depth (m)
+    par.add_argument('--modelname', type = str, required = True)      # Add argument of model name: Lee_2025 or Shinevar_2018
+    par.add_argument('--modelpath', type = str, required = True)      # Add argument of input model path
+    par.add_argument('--outpath', type = str, required = True)        # Add argument of output file path and file name
+    par.add_argument('--engine', type = str, default = 'xarray',      # Add argument of interpolation engine: xarray or fast
+                     choices = ['xarray', 'fast'])
+    par.add_argument('--dtype', type = str, required = False,         # Add argument of data type of the temperatures (default as in the model file)
+                     choices = ['float32', 'float64'])
+    par.add_argument('--ntrack', type = str, default = '121')         # Add argument of number of track points, or 'native' for the model spacing
+    par.add_argument('--ndep', type = str, default = '61')            # Add argument of number of depths, or 'native' for the model spacing
+    par.add_argument('--waypoint', type = str, action = 'append')     # Add argument of polyline vertex as LAT,LON between start and end (repeat in order)
+    par.add_argument('--max_points', type = int, default = MAX_POINTS)# Add argument of maximum number of output points
+    par.add_argument('--profile', type = str, nargs = '?', const = '-')# Add argument of stage timings: summary on stderr, or JSON output path
+    par.add_argument('--cache', type = str, required = False)         # Add argument of result cache directory (default $CTM_CACHE_DIR)
+    
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    sampling = {'ntrack': args.ntrack if args.ntrack == 'native' else int(args.ntrack),
+                'ndep': args.ndep if args.ndep == 'native' else int(args.ndep),
+                'waypoints': [parse_waypoint(v) for v in args.waypoint or []],
+                'max_points': args.max_points}
+
+    final_outpath = derived_outpath(args.outpath, 'data', 'data_final')
+
+    def write():
+        # Call the function
+        df = query_2D_vertical_cross_section(
+             args.lat_start,
+             args.lon_start,
+             args.lat_end,
+             args.lon_end,
+             args.z_start,
+             args.z_end,
+             args.modelname,
+             args.modelpath,
+             engine = args.engine,
+             dtype = args.dtype,
+             **sampling)
+
+        # Rename columns
+        rename = {'longitude[°]': '# Lon',
+                  'latitude[°]': 'Lat',
+                  'depth[m]': 'Depth(m)',
+                  'temperature[°C]': 'Temperature(°C)'}
+    
+        df = df.rename(columns = rename)
+
+        # Write the output csv file, and in the same pass the one with dummy columns
+        write_csv_output(df, final_outpath, '2D_vertical', args.modelname, dummy_outfile = args.outpath)
+
+    # optional stage timings; the files of a repeated query are copied from the result cache
+    with profiling(args.profile):
+        cached_outputs(args.cache, args.modelname, args.modelpath, '2D_vertical', query_params(args),
+                       csv_outpaths(args.outpath, final_outpath), write)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
@@ -0,0 +1,340 @@
+#
+#  query_2d_horizontal_slice.py: horizontal slices ('ctm hslice', ctm_plotting/query_2d_horizontal_slice.py)
+#
+
+from .model_registry import get_model
+from .grid_interpolator import grid_node_indices
+from .surface_layer import query_dataset, cast_result
+from .Value_check import check_inbounds_values
+from .query_size import check_query_size, MAX_POINTS
+from .write_csv_output import write_csv_output, derived_outpath
+from .profiling import profile_stage, profiling
+from .query_result import QueryResult
+from .result_cache import cached_outputs, query_params, csv_outpaths
+
+### Import Packages
+import pandas as pd
+import numpy as np
+import xarray as xr
+import argparse
+import os
+
+## initialize the dataset for horizontal slices
+#  - inputs: model name, model path or registered CTMModel, interpolation engine ('xarray' or 'fast'), slice depths,
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file)
+#  - returns: Xarray Dataset, or GridInterpolator for the fast engine
+def init_slice_dataset(modelname, modelpath, engine = 'xarray', depths = None, dtype = None):
+
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+
+    # models that do not start at the surface (Boyd (2019)) get their surface layer when the query reaches above
+    # the shallowest stored depth; the fast engine stands in for the Dataset
+    xdata = query_dataset(model, engine, depths)
+
+    return xdata
+
+## longitude and latitude sample points of a horizontal slice
+#  - inputs: start longitude and latitude, end longitude and latitude, spacing in degree (default: spacing
+#    giving about npts points)
+#  - returns: longitude and latitude arrays
+def slice_lonlat(lat_start, lon_start, lat_end, lon_end, spacing = None, npts = 10000):
+
+    # Define longitude and latitude arrays for the slice sample
+    lon_range = np.abs(lon_end - lon_start)
+    lat_range = np.abs(lat_end - lat_start)
+
+    # Spaing in degree
+    if spacing is None:
+        space_deg = np.sqrt((lon_range * lat_range) / npts)
+    else:
+        space_deg = float(spacing)
+
+    nlon = int(np.ceil(lon_range / space_deg) + 1) 
+    nlat = int(np.ceil(lat_range / space_deg) + 1)
+    
+    lon_vals = np.linspace(lon_start, lon_end, nlon)
+    lat_vals = np.linspace(lat_start, lat_end, nlat)
+
+    return lon_vals, lat_vals
+
+## model grid nodes inside a longitude/latitude box, ordered from start to end
+#  - inputs: Xarray Dataset (or GridInterpolator), start longitude and latitude, end longitude and latitude
+#  - returns: longitude and latitude arrays; error when the box holds fewer than 2 nodes on an axis
+def native_lonlat(xdata, lat_start, lon_start, lat_end, lon_end):
+
+    vals = []
+    for coord, start, end in (("longitude[°]", lon_start, lon_end), ("latitude[°]", lat_start, lat_end)):
+        nodes = np.sort(np.asarray(xdata[coord], dtype = float))
+        nodes = nodes[(nodes >= min(start, end) - 1e-9) & (nodes <= max(start, end) + 1e-9)]
+        if nodes.size < 2:
+            raise ValueError('Undefined native spacing: fewer than 2 model nodes between the start and end', coord, nodes.size)
+        vals.append(nodes[::-1] if start > end else nodes)
+
+    return vals[0], vals[1]
+
+## sample points of a horizontal slice, with a size check
+#  - inputs: Xarray Dataset (or GridInterpolator), start longitude and latitude, end longitude and latitude,
+#    spacing in degree or 'native' (model nodes inside the box), number of points used when there is no spacing,
+#    number of depths, maximum number of output points
+#  - returns: longitude and latitude arrays
+def slice_points(xdata, lat_start, lon_start, lat_end, lon_end, spacing = None, npts = 10000, ndepth = 1, max_points = MAX_POINTS):
+
+    if spacing == 'native':
+        lon_vals, lat_vals = native_lonlat(xdata, lat_start, lon_start, lat_end, lon_end)
+    else:
+        lon_vals, lat_vals = slice_lonlat(lat_start, lon_start, lat_end, lon_end, spacing, npts)
+
+    # estimate the size before interpolating
+    check_query_size(lon_vals.size * lat_vals.size * ndepth, max_points)
+
+    return lon_vals, lat_vals
+
+## sample the model on a longitude/latitude grid; when all points are model nodes the stored values are
+## read directly and only the depth is interpolated
+#  - inputs: Xarray Dataset (or GridInterpolator), longitude and latitude arrays, depth or array of depths
+#  - returns: Xarray Dataset like Dataset.interp, in the floating-point type of the model
+def sample_slice(xdata, lon_vals, lat_vals, z):
+
+    if isinstance(xdata, xr.Dataset):
+        ilon = grid_node_indices(lon_vals, xdata["longitude[°]"])
+        ilat = grid_node_indices(lat_vals, xdata["latitude[°]"])
+        if ilon is not None and ilat is not None:
+            xsel = xdata.isel({"longitude[°]": ilon, "latitude[°]": ilat})
+            # renamed models may lack an index on these coordinates
+            xsel = xsel.assign_coords({"longitude[°]": xsel["longitude[°]"].values, "latitude[°]": xsel["latitude[°]"].values})
+            return cast_result(xsel.interp({"depth[m]": z}), xdata)
+
+    return cast_result(xdata.interp({"longitude[°]": lon_vals, "latitude[°]": lat_vals, "depth[m]": z}), xdata)
+
+## query the model along a horizontal slice at fixed depth
+#  - inputs: start longitude and latitude, end longitude and latitude, slice depth, model name, model path or registered CTMModel, interpolation engine ('xarray' or 'fast'),
+#    spacing in degree or 'native', number of points used when there is no spacing, maximum number of points; optional plotting,
+#    data type of the model temperatures (e.g. 'float32'; default as in the model file)
+#  - returns: QueryResult with temperature at these points (.to_dataframe() for a DataFrame); optional figure
+def query_2D_horizontal_slice(lat_start, lon_start, lat_end, lon_end, z_slice, modelname, modelpath, plot = False, engine = 'xarray',
+                              spacing = None, npts = 10000, max_points = MAX_POINTS, dtype = None):
+    
+    # initialize dataset
+    xdata = init_slice_dataset(modelname, modelpath, engine, [z_slice], dtype)
+
+    # check validity of query
+    check_inbounds_values(xdata, {"longitude[°]": [lon_start, lon_end], 
+                                  "latitude[°]": [lat_start, lat_end], 
+                                  "depth[m]": [z_slice]})
+    
+    # Define longitude and latitude arrays for the slice sample
+    lon_vals, lat_vals = slice_points(xdata, lat_start, lon_start, lat_end, lon_end, spacing, npts, 1, max_points)
+
+    # sample the horizontal slice at fixed depth
+    with profile_stage("interp"):
+        xi = sample_slice(xdata, lon_vals, lat_vals, z_slice)
+
+    # define columns to return
+    with profile_stage("to_columns"):
+        df = QueryResult.from_dataset(xi, ["longitude[°]", "latitude[°]", "depth[m]", "temperature[°C]"], "2D_horizontal")
+
+    # return
+    if plot: # optional plot
+        from .test_plot import test_plot
+        fig = test_plot(xi, "2D_horizontal")
+        return df, fig
+    else:
+        return df
+
+## query the model along horizontal slices at several depths in one interpolation
+#  - inputs: start longitude and latitude, end longitude and latitude, slice depths, model name, model path or registered CTMModel, interpolation engine ('xarray' or 'fast'),
+#    spacing in degree or 'native', number of points per depth used when there is no spacing, maximum number of points,
+#    data type of the model temperatures (e.g. 'float32' halves the memory of large stacks; default as in the model file)
+#  - returns: Xarray Dataset with temperature on the (depth, latitude, longitude) grid; the longitude/latitude
+#    sample points and the interpolation weights are the same for all depths
+def query_2D_horizontal_stack(lat_start, lon_start, lat_end, lon_end, z_values, modelname, modelpath, engine = 'xarray',
+                              spacing = None, npts = 10000, max_points = MAX_POINTS, dtype = None):
+
+    # initialize dataset
+    z_values = np.atleast_1d(np.asarray(z_values, dtype = float))
+    xdata = init_slice_dataset(modelname, modelpath, engine, z_values, dtype)
+
+    # check validity of query
+    check_inbounds_values(xdata, {"longitude[°]": [lon_start, lon_end], 
+                                  "latitude[°]": [lat_start, lat_end], 
+                                  "depth[m]": z_values})
+
+    # sample all depths at once
+    lon_vals, lat_vals = slice_points(xdata, lat_start, lon_start, lat_end, lon_end, spacing, npts, z_values.size, max_points)
+    with profile_stage("interp"):
+        xi = sample_slice(xdata, lon_vals, lat_vals, z_values)
+
+    return xi[["temperature[°C]"]]
+
+## write one horizontal slice in the CSV format of call_func (plain file and file with dummy columns)
+#  - inputs: QueryResult (or DataFrame) from query_2D_horizontal_slice, output path, model name, slice depth
+#  - returns: None
+def write_slice_csv(df, outpath, modelname, z):
+
+    df = df.drop(columns = ['depth[m]'])
+
+    # Rename columns
+    rename = {'longitude[°]': '# Lon',
+              'latitude[°]': 'Lat',
+              'temperature[°C]': 'Temperature(°C)'}
+    
+    df = df.rename(columns = rename)
+
+    # Write the output csv file, and in the same pass the one with dummy columns
+    write_csv_output(df, slice_final_outpath(outpath), '2D_horizontal', modelname, dummy_outfile = outpath, z = z)
+
+## path of the final CSV file of a slice (the file without dummy columns)
+#  - inputs: output path
+#  - returns: final output path
+def slice_final_outpath(outpath):
+    return derived_outpath(outpath, 'data', 'data_final')
+
+## output files written by call_func, for the result cache
+#  - inputs: output path, output format ('csv', 'netcdf' or 'binary'), depths of a stack (None for a single slice)
+#  - returns: dictionary of {name: output path}
+def slice_outpaths(outpath, outformat = 'csv', z_values = None):
+    if outformat == 'netcdf':
+        return {'stack': outpath}
+    if outformat == 'binary':
+        return {'stack': outpath, 'sidecar': outpath + '.json'}
+    if z_values is None:
+        return csv_outpaths(outpath, slice_final_outpath(outpath))
+    outpaths = {}
+    for z in z_values:
+        path = stack_outpath(outpath, z)
+        outpaths.update(csv_outpaths(path, slice_final_outpath(path), '_z{:g}'.format(z)))
+    return outpaths
+
+## output path of one depth of a stack: '{z}' in the path is replaced by the depth, otherwise '_z<depth>' is
+## added before the extension
+#  - inputs: output path, depth (m)
+#  - returns: output path for this depth
+def stack_outpath(outpath, z):
+    if '{z}' in outpath:
+        return outpath.replace('{z}', '{:g}'.format(z))
+    root, ext = os.path.splitext(outpath)
+    return '{:}_z{:g}{:}'.format(root, z, ext)
+
+## write a stack of horizontal slices
+#  - inputs: Dataset from query_2D_horizontal_stack, output path, model name, format: 'netcdf' (one file with
+#    the (depth, latitude, longitude) grid), 'binary' (the same grid as a raw array with a JSON sidecar, see
+#    binary_output.py) or 'csv' (one pair of files per depth, as for a single slice)
+#  - returns: None
+def write_horizontal_stack(xi, outpath, modelname, outformat = 'netcdf'):
+
+    if outformat == 'netcdf':
+        xo = xi.transpose("depth[m]", "latitude[°]", "longitude[°]")
+        xo.attrs["ctm_modelname"] = modelname
+        with profile_stage("write_netcdf"):
+            xo.to_netcdf(outpath)
+
+    elif outformat == 'binary':
+        from .binary_output import write_binary_grid
+        write_binary_grid(xi, outpath, '2D_horizontal_stack', modelname, ("depth[m]", "latitude[°]", "longitude[°]"))
+
+    elif outformat == 'csv':
+        for k, z in enumerate(xi["depth[m]"].values):
+            with profile_stage("to_columns"):
+                df = QueryResult.from_dataset(xi.isel({"depth[m]": k}), ["longitude[°]", "latitude[°]", "depth[m]", "temperature[°C]"],
+                                              "2D_horizontal")
+            write_slice_csv(df, stack_outpath(outpath, z), modelname, z)
+
+    else:
+        raise ValueError('Undefined output format', outformat)
+
+# Make a function to allow batch mode
+#  - inputs: argument list (default sys.argv)
+def call_func(argv = None):
+    
+    par = argparse.ArgumentParser()
+    par.add_argument('--lat_start', type = float, required = True)    # Add argument of starting latitude (°)
+    par.add_argument('--lon_start', type = float, required = True)    # Add argument of starting longitude (°)
+    par.add_argument('--lat_end', type = float, required = True)      # Add argument of ending latitude (°)
+    par.add_argument('--lon_end', type = float, required = True)      # Add argument of ending longitude (°)
+    par.add_argument('--z', type = float, required = False)           # Add arugment of depth (m)
+    par.add_argument('--z_list', type = str, required = False)        # Add argument of comma-separated depths (m) for a stack of slices
+    par.add_argument('--z_start', type = float, required = False)     # Add arugment of starting depth (m) for a stack of slices
+    par.add_argument('--z_end', type = float, required = False)       # Add arugment of ending depth (m) for a stack of slices
+    par.add_argument('--z_step', type = float, required = False)      # Add arugment of depth interval (m) for a stack of slices
+    par.add_argument('--modelname', type = str, required = True)      # Add argument of model name: Lee_2025 or Shinevar_2018
+    par.add_argument('--modelpath', type = str, required = True)      # Add argument of input model path
+    par.add_argument('--outpath', type = str, required = True)        # Add argument of output file path and file name
+    par.add_argument('--engine', type = str, default = 'xarray',      # Add argument of interpolation engine: xarray or fast
+                     choices = ['xarray', 'fast'])
+    par.add_argument('--dtype', type = str, required = False,         # Add argument of data type of the temperatures (default as in the model file)
+                     choices = ['float32', 'float64'])
+    par.add_argument('--stack_format', type = str, required = False,  # Add argument of stack output: netcdf, binary or csv (default from --outpath)
+                     choices = ['netcdf', 'binary', 'csv'])
+    par.add_argument('--spacing', type = str, required = False)       # Add argument of spacing (degree), or 'native' for the model nodes
+    par.add_argument('--npts', type = int, default = 10000)           # Add argument of approximate number of points when there is no spacing
+    par.add_argument('--max_points', type = int, default = MAX_POINTS)# Add argument of maximum number of output points
+    par.add_argument('--profile', type = str, nargs = '?', const = '-')# Add argument of stage timings: summary on stderr, or JSON output path
+    par.add_argument('--cache', type = str, required = False)         # Add argument of result cache directory (default $CTM_CACHE_DIR)
+    
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    sampling = {'spacing': args.spacing if args.spacing in (None, 'native') else float(args.spacing),
+                'npts': args.npts,
+                'max_points': args.max_points}
+
+    # Stack of slices at several depths
+    if args.z_list or args.z_start is not None:
+        if args.z_list:
+            z_values = [float(z) for z in args.z_list.split(',')]
+        elif args.z_end is None or args.z_step is None:
+            par.error('--z_start needs --z_end and --z_step')
+        else:
+            z_values = np.arange(args.z_start, args.z_end + args.z_step/10.0, args.z_step)
+        outformat = args.stack_format or {'.nc': 'netcdf', '.bin': 'binary'}.get(os.path.splitext(args.outpath)[1].lower(), 'csv')
+
+        def write():
+            xi = query_2D_horizontal_stack(
+                 args.lat_start,
+                 args.lon_start,
+                 args.lat_end,
+                 args.lon_end,
+                 z_values,
+                 args.modelname,
+                 args.modelpath,
+                 engine = args.engine,
+                 dtype = args.dtype,
+                 **sampling)
+            write_horizontal_stack(xi, args.outpath, args.modelname, outformat)
+
+        outpaths = slice_outpaths(args.outpath, outformat, z_values)
+
+    else:
+        if args.z is None:
+            par.error('one of --z, --z_list or --z_start/--z_end/--z_step is required')
+
+        def write():
+            # Call the function
+            df = query_2D_horizontal_slice(
+                 args.lat_start,
+                 args.lon_start,
+                 args.lat_end,
+                 args.lon_end,
+                 args.z,
+                 args.modelname,
+                 args.modelpath,
+                 engine = args.engine,
+                 dtype = args.dtype,
+                 **sampling)
+
+            # Write the output csv files
+            write_slice_csv(df, args.outpath, args.modelname, args.z)
+
+        outformat = 'csv'
+        outpaths = slice_outpaths(args.outpath)
+
+    # optional stage timings; the files of a repeated query are copied from the result cache
+    with profiling(args.profile):
+        cached_outputs(args.cache, args.modelname, args.modelpath, '2D_horizontal', dict(query_params(args), outformat = outformat),
+                       outpaths, write)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
@@ -0,0 +1,295 @@
+#
+#  query_2d_map.py: isotherm-depth and dT/dz maps ('ctm map', ctm_plotting/query_2d_map.py)
+#  Example:
+#  ctm map --lat_start 40 --lon_start -115 --lat_end 42 --lon_end -113 --isotherms 350,600 --dTdz_range 0,10000
+#      --modelname 'Lee_2025' --modelpath 'ThermalModel_WUS_v2.nc' --outpath 'map_data.csv'
+#
+
+from .model_registry import get_model
+from .grid_interpolator import GridInterpolator
+from .surface_layer import with_surface_layer, cast_result
+from .Value_check import check_inbounds_values
+from .dTdz_2D_cross_section import dTdz_profiles
+from .query_size import MAX_POINTS
+from .write_csv_output import write_csv_output
+from .profiling import profile_stage, profiling
+from .query_result import QueryResult
+from .result_cache import cached_outputs, query_params, csv_outpaths
+from .query_2d_horizontal_slice import slice_points, slice_final_outpath
+
+### Import Packages
+import numpy as np
+import xarray as xr
+import argparse
+import os
+
+## indices of the model nodes needed to interpolate inside a range: the nodes within it and the next one on each side
+#  - inputs: model coordinate values (any order), smallest and largest query value
+#  - returns: sorted index array
+def window_indices(vals, vmin, vmax):
+    svals = np.sort(vals)
+    lo = svals[max(np.searchsorted(svals, vmin, side = "right") - 1, 0)]
+    hi = svals[min(np.searchsorted(svals, vmax, side = "left"), svals.size - 1)]
+    return np.nonzero((vals >= lo) & (vals <= hi))[0]
+
+## model depths a map needs: from the top down to the first depth node at or below the deepest map depth
+#  - inputs: CTMModel, deepest depth (m; None for the model bottom)
+#  - returns: sorted index array of the depth nodes
+def window_depths(model, z_max = None):
+    deps = model.xdata["depth[m]"].values
+    return window_indices(deps, deps.min(), deps.max() if z_max is None else max(z_max, deps.min()))
+
+## read the part of a model a map needs: the longitude/latitude window of the map and the depth nodes down to the
+## deepest map depth, with the surface layer of models that need one
+#  - inputs: CTMModel, longitude and latitude arrays of the map, deepest depth (m; None for the model bottom)
+#  - returns: Xarray Dataset of the window, loaded in memory
+def model_window(model, lon_vals, lat_vals, z_max = None):
+
+    xdata = model.xdata
+    index = {"longitude[°]": window_indices(xdata["longitude[°]"].values, lon_vals.min(), lon_vals.max()),
+             "latitude[°]": window_indices(xdata["latitude[°]"].values, lat_vals.min(), lat_vals.max()),
+             "depth[m]": window_depths(model, z_max)}
+
+    with profile_stage("window"):
+        window = xdata[["temperature[°C]"]].isel(index)
+        # renamed models may lack an index on the coordinates
+        window = window.assign_coords({name: window[name].values for name in index}).load()
+    with profile_stage("surface"):
+        window = with_surface_layer(window, model.surface)
+    return window
+
+## temperatures of the map columns at the model depths, from one horizontal interpolation of the window
+#  - inputs: window Dataset, longitude and latitude arrays of the map, interpolation engine ('xarray' or 'fast')
+#  - returns: temperatures with shape (latitude, longitude, depth), increasing depths (m)
+def map_columns(window, lon_vals, lat_vals, engine = 'xarray'):
+
+    window = window.sortby("depth[m]")
+    deps = window["depth[m]"].values
+    with profile_stage("interp"):
+        if engine == 'fast':
+            xi = GridInterpolator(window).interp({"longitude[°]": lon_vals, "latitude[°]": lat_vals, "depth[m]": deps})
+        elif engine == 'xarray':
+            xi = cast_result(window.interp({"longitude[°]": lon_vals, "latitude[°]": lat_vals}), window)
+        else:
+            raise ValueError('Undefined interpolation engine', engine)
+    temps = xi["temperature[°C]"].transpose("latitude[°]", "longitude[°]", "depth[m]").values
+    return temps, deps
+
+## depth at which each column first reaches a temperature, linear between the depth nodes
+#  - inputs: temperatures with depth along the last axis, increasing depths (m) of the last axis, temperature (°C)
+#  - returns: depths (m) with the shape of the columns; NaN where a column stays below the temperature, or is
+#    already above it at its top
+def isotherm_depths(temps, depths, T_iso):
+
+    # first node at or above the temperature in every column at once (argmax of the mask: a searchsorted that
+    # also works on columns with temperature inversions)
+    reached = temps >= T_iso
+    k1 = np.argmax(reached, axis = -1)[..., None]
+    k0 = np.maximum(k1 - 1, 0)
+    T0 = np.take_along_axis(temps, k0, axis = -1)[..., 0]
+    T1 = np.take_along_axis(temps, k1, axis = -1)[..., 0]
+    z0, z1 = depths[k0[..., 0]], depths[k1[..., 0]]
+
+    # linear crossing between the two nodes
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        z = np.where(T1 > T0, z0 + (T_iso - T0) * (z1 - z0) / (T1 - T0), z1)
+    found = np.take_along_axis(reached, k1, axis = -1)[..., 0] & ((k1[..., 0] > 0) | (T1 == T_iso))
+    return np.where(found, z, np.nan)
+
+## temperatures of the columns at given depths, linear between the depth nodes
+#  - inputs: temperatures with depth along the last axis, increasing depths (m) of the last axis, query depths (m)
+#  - returns: temperatures with the query depths along the last axis
+def column_temperatures(temps, depths, z):
+    z = np.atleast_1d(np.asarray(z, dtype = float))
+    i = np.clip(np.searchsorted(depths, z, side = "right") - 1, 0, depths.size - 2)
+    w = (z - depths[i]) / (depths[i + 1] - depths[i])
+    return temps[..., i] * (1 - w) + temps[..., i + 1] * w
+
+## name of the map variable of an isotherm depth
+#  - inputs: temperature (°C)
+#  - returns: variable name
+def isotherm_name(T_iso):
+    return "isotherm_{:g}°C[m]".format(T_iso)
+
+## name of the map variable of the depth-averaged gradient
+#  - inputs: top and bottom depth (m)
+#  - returns: variable name
+def dTdz_name(z_top, z_bottom):
+    return "dTdz_{:g}-{:g}m[°C/km]".format(z_top, z_bottom)
+
+## map the isotherm depths and the depth-averaged geothermal gradient over a longitude/latitude box in one sweep:
+## only the window of the box is read, interpolated horizontally at all model depths, and searched along depth
+#  - inputs: start longitude and latitude, end longitude and latitude, model name, model path or registered CTMModel,
+#    isotherm temperatures (°C), depth range (top, bottom in m) of the averaged dT/dz (None for no gradient),
+#    deepest depth searched for the isotherms (m; default the model bottom), interpolation engine ('xarray' or 'fast'),
+#    spacing in degree or 'native', number of points used when there is no spacing, maximum number of points
+#    (map points times model depths), data type of the model temperatures
+#  - returns: Xarray Dataset on the (latitude, longitude) grid with a depth variable (m) per isotherm (NaN where it
+#    is not reached) and the gradient (°C/km), (T at bottom - T at top) / (bottom - top) as in dTdz_profiles
+def query_2D_map(lat_start, lon_start, lat_end, lon_end, modelname, modelpath, isotherms = (), dTdz_range = None,
+                 z_max = None, engine = 'xarray', spacing = None, npts = 10000, max_points = MAX_POINTS, dtype = None):
+
+    isotherms = [float(T) for T in np.atleast_1d(isotherms)]
+    if not isotherms and dTdz_range is None:
+        raise ValueError('Undefined map product (no isotherms and no dTdz_range)', isotherms)
+
+    # initialize dataset (modelpath may also be a registered CTMModel handle)
+    with profile_stage("model"):
+        model = get_model(modelname, modelpath, dtype)
+    xdata = model.xdata
+
+    # deepest depth needed: the isotherm search (default down to the model bottom) and the gradient range
+    z_need = ([z_max] if isotherms else []) + ([max(dTdz_range)] if dTdz_range is not None else [])
+    z_need = None if None in z_need else max(z_need)
+
+    # check validity of query
+    check_inbounds_values(xdata, {"longitude[°]": [lon_start, lon_end], "latitude[°]": [lat_start, lat_end]})
+
+    # map points, with a size check on the columns (map points times model depths)
+    ndepth = window_depths(model, z_need).size + (model.surface is not None)
+    lon_vals, lat_vals = slice_points(xdata, lat_start, lon_start, lat_end, lon_end, spacing, npts, ndepth, max_points)
+
+    # read the window, and check the depths with its surface layer
+    window = model_window(model, lon_vals, lat_vals, z_need)
+    check_inbounds_values(window, {"depth[m]": [z for z in (z_max,) + tuple(dTdz_range or ()) if z is not None]})
+
+    temps, deps = map_columns(window, lon_vals, lat_vals, engine)
+
+    # all products from the same columns
+    out = xr.Dataset(coords = {"latitude[°]": lat_vals, "longitude[°]": lon_vals})
+    dims = ("latitude[°]", "longitude[°]")
+    with profile_stage("map"):
+        for T_iso in isotherms:
+            z_iso = isotherm_depths(temps, deps, T_iso)
+            if z_max is not None:
+                z_iso[z_iso > z_max] = np.nan
+            out[isotherm_name(T_iso)] = (dims, z_iso, {"ctm_product": "isotherm", "temperature": T_iso})
+        if dTdz_range is not None:
+            z_top, z_bottom = dTdz_range
+            T_range = column_temperatures(temps, deps, [z_top, z_bottom])
+            out[dTdz_name(z_top, z_bottom)] = (dims, dTdz_profiles(T_range, [z_top, z_bottom]),
+                                               {"ctm_product": "dTdz", "depth_range": [z_top, z_bottom]})
+    return out
+
+## output path of one map product: '{product}' in the path is replaced by the product, otherwise '_<product>' is
+## added before the extension
+#  - inputs: output path, product ('iso350' for the 350 °C isotherm, 'dTdz' for the gradient)
+#  - returns: output path for this product
+def map_outpath(outpath, product):
+    if '{product}' in outpath:
+        return outpath.replace('{product}', product)
+    root, ext = os.path.splitext(outpath)
+    return '{:}_{:}{:}'.format(root, product, ext)
+
+## products of a map: output name, title, data type and header fields of each map variable
+#  - inputs: Dataset from query_2D_map
+#  - returns: list of (variable, product, title, column, data type, header fields)
+def map_products(xm):
+    products = []
+    for var in xm.data_vars:
+        attrs = xm[var].attrs
+        if attrs['ctm_product'] == 'isotherm':
+            T_iso = attrs['temperature']
+            products.append((var, 'iso{:g}'.format(T_iso), 'the depth of the {:g}°C isotherm'.format(T_iso),
+                             'Depth(m)', 'Z[m]', {'temperature': T_iso}))
+        else:
+            z_top, z_bottom = attrs['depth_range']
+            products.append((var, 'dTdz', 'the average dT/dz from {:g} to {:g} m depth'.format(z_top, z_bottom),
+                             'dT/dz(°C/km)', 'dT/dz[°C/km]', {'depth_range': (z_top, z_bottom)}))
+    return products
+
+## write a map as one pair of CSV files per product, in the format of the horizontal slice (plain file and file
+## with dummy columns)
+#  - inputs: Dataset from query_2D_map, output path (see map_outpath), model name
+#  - returns: None
+def write_map_csv(xm, outpath, modelname):
+
+    for var, product, title, column, data_type, fields in map_products(xm):
+        with profile_stage("to_columns"):
+            df = QueryResult.from_dataset(xm[[var]], ['longitude[°]', 'latitude[°]', var], '2D_map', var)
+        df = df.rename(columns = {'longitude[°]': '# Lon', 'latitude[°]': 'Lat', var: column})
+        path = map_outpath(outpath, product)
+        write_csv_output(df, slice_final_outpath(path), '2D_map', modelname, dummy_outfile = path,
+                         product = title, data_type = data_type, **fields)
+
+## output files written by call_func, for the result cache
+#  - inputs: output path, isotherm temperatures, whether there is a gradient
+#  - returns: dictionary of {name: output path}
+def map_outpaths(outpath, isotherms, dTdz):
+    products = ['iso{:g}'.format(T) for T in isotherms] + (['dTdz'] if dTdz else [])
+    outpaths = {}
+    for product in products:
+        path = map_outpath(outpath, product)
+        outpaths.update(csv_outpaths(path, slice_final_outpath(path), '_' + product))
+    return outpaths
+
+## parse a comma-separated list of numbers
+#  - inputs: text
+#  - returns: list of floats
+def parse_floats(text):
+    return [float(val) for val in text.split(',') if val.strip()]
+
+# Make a function to allow batch mode
+#  - inputs: argument list (default sys.argv)
+def call_func(argv = None):
+
+    par = argparse.ArgumentParser()
+    par.add_argument('--lat_start', type = float, required = True)    # Add argument of starting latitude (°)
+    par.add_argument('--lon_start', type = float, required = True)    # Add argument of starting longitude (°)
+    par.add_argument('--lat_end', type = float, required = True)      # Add argument of ending latitude (°)
+    par.add_argument('--lon_end', type = float, required = True)      # Add argument of ending longitude (°)
+    par.add_argument('--isotherms', type = str, required = False)     # Add argument of comma-separated isotherm temperatures (°C)
+    par.add_argument('--dTdz_range', type = str, required = False)    # Add argument of top,bottom depth (m) of the averaged dT/dz
+    par.add_argument('--z_max', type = float, required = False)       # Add arugment of deepest isotherm depth searched (m), default the model bottom
+    par.add_argument('--modelname', type = str, required = True)      # Add argument of model name: Lee_2025 or Shinevar_2018
+    par.add_argument('--modelpath', type = str, required = True)      # Add argument of input model path
+    par.add_argument('--outpath', type = str, required = True)        # Add argument of output path ('_<product>' added, or '{product}' replaced)
+    par.add_argument('--engine', type = str, default = 'xarray',      # Add argument of interpolation engine: xarray or fast
+                     choices = ['xarray', 'fast'])
+    par.add_argument('--dtype', type = str, required = False,         # Add argument of data type of the temperatures (default as in the model file)
+                     choices = ['float32', 'float64'])
+    par.add_argument('--spacing', type = str, required = False)       # Add argument of spacing (degree), or 'native' for the model nodes
+    par.add_argument('--npts', type = int, default = 10000)           # Add argument of approximate number of points when there is no spacing
+    par.add_argument('--max_points', type = int, default = MAX_POINTS)# Add argument of maximum number of map points times model depths
+    par.add_argument('--profile', type = str, nargs = '?', const = '-')# Add argument of stage timings: summary on stderr, or JSON output path
+    par.add_argument('--cache', type = str, required = False)         # Add argument of result cache directory (default $CTM_CACHE_DIR)
+
+    args = par.parse_args(argv)                                       # Extract arguments
+
+    isotherms = parse_floats(args.isotherms) if args.isotherms else []
+    dTdz_range = parse_floats(args.dTdz_range) if args.dTdz_range else None
+    if not isotherms and dTdz_range is None:
+        par.error('one of --isotherms or --dTdz_range is required')
+    if dTdz_range is not None and len(dTdz_range) != 2:
+        par.error('--dTdz_range takes two depths: top,bottom')
+
+    def write():
+        # Call the function
+        xm = query_2D_map(
+             args.lat_start,
+             args.lon_start,
+             args.lat_end,
+             args.lon_end,
+             args.modelname,
+             args.modelpath,
+             isotherms = isotherms,
+             dTdz_range = dTdz_range,
+             z_max = args.z_max,
+             engine = args.engine,
+             spacing = args.spacing if args.spacing in (None, 'native') else float(args.spacing),
+             npts = args.npts,
+             max_points = args.max_points,
+             dtype = args.dtype)
+
+        # Write the output csv files
+        write_map_csv(xm, args.outpath, args.modelname)
+
+    # optional stage timings; the files of a repeated query are copied from the result cache
+    with profiling(args.profile):
+        cached_outputs(args.cache, args.modelname, args.modelpath, '2D_map', query_params(args),
+                       map_outpaths(args.outpath, isotherms, dTdz_range is not None), write)
+
+# Make sure the following is not calling when it is being imported, only runs the following when directly run at command prompt
+if __name__ == "__main__":
+    # Call the query function
+    call_func()
@@ -0,0 +1,103 @@
+### Import Packages
+import numpy as np
+import pandas as pd
+
+from .header_stats import grid_stats
+
+## Flatten a variable of a query result to one value per row, broadcast over the dimensions it does not have
+#  - inputs: Xarray DataArray, dimensions of the rows (slowest first) and their sizes
+#  - returns: 1-D NumPy array
+def flat_column(var, dims, shape):
+    values = var.transpose(*[dim for dim in dims if dim in var.dims]).values
+    values = values.reshape([size if dim in var.dims else 1 for dim, size in zip(dims, shape)])
+    return np.broadcast_to(values, shape).reshape(-1)
+
+## Columnar result of a query: one flat NumPy array per column and the axes of the grid the rows were flattened
+## from. The rows are those of Dataset.to_dataframe().reset_index(), without building the pandas MultiIndex;
+## the CSV writers consume it directly and to_dataframe() converts it when a DataFrame is wanted. The CSV header
+## statistics of the query are kept in .stats (None when they are computed from the rows at writing)
+class QueryResult:
+
+    #  - inputs: dictionary of {column: 1-D array of the same length}, dimensions of the rows (slowest first),
+    #    their sizes, dictionary of {dimension: coordinate values}, header statistics
+    def __init__(self, columns, dims = None, shape = None, axes = None, stats = None):
+        self.data = {name: np.asarray(values) for name, values in columns.items()}
+        sizes = {values.size for values in self.data.values()}
+        if len(sizes) > 1:
+            raise ValueError('Undefined columns of different lengths', sorted(sizes))
+        nrows = sizes.pop() if sizes else 0
+        self.dims = ("row",) if dims is None else tuple(dims)
+        self.shape = (nrows,) if shape is None else tuple(int(size) for size in shape)
+        self.axes = dict(axes or {})
+        self.stats = stats
+
+    ## Result of an interpolation
+    #  - inputs: Xarray Dataset, names of the variables and coordinates to keep as columns, in order, query type
+    #    whose CSV header statistics are computed now from the grid (see header_stats.py; default: none),
+    #    column of the values of the statistics
+    #  - returns: QueryResult with a row per point of the Dataset, in the order of its dimensions
+    @classmethod
+    def from_dataset(cls, xi, columns, qtype = None, var = "temperature[°C]"):
+        dims = tuple(xi.dims)
+        shape = tuple(xi.sizes[dim] for dim in dims)
+        result = cls({name: flat_column(xi[name], dims, shape) for name in columns}, dims, shape,
+                     {dim: xi[dim].values for dim in dims if dim in xi.coords})
+        if qtype is not None:
+            result.stats = grid_stats(xi, result.data[var], qtype)
+        return result
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def __contains__(self, name):
+        return name in self.data
+
+    ## Column as a pandas Series sharing the array, or several columns as a DataFrame (like DataFrame[...])
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return pd.Series(self.data[key], name = key, copy = False)
+        return pd.DataFrame({name: self.data[name] for name in key}, copy = False)
+
+    @property
+    def columns(self):
+        return list(self.data)
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.data.values())
+
+    ## Result with renamed columns (the arrays are shared)
+    #  - inputs: dictionary of {old name: new name}
+    #  - returns: QueryResult
+    def rename(self, columns):
+        return QueryResult({columns.get(name, name): values for name, values in self.data.items()},
+                           self.dims, self.shape, self.axes, self.stats)
+
+    ## Result without some columns (the arrays are shared)
+    #  - inputs: list of column names
+    #  - returns: QueryResult
+    def drop(self, columns):
+        return QueryResult({name: values for name, values in self.data.items() if name not in columns},
+                           self.dims, self.shape, self.axes, self.stats)
+
+    ## Rows as a DataFrame, e.g. one chunk of a CSV file
+    #  - inputs: first row, end row (default: all rows)
+    #  - returns: DataFrame with a RangeIndex
+    def frame(self, start = 0, stop = None):
+        return pd.DataFrame({name: values[start:stop] for name, values in self.data.items()})
+
+    ## The result as a DataFrame, as returned by the query functions before the columnar result
+    #  - returns: DataFrame
+    def to_dataframe(self):
+        return self.frame()
+
+    def __repr__(self):
+        return "QueryResult({:} rows, columns {:}, dims {:})".format(len(self), self.columns, dict(zip(self.dims, self.shape)))
+
+## Chunk of rows of a DataFrame or QueryResult
+#  - inputs: DataFrame or QueryResult, first row, end row
+#  - returns: DataFrame
+def frame_rows(df, start, stop):
+    if isinstance(df, QueryResult):
+        return df.frame(start, stop)
+    return df.iloc[start:stop]
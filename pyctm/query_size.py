@@ -0,0 +1,46 @@
+import sys
+
+# approximate bytes per output point: interpolated values, DataFrame with its index, and formatted rows
+MEMORY_PER_POINT = 120
+# approximate bytes per output point and column of CSV text
+CSV_BYTES_PER_COLUMN = 12
+
+# default limit of points in one query
+MAX_POINTS = 10**7
+# queries from this number of points print their size estimate before running
+REPORT_POINTS = 10**6
+
+## Estimate the size of a query before running it
+#  - inputs: number of output points, number of columns written per point
+#  - returns: dictionary with points, memory (bytes) and csv (bytes of one CSV file)
+def estimate_query_size(npts, ncolumns = 3):
+    npts = int(npts)
+    return {"points": npts,
+            "memory": npts * MEMORY_PER_POINT,
+            "csv": npts * ncolumns * CSV_BYTES_PER_COLUMN}
+
+## Describe a size estimate in one line
+#  - inputs: dictionary from estimate_query_size
+#  - returns: text
+def format_query_size(size):
+    return "{:,} points, about {:.1f} MB in memory and {:.1f} MB per CSV file".format(
+        size["points"], size["memory"] / 1e6, size["csv"] / 1e6)
+
+## Stop queries that would be too large
+#  - inputs: number of output points, maximum number of points (None for no limit), number of columns written per point
+#  - returns: size estimate (dictionary from estimate_query_size)
+def check_query_size(npts, max_points = MAX_POINTS, ncolumns = 3):
+    size = estimate_query_size(npts, ncolumns)
+    if max_points is not None and size["points"] > max_points:
+        raise ValueError("Query too large: {:} (limit {:,} points)".format(format_query_size(size), int(max_points)))
+    return size
+
+## Print the size estimate of a large query before it runs
+#  - inputs: dictionary from estimate_query_size, number of points from which the estimate is printed,
+#    output stream (default stderr)
+#  - returns: True when the estimate was printed
+def report_query_size(size, min_points = REPORT_POINTS, file = None):
+    if size["points"] < min_points:
+        return False
+    print("Query size: {:}".format(format_query_size(size)), file = file or sys.stderr)
+    return True
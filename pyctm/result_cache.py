@@ -0,0 +1,379 @@
+### Import Packages
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+from .profiling import profile_stage
+
+# environment variables giving the cache directory of the command line queries (no cache when unset),
+# and its size limit in bytes
+CACHE_ENV = "CTM_CACHE_DIR"
+CACHE_SIZE_ENV = "CTM_CACHE_MAX_BYTES"
+
+# default size limit of a cache directory
+DEFAULT_MAX_BYTES = 1 << 30
+
+# version of the entry layout, part of every key
+CACHE_VERSION = 2
+
+# files of an entry holding a query result: its arrays (NumPy .npz, read without pickle), and the names and
+# layout of the arrays (JSON)
+FRAME_FILE = "frame.npz"
+FRAME_META_FILE = "frame.json"
+
+## Identity of a model file: a rewritten file gets a new identity
+#  - inputs: model path or CTMModel
+#  - returns: list of (path, size, modification time) of the model file and its sidecar, if any
+def model_identity(modelpath):
+
+    # registered handles carry the path and modification time they were opened with, and the data type
+    # they were cast to
+    if hasattr(modelpath, "modelpath"):
+        ident = [modelpath.modelpath, None, modelpath.mtime]
+        return [ident + [modelpath.dtype] if getattr(modelpath, "dtype", None) else ident]
+
+    ident = []
+    path = os.path.abspath(modelpath)
+    for name in (path, path + ".json"):
+        if name == path or os.path.exists(name):
+            st = os.stat(name)
+            ident.append([name, st.st_size, st.st_mtime_ns])
+    return ident
+
+## Configuration of a model applied by the queries whatever the engine: a change gives new keys
+#  - inputs: model name, model path or CTMModel
+#  - returns: dictionary with the depth of the virtual surface layer (see surface_layer.py) and the versions of
+#    the compiled model and binary output layouts
+def model_config(modelname, modelpath):
+
+    from .Initiation import COMPILED_FORMAT
+    from .binary_output import OUTPUT_FORMAT
+    from .surface_layer import SURFACE_LAYERS
+
+    # registered handles carry the layer they were opened with
+    surface = modelpath.surface if hasattr(modelpath, "surface") else SURFACE_LAYERS.get(modelname)
+    return {"surface": surface, "compiled": COMPILED_FORMAT, "binary": OUTPUT_FORMAT}
+
+## Normalize query parameters for the key, so equal requests written differently (40 and 40.0,
+## lists and arrays, keyword order) share an entry
+#  - inputs: parameter value (scalar, list, array or dictionary)
+#  - returns: JSON-serializable value
+def normalize_params(val):
+    if isinstance(val, dict):
+        return {str(k): normalize_params(v) for k, v in sorted(val.items())}
+    if hasattr(val, "tolist"):
+        val = val.tolist()
+    if isinstance(val, (list, tuple)):
+        return [normalize_params(v) for v in val]
+    if isinstance(val, bool) or val is None or isinstance(val, str):
+        return val
+    if isinstance(val, (int, float)):
+        return float("{:.12g}".format(val))
+    return str(val)
+
+## Write a query result as arrays and a JSON description, so reading it back runs no pickle
+#  - inputs: QueryResult (or DataFrame), entry directory
+#  - returns: None; object columns (e.g. site names) are stored as strings
+def write_frame(df, path):
+
+    import pandas as pd
+    from .query_result import QueryResult
+
+    if isinstance(df, QueryResult):
+        columns, meta = df.data, {"type": "QueryResult", "dims": list(df.dims), "shape": list(df.shape),
+                                  "axes": list(df.axes), "stats": None if df.stats is None else list(df.stats)}
+    elif isinstance(df, pd.DataFrame):
+        columns, meta = {name: df[name].values for name in df.columns}, {"type": "DataFrame"}
+    else:
+        raise ValueError('Undefined query result', type(df).__name__)
+
+    arrays = {}
+    meta["columns"] = [str(name) for name in columns]
+    meta["objects"] = [str(name) for name, values in columns.items() if np.asarray(values).dtype == object]
+    for k, values in enumerate(columns.values()):
+        values = np.asarray(values)
+        arrays["column_{:d}".format(k)] = values.astype(str) if values.dtype == object else values
+    if meta["type"] == "QueryResult":
+        for k, values in enumerate(df.axes.values()):
+            arrays["axis_{:d}".format(k)] = np.asarray(values)
+        # statistics keep their NumPy type; Python numbers are given back as such
+        for k, val in enumerate((df.stats or {}).values()):
+            arrays["stats_{:d}".format(k)] = np.asarray(val)
+        meta["python"] = [name for name, val in (df.stats or {}).items() if type(val) in (bool, int, float)]
+
+    # the description is written last: an entry is only found once both files exist
+    np.savez(os.path.join(path, FRAME_FILE), **arrays)
+    with open(os.path.join(path, FRAME_META_FILE), "w") as f:
+        json.dump(meta, f, ensure_ascii = False)
+
+## Read a query result written by write_frame
+#  - inputs: entry directory
+#  - returns: QueryResult (or DataFrame)
+def read_frame(path):
+
+    import pandas as pd
+    from .query_result import QueryResult
+
+    with open(os.path.join(path, FRAME_META_FILE)) as f:
+        meta = json.load(f)
+    with np.load(os.path.join(path, FRAME_FILE), allow_pickle = False) as arrays:
+        columns = {}
+        for k, name in enumerate(meta["columns"]):
+            values = arrays["column_{:d}".format(k)]
+            columns[name] = values.astype(object) if name in meta["objects"] else values
+        if meta["type"] == "DataFrame":
+            return pd.DataFrame(columns)
+
+        axes = {name: arrays["axis_{:d}".format(k)] for k, name in enumerate(meta["axes"])}
+        stats = None
+        if meta["stats"] is not None:
+            stats = {}
+            for k, name in enumerate(meta["stats"]):
+                val = arrays["stats_{:d}".format(k)]
+                stats[name] = val.item() if name in meta["python"] else (val[()] if val.ndim == 0 else val)
+    return QueryResult(columns, meta["dims"], meta["shape"], axes, stats)
+
+
+## Directory of query results with least-recently-used eviction
+#  - inputs: cache directory (created if needed), maximum total size of the entries in bytes
+#    (the entry stored last is always kept, even when it alone exceeds max_bytes)
+#  - each entry is a directory named by the key, written under a temporary name and renamed into place,
+#    so readers never see a partial entry; its modification time is the time of last use
+class ResultCache:
+
+    def __init__(self, directory, max_bytes = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.directory, "tmp"), exist_ok = True)
+
+    ## Key of a query result
+    #  - inputs: model name, model path (or CTMModel), query type, query parameters, output format
+    #  - returns: hexadecimal SHA-256 of all of them and of the model configuration (see model_config)
+    def key(self, modelname, modelpath, qtype, params, outformat):
+        text = json.dumps([CACHE_VERSION, modelname, model_identity(modelpath),
+                           normalize_params(model_config(modelname, modelpath)), qtype,
+                           normalize_params(params), normalize_params(outformat)], sort_keys = True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    # directory of an entry
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    # look up an entry and mark it as used
+    def _lookup(self, key, names):
+        path = self._path(key)
+        if not all(os.path.exists(os.path.join(path, name)) for name in names):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    # count a hit or a miss
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    # add an entry from a function writing its files into a directory
+    def _store(self, key, write):
+        tmp = tempfile.mkdtemp(dir = os.path.join(self.directory, "tmp"))
+        try:
+            write(tmp)
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            if os.path.exists(path):
+                # replaced by a newer result for the same key (e.g. with other output files)
+                shutil.rmtree(path, ignore_errors = True)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                pass                # stored by another process in the meantime: same content
+        finally:
+            shutil.rmtree(tmp, ignore_errors = True)
+        self.evict(keep = self._path(key))
+
+    ## Copy the stored output files of a query to their paths
+    #  - inputs: key, dictionary of {name: output path}
+    #  - returns: True on a hit (all files copied), False on a miss
+    def get_files(self, key, outpaths):
+        with profile_stage("cache"):
+            path = self._lookup(key, list(outpaths))
+            try:
+                for name, outpath in (outpaths.items() if path else ()):
+                    # copy next to the output and rename, so the output file is never partly written
+                    tmp = "{:}.{:}.tmp".format(outpath, os.getpid())
+                    shutil.copyfile(os.path.join(path, name), tmp)
+                    os.replace(tmp, outpath)
+            except FileNotFoundError:
+                path = None         # evicted by another process since the lookup: a miss
+            return self._count(path is not None)
+
+    ## Store the output files of a query
+    #  - inputs: key, dictionary of {name: output path}
+    #  - returns: None
+    def put_files(self, key, outpaths):
+        def write(tmp):
+            for name, outpath in outpaths.items():
+                shutil.copyfile(outpath, os.path.join(tmp, name))
+        with profile_stage("cache"):
+            self._store(key, write)
+
+    ## Stored result of a query
+    #  - inputs: key
+    #  - returns: QueryResult (or DataFrame), or None on a miss
+    def get_frame(self, key):
+        with profile_stage("cache"):
+            path = self._lookup(key, [FRAME_FILE, FRAME_META_FILE])
+            try:
+                df = None if path is None else read_frame(path)
+            except FileNotFoundError:
+                df = None           # evicted by another process since the lookup: a miss
+            self._count(df is not None)
+            return df
+
+    ## Store the result of a query
+    #  - inputs: key, QueryResult (or DataFrame)
+    #  - returns: None
+    def put_frame(self, key, df):
+        with profile_stage("cache"):
+            self._store(key, lambda tmp: write_frame(df, tmp))
+
+    ## Run a query function through the cache
+    #  - inputs: query function (e.g. query_2D_vertical_cross_section), model name, model path (or CTMModel),
+    #    the other arguments of the function by name
+    #  - returns: result of the query; on a hit the model is not opened
+    def query(self, func, modelname, modelpath, **params):
+        key = self.key(modelname, modelpath, func.__name__, params, "columns")
+        df = self.get_frame(key)
+        if df is None:
+            df = func(modelname = modelname, modelpath = modelpath, **params)
+            self.put_frame(key, df)
+        return df
+
+    # entries as (last use, size in bytes, path)
+    def _entries(self):
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir() or sub.name == "tmp":
+                continue
+            for entry in os.scandir(sub.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    pass            # removed by another process
+        return entries
+
+    ## Remove the least recently used entries until the cache is within its size limit
+    #  - inputs: entry to keep even when it alone exceeds the limit (the one just stored)
+    #  - returns: number of entries removed
+    def evict(self, keep = None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        nevict = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors = True)
+            total -= size
+            nevict += 1
+        with self._lock:
+            self.evictions += nevict
+        return nevict
+
+    ## Remove all entries and reset the counters
+    #  - returns: None
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors = True)
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    ## Cache statistics
+    #  - returns: dictionary with hits, misses, evictions (of this process), entries and nbytes (of the directory)
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {"directory": self.directory,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(entries),
+                    "nbytes": sum(size for _, size, _ in entries)}
+
+
+# caches opened in this process, by directory
+_caches = {}
+_caches_lock = threading.Lock()
+
+## Get the cache of a directory, shared by all queries of this process
+#  - inputs: cache directory (default: $CTM_CACHE_DIR), maximum size in bytes (default: $CTM_CACHE_MAX_BYTES or 1 GiB)
+#  - returns: ResultCache, or None when there is no directory
+def get_result_cache(directory = None, max_bytes = None):
+
+    directory = directory or os.environ.get(CACHE_ENV)
+    if not directory:
+        return None
+    if max_bytes is None:
+        max_bytes = int(float(os.environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_BYTES)))
+
+    with _caches_lock:
+        cache = _caches.get(os.path.abspath(directory))
+        if cache is None:
+            cache = _caches[os.path.abspath(directory)] = ResultCache(directory, max_bytes)
+        cache.max_bytes = max_bytes
+        return cache
+
+## Caches opened in this process
+#  - returns: list of ResultCache
+def result_caches():
+    with _caches_lock:
+        return list(_caches.values())
+
+## Parameters of a command line query for the key: all arguments except the model, the output paths and
+## the options not changing the result
+#  - inputs: argparse Namespace
+#  - returns: dictionary
+def query_params(args):
+    return {k: v for k, v in vars(args).items() if k not in ('modelname', 'modelpath', 'outpath', 'profile', 'cache')}
+
+## Output files of a CSV query: the file with dummy columns, and the final file when it has another path
+#  - inputs: output path, final output path, suffix of the names (e.g. for one depth of a stack)
+#  - returns: dictionary of {name: output path}
+def csv_outpaths(outpath, final_outpath, suffix = ''):
+    if final_outpath == outpath:
+        return {'dummy' + suffix: outpath}
+    return {'dummy' + suffix: outpath, 'final' + suffix: final_outpath}
+
+## Write the outputs of a command line query, or copy them from the cache
+#  - inputs: cache directory (None for no cache), model name, model path, query type, query parameters,
+#    dictionary of {name: output path}, function computing the query and writing the outputs
+#  - returns: True when the outputs came from the cache
+def cached_outputs(directory, modelname, modelpath, qtype, params, outpaths, write):
+
+    cache = get_result_cache(directory)
+    if cache is None:
+        write()
+        return False
+
+    key = cache.key(modelname, modelpath, qtype, params, sorted(outpaths))
+    if cache.get_files(key, outpaths):
+        return True
+    write()
+    cache.put_files(key, outpaths)
+    return False
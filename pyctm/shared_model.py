@@ -0,0 +1,218 @@
+### Import Packages
+import contextlib
+import multiprocessing.util
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+import xarray as xr
+
+from .model_registry import CTMModel, get_model
+from .surface_layer import surface_depth, with_surface_layer
+
+# name of the data variable of shared models
+SHARED_VAR = "temperature[°C]"
+# process ids of the loader and of the attached workers, at the start of the block (the reference count)
+MAX_HOLDERS = 1024
+HEADER_BYTES = 8 * MAX_HOLDERS
+
+## Description of a shared model, passed to worker processes (e.g. as Pool initializer arguments)
+#  - attributes: model name, shared memory block name, dtype, dimension names and shape of the array, coordinate
+#    arrays, depth of the surface layer included in the array (None: none added)
+class SharedCTMInfo:
+
+    def __init__(self, modelname, shmname, dtype, dims, shape, coords, surface = None):
+        self.modelname = modelname
+        self.shmname = shmname
+        self.dtype = dtype
+        self.dims = dims
+        self.shape = shape
+        self.coords = coords
+        self.surface = surface
+
+
+## Temperature array and coordinates of a model placed in shared memory by a loader process
+#  - inputs: model name, normalized Xarray Dataset, whether to add the surface layer for models that
+#    do not start at the surface (default: for the models configured in surface_layer.py)
+#  - the loader and each attached worker hold a reference; the block is removed when the last one releases it,
+#    so it stays valid while workers are attached; workers that exited without releasing (e.g. terminated at
+#    the end of 'with Pool(...)') no longer count
+class SharedCTM:
+
+    def __init__(self, modelname, xdata, surface = None):
+
+        # depth of the surface layer: the configured one by default, depth 0 with surface = True
+        depth = surface_depth(modelname, xdata)
+        if surface is not None:
+            depth = (0.0 if depth is None else depth) if surface else None
+
+        # sorted coordinates and surface layer, as in a compiled model
+        xdata = xdata[[SHARED_VAR]].sortby(["longitude[°]", "latitude[°]", "depth[m]"])
+        xdata = with_surface_layer(xdata, depth)
+
+        var = xdata[SHARED_VAR]
+        values = np.ascontiguousarray(var.values)
+
+        self.shm = shared_memory.SharedMemory(create = True, size = HEADER_BYTES + max(values.nbytes, 1))
+        _acquire(self.shm)
+        data = np.ndarray(values.shape, dtype = values.dtype, buffer = self.shm.buf, offset = HEADER_BYTES)
+        data[...] = values
+        del data
+
+        coords = {name: xdata[name].values for name in var.dims}
+        self.info = SharedCTMInfo(modelname, self.shm.name, values.dtype.str, var.dims, values.shape, coords, depth)
+
+    ## Release the loader's reference; the block is removed once no attached worker is left
+    #  - inputs: force = True removes the block even if workers are still attached (their mappings stay valid)
+    #  - returns: None
+    def close(self, force = False):
+        if self.shm is not None:
+            _release(self.shm, force)
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+## A shared model attached in a worker process, without copying the array
+#  - inputs: SharedCTMInfo
+#  - attributes: xdata (read-only Xarray Dataset on the shared array), model (CTMModel handle for the query functions)
+class AttachedCTM:
+
+    def __init__(self, info):
+
+        # from Python 3.13 the worker does not register the block with the resource tracker
+        kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+        self.info = info
+        self.shm = shared_memory.SharedMemory(name = info.shmname, **kwargs)
+        _acquire(self.shm)
+
+        data = np.ndarray(info.shape, dtype = np.dtype(info.dtype), buffer = self.shm.buf, offset = HEADER_BYTES)
+        data.flags.writeable = False
+        self.xdata = xr.Dataset({SHARED_VAR: (info.dims, data)}, coords = {name: (name, vals) for name, vals in info.coords.items()})
+
+        # the layer is in the array; the handle reports the one the loader shared (e.g. for the result cache keys)
+        self.model = CTMModel(info.modelname, "shm://" + info.shmname, 0, self.xdata)
+        self.model.surface = info.surface
+
+    ## Release this worker's reference
+    #  - returns: None
+    def close(self):
+        if self.shm is not None:
+            self.model.cache.clear()
+            self.model = self.xdata = None
+            _release(self.shm)
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# hold an exclusive lock on the block while changing its holders (POSIX only; Windows frees the block itself
+# when the last handle is closed)
+@contextlib.contextmanager
+def _locked(shm):
+    fd = getattr(shm, "_fd", -1)
+    if fcntl is None or fd < 0:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+# whether a process is running
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# add this process to the holders of the block
+def _acquire(shm):
+    with _locked(shm):
+        holders = np.ndarray((MAX_HOLDERS,), dtype = np.int64, buffer = shm.buf)
+        free = np.flatnonzero(holders == 0)
+        if free.size == 0:
+            free = np.flatnonzero([not _alive(pid) for pid in holders])
+        if free.size == 0:
+            del holders
+            _close(shm)
+            raise ValueError('Undefined holder: too many processes attached to the shared model', MAX_HOLDERS)
+        holders[free[0]] = os.getpid()
+        del holders
+
+# drop one reference of this process, and remove the block when no running process holds it
+def _release(shm, force = False):
+    with _locked(shm):
+        holders = np.ndarray((MAX_HOLDERS,), dtype = np.int64, buffer = shm.buf)
+        own = np.flatnonzero(holders == os.getpid())
+        if own.size:
+            holders[own[0]] = 0
+        for k in np.flatnonzero(holders):
+            if not _alive(holders[k]):
+                holders[k] = 0
+        remove = force or not holders.any()
+        del holders
+    if remove:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            # already removed by a forced close
+            pass
+        else:
+            if not getattr(shm, "_track", True):
+                # untracked worker (Python 3.13+): the loader's resource tracker still lists the block
+                resource_tracker.unregister(shm._name, "shared_memory")
+    _close(shm)
+
+# close the mapping of a block in this process
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # arrays on the block are still referenced; the mapping goes away with them
+        pass
+
+
+## Load a model once and place it in shared memory
+#  - inputs: model name, model path (or registered CTMModel), whether to add the surface layer (default: for the models configured in surface_layer.py)
+#  - returns: SharedCTM; pass its info to the workers
+def share_model(modelname, modelpath, surface = None):
+    return SharedCTM(modelname, get_model(modelname, modelpath).xdata, surface)
+
+# models attached in this process, by shared memory block name
+_attached = {}
+
+## Attach a shared model in this process (once per process, e.g. from a Pool initializer)
+#  - inputs: SharedCTMInfo
+#  - returns: CTMModel handle that can be passed to the query functions in place of the model path
+def attach_shared_model(info):
+    if info.shmname not in _attached:
+        if not _attached:
+            # release the references when a worker process exits normally
+            multiprocessing.util.Finalize(None, detach_shared_models, exitpriority = 10)
+        _attached[info.shmname] = AttachedCTM(info)
+    return _attached[info.shmname].model
+
+## Detach the shared models attached in this process
+#  - returns: None
+def detach_shared_models():
+    while _attached:
+        _attached.popitem()[1].close()
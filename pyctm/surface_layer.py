@@ -0,0 +1,90 @@
+### Import Packages
+import numpy as np
+import xarray as xr
+
+from .grid_interpolator import get_grid_interpolator
+from .profiling import profile_stage
+
+# depth (m) of the virtual surface layer, by model name, for models whose shallowest stored depth is
+# below the surface; the layer is extrapolated linearly from the first two stored depths when a query
+# reaches above the shallowest one (Boyd (2019) starts at 500 m)
+SURFACE_LAYERS = {"Boyd_2019": 0.0}
+
+## Set or remove the virtual surface layer of a model (applies to models opened afterwards)
+#  - inputs: model name, depth of the layer (m), or None for no layer
+#  - returns: None
+def set_surface_layer(modelname, depth = 0.0):
+    if depth is None:
+        SURFACE_LAYERS.pop(modelname, None)
+    else:
+        SURFACE_LAYERS[modelname] = float(depth)
+
+## Depth of the virtual surface layer of a model
+#  - inputs: model name, normalized Xarray Dataset
+#  - returns: depth (m), or None when the model has no layer configured or already starts at that depth
+#    (e.g. compiled models, which include the layer)
+def surface_depth(modelname, xdata):
+    depth = SURFACE_LAYERS.get(modelname)
+    if depth is None or float(xdata["depth[m]"].min()) <= depth:
+        return None
+    return depth
+
+## Surface layer extrapolated from the first two stored depths
+#  - inputs: normalized Xarray Dataset (depth ascending), depth of the layer (m)
+#  - returns: Xarray Dataset with the single depth of the layer
+def extrapolate_surface(xdata, depth = 0.0):
+    top = xdata.isel({"depth[m]": slice(0, 2)})
+    return cast_result(top.interp({"depth[m]": [depth]}, method = "linear", kwargs = {"fill_value": "extrapolate"}), top)
+
+## Model with its surface layer, for queries down to a depth
+#  - inputs: normalized Xarray Dataset, depth of the layer (m) or None, shallowest and deepest query depths (m)
+#    (None for the whole depth range)
+#  - returns: the Dataset itself when the query stays within the stored depths, else a Dataset with the
+#    surface layer and the stored depths down to the first one at or below the deepest query depth
+def with_surface_layer(xdata, depth, zmin = None, zmax = None):
+
+    deps = xdata["depth[m]"].values
+    if depth is None or depth >= deps.min() or (zmin is not None and zmin >= deps.min()):
+        return xdata
+    if np.any(np.diff(deps) <= 0):
+        xdata = xdata.sortby("depth[m]")
+        deps = xdata["depth[m]"].values
+
+    # stored depths the query interpolates between (at least the two the layer is extrapolated from)
+    n = deps.size if zmax is None else int(np.searchsorted(deps, zmax, side = "left")) + 1
+    n = min(max(n, 2), deps.size)
+
+    # renamed models may lack an index on the depth
+    stored = xdata.isel({"depth[m]": slice(0, n)})
+    stored = stored.assign_coords({"depth[m]": stored["depth[m]"].values})
+    return xr.concat([extrapolate_surface(xdata, depth), stored], dim = "depth[m]")
+
+## Dataset a query interpolates in: the model, with its surface layer when the query reaches above the
+## shallowest stored depth
+#  - inputs: CTMModel, interpolation engine ('xarray' or 'fast'), query depths (None when not known in advance)
+#  - returns: Xarray Dataset, or GridInterpolator for the fast engine (which adds the layer itself)
+def query_dataset(model, engine = 'xarray', depths = None):
+
+    if engine == 'fast':
+        return get_grid_interpolator(model)
+    elif engine == 'xarray':
+        if model.surface is None:
+            return model.xdata
+        zmin, zmax = (None, None) if depths is None else (np.min(depths), np.max(depths))
+        with profile_stage("surface"):
+            return with_surface_layer(model.xdata, model.surface, zmin, zmax)
+    else:
+        raise ValueError('Undefined interpolation engine', engine)
+
+## Interpolation result in the floating-point type of the model (xarray interpolates in float64, so the results
+## of float32 models are cast back; the fast engine keeps the type of the model)
+#  - inputs: Xarray Dataset of the result, Dataset (or GridInterpolator) the query interpolated in
+#  - returns: Xarray Dataset
+def cast_result(xi, xdata):
+
+    if not isinstance(xdata, xr.Dataset):
+        return xi
+    for name, var in xi.data_vars.items():
+        if name in xdata.data_vars and var.dtype != xdata[name].dtype and np.issubdtype(xdata[name].dtype, np.floating):
+            xi[name] = var.astype(xdata[name].dtype)
+    return xi
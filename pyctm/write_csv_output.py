@@ -1,33 +1,72 @@
 
 # Import package
+import contextlib
+import os
+import threading
 import numpy as np
 import pandas as pd
-from pyproj import Geod
 
-from .dTdz_2D_cross_section import dTdz_2D_cross_section
+from .header_stats import HEADER_QUERIES, frame_stats
+from .profiling import profile_stage
+from .query_result import frame_rows
+
+# extra NaN columns of the dummy output variant
+DUMMY_COLUMNS = ["dummy1", "dummy2"]
+
+# working directory of the client whose request the current thread runs (see ctm_serve.py)
+_client = threading.local()
+
+## Run the queries of the current thread for a client in another working directory; the client joined its
+## relative paths to this directory, which derived output paths leave as it is (see derived_outpath)
+#  - inputs: client working directory (None: paths are used as given)
+#  - returns: context manager
+@contextlib.contextmanager
+def client_directory(cwd):
+    previous = getattr(_client, 'cwd', None)
+    _client.cwd = cwd
+    try:
+        yield
+    finally:
+        _client.cwd = previous
+
+## Output path derived from another by replacing part of it (e.g. 'data' by 'data_final'); for a path the
+## client joined to its working directory, only the part it gave is changed, as when it runs the query itself
+#  - inputs: output path, text to replace, replacement
+#  - returns: derived output path
+def derived_outpath(outpath, old, new):
+    cwd = getattr(_client, 'cwd', None)
+    if cwd:
+        base = os.path.join(cwd, '')
+        if outpath.startswith(base):
+            return base + outpath[len(base):].replace(old, new)
+    return outpath.replace(old, new)
 
 ## Compile CSV header information
-#  - inputs: output dataframe, query type
+#  - inputs: output dataframe (or QueryResult), query type
 #  - returns: header text
 def get_csv_header(df, qtype, modelname, **kwargs):
     
     # common header for all types
     head = "# Title: CTM"
 
-    # 1D vertical profile
-    if qtype == '1D_vertical':  
+    # statistics of the gridded queries: computed with the result when it has them, otherwise from the rows
+    if qtype in HEADER_QUERIES:
+        stats = getattr(df, 'stats', None) or frame_stats(df, qtype)
+
+    # 1D vertical profile, and profiles of many sites in one long table (same layout, with the number of sites
+    # in place of the location)
+    if qtype in ('1D_vertical', '1D_profiles'):
 
         # extract data
-        lon, lat = kwargs['longitude'], kwargs['latitude']
-        depths = np.sort(df['# Depth(m)'].unique())
+        depths = stats['depths']
         zstart, zend = depths[0], depths[-1]
-        zspace = depths[1] - depths[0]
+        zspace = depths[1] - depths[0] if depths.size > 1 else 0.0
         dz = (depths[-1] - depths[0]) / 1000                              # Convert m to km
-        dT = df['Temperature(°C)'].max() - df['Temperature(°C)'].min()    # Get temperature difference
+        dT = stats['T_max'] - stats['T_min']                              # Get temperature difference
         dTdz = dT / dz                                                    # Calculate geothermal gradient
 
         # write fields
-        head += " 1D Profile\n"
+        head += " 1D Profile\n" if qtype == '1D_vertical' else " 1D Profiles\n"
         if modelname == 'Lee_2026':
             head += "# CTM(abbr): lee2026\n"
         elif modelname == 'Shinevar_2018':
@@ -38,30 +77,35 @@ def get_csv_header(df, qtype, modelname, **kwargs):
             head += "# CTM(abbr): boyd2019\n"
         elif modelname == 'Suietal_2025':
             head += "# CTM(abbr): suietal2025\n"
-        head += "# Lat: {:.6f}\n# Lon: {:.6f}\n".format(lat,lon)
+        if qtype == '1D_vertical':
+            head += "# Lat: {:.6f}\n# Lon: {:.6f}\n".format(kwargs['latitude'], kwargs['longitude'])
+        else:
+            head += "# Sites: {:}\n".format(stats['nsite'])
         head += "# Start_depth(m): {:.3f}\n".format(zstart)
         head += "# End_depth(m): {:.3f}\n".format(zend)
         head += "# Vert_spacing(m): {:.3f}\n".format(zspace)
         head += "# Average dT/dz(°C/km): {:.3f}\n".format(dTdz)
-    
-    # 2D horizontal slice
-    elif qtype == "2D_horizontal":
+
+    # 2D horizontal slice, and 2D map products (isotherm depth or averaged gradient) in the same layout, with
+    # the statistics of the product
+    elif qtype in ("2D_horizontal", "2D_map"):
 
         # extract data
-        depth = kwargs['z']
-        lons = np.sort(df['# Lon'].unique())
-        lats = np.sort(df['Lat'].unique())
+        data_type = "T[°C]" if qtype == "2D_horizontal" else kwargs['data_type']
+        lons, lats = stats['lons'], stats['lats']
         lon1, lon2 = lons[0], lons[-1]
         lat1, lat2 = lats[0], lats[-1]
         nlon, nlat = lons.size, lats.size
         npts = nlon * nlat
         spacing = np.abs(lons[1] - lons[0])
-        Tmin = df['Temperature(°C)'].min()
-        Tmax = df['Temperature(°C)'].max()
-        Tmean = df['Temperature(°C)'].mean()
+        Tmin, Tmax, Tmean = stats['T_min'], stats['T_max'], stats['T_mean']
+        symbol = data_type.split('[')[0]
 
         # write fields
-        head += " Horizontal Slice at {:.3f} m depth\n".format(depth)
+        if qtype == "2D_horizontal":
+            head += " Horizontal Slice at {:.3f} m depth\n".format(kwargs['z'])
+        else:
+            head += " Map of {:}\n".format(kwargs['product'])
         if modelname == 'Lee_2026':
             head += "# CTM(abbr): lee2026\n"
         elif modelname == 'Shinevar_2018':
@@ -72,47 +116,43 @@ def get_csv_header(df, qtype, modelname, **kwargs):
             head += "# CTM(abbr): boyd2019\n"
         elif modelname == 'Suietal_2025':
             head += "# CTM(abbr): suietal2025\n"
-        head += "# Data_type: T[°C]\n"
-        head += "# Depth(m): {:.3f}\n".format(depth)
+        head += "# Data_type: {:}\n".format(data_type)
+        if qtype == "2D_horizontal":
+            head += "# Depth(m): {:.3f}\n".format(kwargs['z'])
+        if 'temperature' in kwargs:
+            head += "# Isotherm(°C): {:.3f}\n".format(kwargs['temperature'])
+        if 'depth_range' in kwargs:
+            head += "# Start_depth(m): {:.3f}\n".format(kwargs['depth_range'][0])
+            head += "# End_depth(m): {:.3f}\n".format(kwargs['depth_range'][1])
         head += '# Spacing(degree): {:.6f}\n'.format(spacing)
         head += "# Lon_pts: {:}\n".format(nlon)
         head += "# Lat_pts: {:}\n".format(nlat)
         head += "# Total_pts: {:}\n".format(npts)
-        head += "# T Min: {:.6f}\n".format(Tmin)
-        head += "# T Max: {:.6f}\n".format(Tmax)
-        head += "# T Mean: {:.6f}\n".format(Tmean)
+        head += "# {:} Min: {:.6f}\n".format(symbol, Tmin)
+        head += "# {:} Max: {:.6f}\n".format(symbol, Tmax)
+        head += "# {:} Mean: {:.6f}\n".format(symbol, Tmean)
         head += "# Lat1: {:.6f}\n".format(lat1)
         head += "# Lat2: {:.6f}\n".format(lat2)
         head += "# Lon1: {:.6f}\n".format(lon1)
         head += "# Lon2: {:.6f}\n".format(lon2)
-    
+
     # 2D vertical slice
     elif qtype == "2D_vertical":
         
         # extract data
-        depths = np.sort(df['Depth(m)'].unique())
+        depths = stats['depths']
         zstart, zend = depths[0], depths[-1]
         zspace = depths[1] - depths[0]
         nz = depths.size
-        lons = df['# Lon'].unique()
-        lats = df['Lat'].unique()
-        nlon, nlat = lons.size, lats.size
-        lon1 = df.loc[0, '# Lon']
-        lon2 = df.loc[len(df)-1,'# Lon']
-        lat1 = df.loc[0, 'Lat']
-        lat2 = df.loc[len(df)-1,'Lat']
-        nxy = len(df[['Lat', '# Lon']].drop_duplicates())
+        lon1, lon2, lat1, lat2 = stats['lon1'], stats['lon2'], stats['lat1'], stats['lat2']
+        nxy = stats['npts_track']
         npts = nxy * nz
-        Tmin = df['Temperature(°C)'].min()
-        Tmax = df['Temperature(°C)'].max()
-        Tmean = df['Temperature(°C)'].mean()
-        df_dTdz = dTdz_2D_cross_section(df)
-        dTdz_max = df_dTdz['dTdz[°C/km]'].max()
+        Tmin, Tmax, Tmean = stats['T_min'], stats['T_max'], stats['T_mean']
+        dTdz_max = stats['dTdz_max']
 
-        # Find horizontal space
-        geod = Geod(ellps = 'WGS84')
-        az1, az2, dist = geod.inv(lon1, lat1, lon2, lat2)
-        horizontal_space = dist / nxy
+        # Find horizontal space from the length of the track (the sum of its geodesic steps, so polyline
+        # sections are measured along their bends)
+        horizontal_space = stats['track_length'] / nxy
 
         # write fields
         head += " Cross Section from ({:.3f}, {:.3f}) to ({:.3f}, {:.3f})\n".format(lon1, lat1, lon2, lat2)
@@ -151,19 +191,35 @@ def get_csv_header(df, qtype, modelname, **kwargs):
 
     return head
 ## Output function
-#  - inputs: output dataframe, file path, query type
+#  - inputs: output dataframe (or QueryResult), file path, query type, model name; optional second file path that gets the
+#    same rows with two extra NaN columns (dummy1, dummy2), number of rows formatted per chunk
 #  - returns: None
-def write_csv_output(df, outfile, qtype, modelname, **kwargs):
-    
-    # write file without header
-    df.to_csv(outfile, index=None, float_format="%.6f", na_rep=np.nan)
-
-    # get header 
-    qtext = get_csv_header(df, qtype, modelname, **kwargs)
-
-    # update the file to include header
-    with open(outfile, "r") as f:
-        lines = f.readlines()
-    with open(outfile, "w") as f:
-        f.write(qtext)
-        f.writelines(lines) 
+def write_csv_output(df, outfile, qtype, modelname, dummy_outfile = None, chunksize = 100000, **kwargs):
+
+    # get header first, so the rows can be streamed straight after it
+    with profile_stage("header"):
+        qtext = get_csv_header(df, qtype, modelname, **kwargs)
+
+    # the dummy file replaces the plain one when both have the same name
+    outfiles = []
+    if outfile is not None and outfile != dummy_outfile:
+        outfiles.append((outfile, ""))
+    if dummy_outfile is not None:
+        outfiles.append((dummy_outfile, ",nan,nan"))
+
+    with profile_stage("write_csv"):
+        files = [(open(path, "w"), suffix) for path, suffix in outfiles]
+        try:
+            for f, suffix in files:
+                f.write(qtext)
+                f.write(",".join(df.columns) + ("," + ",".join(DUMMY_COLUMNS) if suffix else "") + "\n")
+
+            # format each chunk once and write it to all files
+            for start in range(0, len(df), chunksize):
+                text = frame_rows(df, start, start+chunksize).to_csv(None, header = False, index = None,
+                                                             float_format = "%.6f", na_rep = "nan", lineterminator = "\n")
+                for f, suffix in files:
+                    f.write(text.replace("\n", suffix + "\n") if suffix else text)
+        finally:
+            for f, suffix in files:
+                f.close()
@@ -55,6 +55,8 @@ if __name__ == "__main__":
         keywords=KEYWORDS,
         install_requires=INSTALL_REQUIRES,
         packages=["pyctm"], 
+        entry_points={"console_scripts": ["ctm = pyctm.__main__:main", "pyctm = pyctm.__main__:main"]},
         scripts=[ "ctm_plotting/query_0d_point.py", "ctm_plotting/query_1d_depth_profile.py",
-                  "ctm_plotting/query_2d_cross_section.py", "ctm_plotting/query_2d_horizontal_slice.py" ] 
+                  "ctm_plotting/query_2d_cross_section.py", "ctm_plotting/query_2d_horizontal_slice.py",
+                  "ctm_plotting/ctm_serve.py", "ctm_plotting/ctm_client.py", "ctm_plotting/ctm_batch.py" ] 
     )
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+#
+#  conftest.py
+#
+#  Shared test setup: the repository and the benchmarks directory (synthetic models) on the import path, and
+#  one synthetic model file per source layout, written once for the whole test session.
+#
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic_models import write_synthetic_model, LAYOUTS
+
+# synthetic model paths by model name, for each layout understood by init_ctm
+@pytest.fixture(scope = 'session')
+def models(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('models')
+    return {name: write_synthetic_model(name, str(tmp / (name + '.nc'))) for name in LAYOUTS}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#
+#  test_cold_start.py
+#
+#  Cold start of the 'ctm' command: a point query in a new Python process must stay within a time budget
+#  and must not import the plotting, geodesic or scipy modules it does not use.
+#  The budget (seconds) can be changed with the CTM_COLD_START_BUDGET environment variable.
+#  Run: python -m pytest tests/test_cold_start.py
+#
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+# repository root, on the import path of the processes started by the tests
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic_models import write_synthetic_model, synthetic_temperature
+
+# cold point query budget in seconds; about 0.9 s on a laptop, dominated by importing xarray
+BUDGET = float(os.environ.get('CTM_COLD_START_BUDGET', 3.0))
+
+# modules the commands must not import when they are not used
+HEAVY = ('matplotlib', 'pyproj', 'scipy')
+
+# run a script in a new Python process; it prints the JSON list of loaded top-level modules
+def run_cold(code, tmp_path):
+    env = dict(os.environ, PYTHONPATH = ROOT)
+    env.pop('CTM_PROFILE', None)
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd = tmp_path, env = env,
+                         capture_output = True, text = True, check = True)
+    return time.perf_counter() - t0, set(json.loads(out.stdout.splitlines()[-1]))
+
+MODULES = "import sys, json; print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))"
+
+def test_import_pyctm(tmp_path):
+    elapsed, modules = run_cold("import pyctm; " + MODULES, tmp_path)
+    assert not modules & set(HEAVY + ('numpy', 'pandas', 'xarray'))
+
+def test_point_cold_start(tmp_path):
+    modelpath = write_synthetic_model('Lee_2026', str(tmp_path / 'lee.nc'))
+    code = ("from pyctm.__main__ import main; "
+            "main(['point', '--lat', '40', '--lon', '-115', '--z', '10000', '--modelname', 'Lee_2026', "
+            "'--modelpath', {:}, '--outpath', 'point.json', '--engine', 'fast']); ".format(repr(modelpath)) + MODULES)
+
+    # best of two runs, so a busy machine does not fail the test
+    runs = [run_cold(code, tmp_path) for _ in range(2)]
+    elapsed = min(run[0] for run in runs)
+
+    assert not runs[0][1] & set(HEAVY)
+    with open(tmp_path / 'point.json') as f:
+        assert abs(json.load(f)['temp'] - synthetic_temperature([-115], [40], [10000]).item()) < 0.5
+    assert elapsed < BUDGET, 'cold point query took {:.2f} s (budget {:.2f} s)'.format(elapsed, BUDGET)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+#  test_compare_models.py
+#
+#  Model comparisons: the temperatures of each model must equal its single-model query, the pairwise differences
+#  and spread statistics must follow the model columns (skipping models outside the query with bounds 'nan'),
+#  duplicate model names are refused, '--dtype float32' opens every model with float32 temperatures, and the
+#  cross-section sampling options ('--ntrack', '--ndep', '--waypoint') give the points of 'ctm xsection'.
+#  Run: python -m pytest tests/test_compare_models.py
+#
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from pyctm import compare_models, query_0D_point, query_1D_vertical_profile, query_2D_vertical_cross_section, default_registry
+from pyctm.compare_models import call_func
+
+# largest difference to the single-model queries (°C), and of the float32 comparison to the float64 one
+TOLERANCE = 1e-9
+TOLERANCE32 = 1e-3
+
+MODELS = ('Lee_2026', 'Shinevar_2018', 'Boyd_2019')
+
+PROFILE = {'lat': 40, 'lon': -115, 'z_start': 0, 'z_end': 20000, 'z_step': 1000}
+
+@pytest.mark.parametrize('workers', (None, 1))
+def test_matches_single_models(models, workers):
+    out = compare_models('profile', [(name, models[name]) for name in MODELS], PROFILE, workers = workers)
+    assert out.attrs['ctm_models'] == ','.join(MODELS)
+    for name, path in ((name, models[name]) for name in MODELS):
+        df = query_1D_vertical_profile(modelname = name, modelpath = path, **PROFILE)
+        assert np.allclose(out['depth[m]'], df['depth[m]'])
+        assert np.abs(out[name].values - df['temperature[°C]'].values).max() < TOLERANCE
+
+    out = compare_models('point', [(name, models[name]) for name in MODELS], {'lat': 40, 'lon': -115, 'z': 1000}, workers = workers)
+    for name, path in ((name, models[name]) for name in MODELS):
+        assert abs(out[name].values[0] - query_0D_point(40, -115, 1000, name, path)['temperature[°C]'].values[0]) < TOLERANCE
+
+def test_diffs_and_stats(models):
+    out = compare_models('profile', [(name, models[name]) for name in MODELS], PROFILE, diffs = True, stats = True)
+    temps = np.stack([out[name].values for name in MODELS])
+
+    assert [var for var in out.data_vars if '-' in var] == ['Lee_2026-Shinevar_2018', 'Lee_2026-Boyd_2019',
+                                                           'Shinevar_2018-Boyd_2019']
+    assert np.array_equal(out['Lee_2026-Boyd_2019'].values, temps[0] - temps[2])
+    assert np.allclose(out['mean'], temps.mean(axis = 0)) and np.allclose(out['std'], temps.std(axis = 0))
+    assert np.array_equal(out['min'], temps.min(axis = 0)) and np.array_equal(out['max'], temps.max(axis = 0))
+    assert np.allclose(out['range'], temps.max(axis = 0) - temps.min(axis = 0))
+
+def test_bounds(models, tmp_path):
+    # a model covering only the east of the others
+    small = str(tmp_path / 'small.nc')
+    with xr.open_dataset(models['Shinevar_2018']) as ds:
+        ds.sel(longitude = slice(-114, -110)).to_netcdf(small)
+    pairs = [('Lee_2026', models['Lee_2026']), ('Shinevar_2018', small)]
+
+    with pytest.raises(ValueError, match = 'Shinevar_2018'):
+        compare_models('profile', pairs, PROFILE)
+
+    out = compare_models('profile', pairs, PROFILE, stats = True, bounds = 'nan')
+    assert np.isnan(out['Shinevar_2018']).all()
+    assert np.array_equal(out['mean'], out['Lee_2026']) and (out['range'] == 0).all()
+
+def test_duplicate_names(models):
+    with pytest.raises(ValueError, match = 'Duplicate model names'):
+        compare_models('profile', [('Lee_2026', models['Lee_2026']), ('Lee_2026', models['Shinevar_2018'])], PROFILE)
+
+    # the same name given twice on the command line
+    argv = ['profile'] + ['--{:}={:}'.format(key, val) for key, val in PROFILE.items()]
+    argv += ['--model', 'Lee_2026=' + models['Lee_2026'], '--model', 'Lee_2026=' + models['Boyd_2019'], '--outpath', 'x.csv']
+    with pytest.raises(ValueError, match = 'Duplicate model names'):
+        call_func(argv)
+
+def test_dtype(models, tmp_path):
+    out = compare_models('profile', [(name, models[name]) for name in MODELS], PROFILE, stats = True)
+    out32 = compare_models('profile', [(name, models[name]) for name in MODELS], PROFILE, stats = True, dtype = 'float32')
+    for name, path in ((name, models[name]) for name in MODELS):
+        assert out32[name].dtype == np.float32
+        assert np.abs(out32[name].values - out[name].values).max() < TOLERANCE32
+        assert (name, os.path.abspath(path), os.stat(path).st_mtime_ns, 'float32') in default_registry
+
+    # the command line option
+    outpath = str(tmp_path / 'compare.csv')
+    argv = ['profile'] + ['--{:}={:}'.format(key, val) for key, val in PROFILE.items()] + ['--outpath', outpath]
+    argv += sum((['--model', '{:}={:}'.format(name, path)] for name, path in ((name, models[name]) for name in MODELS)), [])
+    call_func(argv + ['--dtype', 'float32'])
+    df = pd.read_csv(outpath, skiprows = 4)
+    assert list(df.columns) == ['# Lon', 'Lat', 'Depth(m)'] + list(MODELS)
+    for name in MODELS:
+        assert np.abs(df[name].values - out[name].values).max() < TOLERANCE32
+
+def test_xsection_sampling(models, tmp_path):
+    outpath = str(tmp_path / 'compare.csv')
+    argv = ['xsection', '--lat_start', '40', '--lon_start', '-115', '--lat_end', '41', '--lon_end', '-113', '--z_start', '0',
+            '--z_end', '20000', '--ntrack', '15', '--ndep', '6', '--waypoint', '41,-114.5', '--outpath', outpath]
+    argv += sum((['--model', '{:}={:}'.format(name, models[name])] for name in MODELS), [])
+    call_func(argv)
+    df = pd.read_csv(outpath, skiprows = 4).sort_values(['# Lon', 'Lat', 'Depth(m)'])
+    assert len(df) == 15 * 6
+
+    # the points and temperatures of the single-model polyline section (whose rows are in depth order)
+    for name in MODELS:
+        ref = query_2D_vertical_cross_section(40, -115, 41, -113, 0, 20000, name, models[name], ntrack = 15, ndep = 6,
+                                              waypoints = [(41, -114.5)]).to_dataframe()
+        ref = ref.sort_values(['longitude[°]', 'latitude[°]', 'depth[m]'])
+        assert np.allclose(df['# Lon'], ref['longitude[°]'], atol = 1e-6) and np.allclose(df['Lat'], ref['latitude[°]'], atol = 1e-6)
+        assert np.allclose(df['Depth(m)'], ref['depth[m]'])
+        assert np.abs(df[name].values - ref['temperature[°C]'].values).max() < 1e-5
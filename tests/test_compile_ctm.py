@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+#  test_compile_ctm.py
+#
+#  Compiled models: for every source layout (including Boyd (2019), whose surface layer is baked in), the
+#  queries of the compiled NetCDF store and memory-mapped arrays (.npy and raw .bin) must equal the queries of
+#  the source model within TOLERANCE (°C) for both interpolation engines, the sidecar of the arrays must give
+#  back the normalized model, and stores of another format version or shape must be refused.
+#  Run: python -m pytest tests/test_compile_ctm.py
+#
+
+import json
+
+import numpy as np
+import pytest
+
+from synthetic_models import LAYOUTS
+from pyctm import compile_ctm, normalize_ctm, init_ctm, query_0D_points, query_1D_vertical_profile
+from pyctm.Initiation import COMPILED_FORMAT, MemmapArray
+
+# largest difference to the queries of the source model (°C)
+TOLERANCE = 1e-9
+
+ENGINES = ('xarray', 'fast')
+FORMATS = ('.nc', '.npy', '.bin')
+
+# random points inside the synthetic models, up to the surface
+def random_points(n = 300):
+    rng = np.random.default_rng(0)
+    return rng.uniform(31, 44, n), rng.uniform(-124, -111, n), rng.uniform(0, 50000, n)
+
+@pytest.fixture(scope = 'module')
+def compiled(models, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('compiled')
+    return {(name, fmt): compile_ctm(name, models[name], str(tmp / (name + fmt))) for name in LAYOUTS for fmt in FORMATS}
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', LAYOUTS)
+def test_queries_match_source(models, compiled, modelname, engine, fmt):
+    path = compiled[(modelname, fmt)]
+    lats, lons, deps = random_points()
+    ref = query_0D_points(lats, lons, deps, modelname, models[modelname], engine = engine)['temperature[°C]'].values
+    out = query_0D_points(lats, lons, deps, modelname, path, engine = engine)['temperature[°C]'].values
+    assert np.abs(out - ref).max() < TOLERANCE
+
+    ref = query_1D_vertical_profile(40, -115, 0, 20000, 250, modelname, models[modelname], engine = engine)
+    out = query_1D_vertical_profile(40, -115, 0, 20000, 250, modelname, path, engine = engine)
+    assert np.abs(out['temperature[°C]'].values - ref['temperature[°C]'].values).max() < TOLERANCE
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('modelname', LAYOUTS)
+def test_normalized_store(models, compiled, modelname, fmt):
+    xdata = init_ctm(modelname, compiled[(modelname, fmt)])
+    assert xdata.attrs['ctm_format'] == COMPILED_FORMAT and xdata.attrs['ctm_modelname'] == modelname
+    assert list(xdata.data_vars) == ['temperature[°C]']
+    for coord in ('longitude[°]', 'latitude[°]', 'depth[m]'):
+        assert np.all(np.diff(xdata[coord].values) > 0)
+
+    # the surface layer is stored: the compiled Boyd (2019) model starts at the surface
+    assert float(xdata['depth[m]'].min()) == 0.0
+    ref = normalize_ctm(modelname, models[modelname])
+    assert xdata['temperature[°C]'].dims == ref['temperature[°C]'].dims
+    for coord in ('longitude[°]', 'latitude[°]', 'depth[m]'):
+        assert np.array_equal(xdata[coord].values, ref[coord].values)
+    assert np.array_equal(xdata['temperature[°C]'].values, ref['temperature[°C]'].values)
+
+@pytest.mark.parametrize('fmt', ('.npy', '.bin'))
+@pytest.mark.parametrize('modelname', LAYOUTS)
+def test_sidecar(models, compiled, modelname, fmt):
+    path = compiled[(modelname, fmt)]
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    ref = normalize_ctm(modelname, models[modelname])
+    assert meta['ctm_format'] == COMPILED_FORMAT and meta['modelname'] == modelname and meta['variable'] == 'temperature[°C]'
+    assert meta['dims'] == list(ref['temperature[°C]'].dims) and meta['shape'] == list(ref['temperature[°C]'].shape)
+    assert meta['dtype'] == ref['temperature[°C]'].dtype.str
+    assert all(np.array_equal(meta['axes'][name], ref[name].values) for name in meta['dims'])
+
+    # the array is opened lazily: nothing is read before a query
+    data = init_ctm(modelname, path)['temperature[°C]'].variable._data
+    assert isinstance(data.array, MemmapArray) and isinstance(data.array.data, np.memmap)
+
+def test_format_version(models, tmp_path):
+    path = str(tmp_path / 'old.nc')
+    xdata = normalize_ctm('Lee_2026', models['Lee_2026']).load()
+    xdata.attrs['ctm_format'] = 'pyctm-compiled-0'
+    xdata.to_netcdf(path)
+    with pytest.raises(ValueError, match = 'Undefined model format'):
+        init_ctm('Lee_2026', path)
+
+    # the sidecar of a memory-mapped array written by another version, or not matching its array
+    path = compile_ctm('Lee_2026', models['Lee_2026'], str(tmp_path / 'lee.bin'))
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    with open(path + '.json', 'w') as f:
+        json.dump(dict(meta, ctm_format = 'pyctm-compiled-0'), f)
+    with pytest.raises(ValueError, match = 'Undefined model format'):
+        init_ctm('Lee_2026', path)
+
+    path = compile_ctm('Lee_2026', models['Lee_2026'], str(tmp_path / 'lee.npy'))
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    with open(path + '.json', 'w') as f:
+        json.dump(dict(meta, shape = meta['shape'][::-1]), f)
+    with pytest.raises(ValueError, match = 'does not match its sidecar'):
+        init_ctm('Lee_2026', path)
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_dtype(models, tmp_path, fmt):
+    path = compile_ctm('Boyd_2019', models['Boyd_2019'], str(tmp_path / ('boyd32' + fmt)), dtype = 'float32')
+    assert init_ctm('Boyd_2019', path)['temperature[°C]'].dtype == np.float32
+    lats, lons, deps = random_points()
+    ref = query_0D_points(lats, lons, deps, 'Boyd_2019', models['Boyd_2019'])['temperature[°C]'].values
+    assert np.abs(query_0D_points(lats, lons, deps, 'Boyd_2019', path)['temperature[°C]'].values - ref).max() < 1e-3
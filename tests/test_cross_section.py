@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+#  test_cross_section.py
+#
+#  Polyline cross-sections: the points of a multi-segment track must be equally spaced along the whole track,
+#  lie on the geodesic of their segment and pass through every vertex, and '--ntrack native' must give one
+#  track point per model cell crossed; the sections of the query function and of the command line must agree.
+#  Run: python -m pytest tests/test_cross_section.py
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyproj import Geod
+
+from pyctm import calculate_geodesic_polyline, calculate_geodesic_track, query_2D_vertical_cross_section, get_model
+from pyctm.query_2d_cross_section import section_points, call_func
+
+# largest difference of the distances along the track (m)
+TOLERANCE = 1e-3
+
+ENGINES = ('xarray', 'fast')
+
+# (latitude, longitude) vertices of a polyline with segments of different lengths and directions
+VERTICES = [(40, -120), (42, -117.5), (41.5, -113), (36, -112)]
+
+g = Geod(ellps = "WGS84")
+
+## Segment and distance along the track of each point of a polyline
+#  - inputs: longitude and latitude arrays of the points, vertices
+#  - returns: segment index and distance along the track of each point (m), distance to its segment geodesic (m)
+def track_distances(glons, glats, vertices):
+    lats, lons = np.array(vertices, dtype = float).T
+    _, _, seg = g.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    starts = np.concatenate([[0], np.cumsum(seg)[:-1]])
+
+    # for each point, the segment it lies on: to the start of the segment and on to its end in the segment length
+    iseg, dist, off = [], [], []
+    for lon, lat in zip(glons, glats):
+        _, _, a = g.inv(lons[:-1], lats[:-1], np.full(seg.size, lon), np.full(seg.size, lat))
+        _, _, b = g.inv(np.full(seg.size, lon), np.full(seg.size, lat), lons[1:], lats[1:])
+        k = int(np.argmin(a + b - seg))
+        iseg.append(k)
+        dist.append(starts[k] + a[k])
+        off.append(a[k] + b[k] - seg[k])
+    return np.array(iseg), np.array(dist), np.array(off)
+
+@pytest.mark.parametrize('npts', (2, 7, 121))
+def test_polyline_spacing(npts):
+    lats, lons = np.array(VERTICES, dtype = float).T
+    glons, glats = calculate_geodesic_polyline(lons, lats, npts)
+    assert glons.size == glats.size == npts
+    assert (glons[0], glats[0], glons[-1], glats[-1]) == (lons[0], lats[0], lons[-1], lats[-1])
+
+    # on the geodesic of a segment, equally spaced along the whole track
+    _, _, seg = g.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    iseg, dist, off = track_distances(glons, glats, VERTICES)
+    assert np.abs(off).max() < TOLERANCE
+    assert np.abs(dist - np.linspace(0, seg.sum(), npts)).max() < TOLERANCE
+    assert np.all(np.diff(iseg) >= 0)
+
+def test_polyline_vertices():
+    # segments of the same length (the same longitude step on a parallel): the middle vertex is a track point
+    lons, lats = np.array([-115, -114, -113.0]), np.array([40, 40, 40.0])
+    glons, glats = calculate_geodesic_polyline(lons, lats, 9)
+    assert abs(glons[4] - lons[1]) < 1e-9 and abs(glats[4] - lats[1]) < 1e-9
+
+    # each half is the single-segment track
+    for k in range(2):
+        tlons, tlats = calculate_geodesic_track(lons[k], lats[k], lons[k + 1], lats[k + 1], 5)
+        assert np.abs(glons[4 * k:4 * k + 5] - tlons).max() < 1e-9 and np.abs(glats[4 * k:4 * k + 5] - tlats).max() < 1e-9
+
+    # every vertex of a longer polyline lies between the points before and after it along the track
+    lats, lons = np.array(VERTICES, dtype = float).T
+    _, _, seg = g.inv(lons[:-1], lats[:-1], lons[1:], lats[1:])
+    glons, glats = calculate_geodesic_polyline(lons, lats, 50)
+    iseg, dist, _ = track_distances(glons, glats, VERTICES)
+    for k, end in enumerate(np.cumsum(seg)[:-1]):
+        before, after = np.flatnonzero(dist <= end)[-1], np.flatnonzero(dist > end)[0]
+        assert iseg[before] == k and iseg[after] == k + 1
+        assert after == before + 1
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_polyline_section(models, tmp_path, engine):
+    waypoints = VERTICES[1:-1]
+    (lat_start, lon_start), (lat_end, lon_end) = VERTICES[0], VERTICES[-1]
+    df = query_2D_vertical_cross_section(lat_start, lon_start, lat_end, lon_end, 0, 20000, 'Boyd_2019', models['Boyd_2019'],
+                                         engine = engine, ntrack = 31, ndep = 11, waypoints = waypoints).to_dataframe()
+    assert len(df) == 31 * 11
+
+    # the track of the points, and the synthetic field (linear in depth) at them
+    glons, glats, zvals = section_points(lat_start, lon_start, lat_end, lon_end, 0, 20000, 31, 11, waypoints)
+    assert np.allclose(np.unique(df['depth[m]']), zvals)
+    points = df.drop_duplicates(['longitude[°]', 'latitude[°]'])
+    assert len(points) == 31
+    assert np.allclose(np.sort(points['longitude[°]']), np.sort(glons)) and np.allclose(np.sort(points['latitude[°]']), np.sort(glats))
+
+    # the same section from the command line
+    outpath = str(tmp_path / 'xsection_data.csv')
+    argv = ['--lat_start', str(lat_start), '--lon_start', str(lon_start), '--lat_end', str(lat_end), '--lon_end', str(lon_end),
+            '--z_start', '0', '--z_end', '20000', '--ntrack', '31', '--ndep', '11', '--engine', engine,
+            '--modelname', 'Boyd_2019', '--modelpath', models['Boyd_2019'], '--outpath', outpath]
+    for lat, lon in waypoints:
+        argv += ['--waypoint', '%s,%s' % (lat, lon)]
+    call_func(argv)
+    with open(str(tmp_path / 'xsection_data_final.csv')) as f:
+        skip = sum(1 for line in f if line.startswith('# ') and ':' in line)
+    out = pd.read_csv(str(tmp_path / 'xsection_data_final.csv'), skiprows = skip)
+    assert np.allclose(out['Temperature(°C)'].values, df['temperature[°C]'].values, atol = 1e-4)
+
+# polylines from (40, -115): cells of the same length on all segments (one track point per cell crossed), and
+# segments whose cells differ in length (sampled at the shortest, so that no cell is skipped)
+NATIVE = (([], (41, -113), True), ([(40, -114)], (40, -113), True), ([(40, -114)], (41, -113), False),
+          ([(41, -115), (41, -114)], (41, -113), False))
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('waypoints, end, uniform', NATIVE)
+def test_native_track(models, engine, waypoints, end, uniform):
+    # the synthetic models have 0.25° cells and 2000 m between depths
+    model = get_model('Lee_2026', models['Lee_2026'])
+    lats, lons = np.array([(40, -115)] + waypoints + [end], dtype = float).T
+    cells = int(round(np.sum(np.maximum(np.abs(np.diff(lons)), np.abs(np.diff(lats))) / 0.25)))
+
+    glons, glats, zvals = section_points(40, -115, end[0], end[1], 0, 20000, 'native', 'native', waypoints, model.xdata)
+    assert glons.size == cells + 1 if uniform else glons.size > cells + 1
+    assert np.allclose(zvals, np.arange(0, 20001, 2000))
+
+    # no cell is skipped: consecutive points are at most one cell apart on both axes (up to the curvature of the
+    # geodesic across a cell)
+    assert np.abs(np.diff(glons)).max() <= 0.25 * (1 + 2e-2) and np.abs(np.diff(glats)).max() <= 0.25 * (1 + 2e-2)
+
+    df = query_2D_vertical_cross_section(40, -115, end[0], end[1], 0, 20000, 'Lee_2026', models['Lee_2026'], engine = engine,
+                                         ntrack = 'native', ndep = 'native', waypoints = waypoints).to_dataframe()
+    assert len(df) == glons.size * zvals.size
+
+def test_native_needs_model():
+    with pytest.raises(ValueError, match = 'Undefined model for native sampling'):
+        section_points(40, -115, 41, -113, 0, 20000, 'native')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+#  test_dTdz.py
+#
+#  Geothermal gradients of cross-sections: on a synthetic section with known gradients, and on random sections
+#  with shuffled rows and uneven depths, the vectorized dTdz_2D_cross_section must give the results of the
+#  previous per-profile (groupby) implementation, and the field mode those of np.gradient along each profile,
+#  within TOLERANCE (°C/km); dTdz_profiles must agree on the same profiles as an array.
+#  Run: python -m pytest tests/test_dTdz.py
+#
+
+import numpy as np
+import pandas as pd
+
+from pyctm import dTdz_2D_cross_section, dTdz_profiles
+
+# largest difference (°C/km)
+TOLERANCE = 1e-9
+
+# uneven depths (m), in the order of the rows of a profile
+DEPTHS = np.array([0, 500, 1500, 2000, 4000, 7000, 10000.0])
+
+## Section of profiles in random row order
+#  - inputs: longitudes, latitudes, temperatures (profile x depth), random generator
+#  - returns: DataFrame in the layout of query_2D_vertical_cross_section
+def section(lons, lats, temps, rng):
+    df = pd.DataFrame({'# Lon': np.repeat(lons, DEPTHS.size), 'Lat': np.repeat(lats, DEPTHS.size),
+                       'Depth(m)': np.tile(DEPTHS, len(lons)), 'Temperature(°C)': np.ravel(temps)})
+    return df.iloc[rng.permutation(len(df))].reset_index(drop = True)
+
+# previous implementation: one profile at a time
+def reference_dTdz(df):
+    rows = []
+    for (lon, lat), group in df.groupby(['# Lon', 'Lat']):
+        group = group.sort_values('Depth(m)')
+        z, T = group['Depth(m)'].values, group['Temperature(°C)'].values
+        rows.append({'longitude[°]': lon, 'latitude[°]': lat, 'dTdz[°C/km]': (T[-1] - T[0]) / (z[-1] - z[0]) * 1000})
+    return pd.DataFrame(rows)
+
+# gradient at every row with np.gradient along each profile, in the row order of the section
+def reference_field(df):
+    out = np.full(len(df), np.nan)
+    for _, group in df.groupby(['# Lon', 'Lat']):
+        group = group.sort_values('Depth(m)')
+        out[group.index] = np.gradient(group['Temperature(°C)'].values, group['Depth(m)'].values) * 1000
+    return out
+
+def test_known_gradients():
+    rng = np.random.default_rng(0)
+    lons, lats = np.array([-115, -114.5, -114, -113.5]), np.array([40, 40.5, 41, 41.5])
+    grads = np.array([25, 30, 12.5, 40])                                   # °C/km
+    temps = 10 + grads[:, None] * DEPTHS[None, :] / 1000
+    df = section(lons, lats, temps, rng)
+
+    out = dTdz_2D_cross_section(df)
+    assert np.allclose(out['longitude[°]'], lons) and np.allclose(out['latitude[°]'], lats)
+    assert np.abs(out['dTdz[°C/km]'].values - grads).max() < TOLERANCE
+
+    # linear profiles: the same gradient at every row
+    field = dTdz_2D_cross_section(df, field = True)
+    expected = pd.Series(grads, index = lons)[df['# Lon'].values].values
+    assert np.abs(field['dTdz[°C/km]'].values - expected).max() < TOLERANCE
+    assert np.array_equal(field['depth[m]'], df['Depth(m)'])
+
+    assert np.abs(dTdz_profiles(temps, DEPTHS) - grads).max() < TOLERANCE
+    assert np.abs(dTdz_profiles(temps, DEPTHS, field = True) - grads[:, None]).max() < TOLERANCE
+
+def test_matches_previous_implementation():
+    rng = np.random.default_rng(1)
+    lons = rng.uniform(-120, -110, 30)
+    lats = rng.uniform(32, 42, 30)
+    temps = 10 + np.cumsum(rng.uniform(0, 60, (30, DEPTHS.size)), axis = 1)
+    df = section(lons, lats, temps, rng)
+
+    out, ref = dTdz_2D_cross_section(df), reference_dTdz(df)
+    assert np.array_equal(out['longitude[°]'], ref['longitude[°]']) and np.array_equal(out['latitude[°]'], ref['latitude[°]'])
+    assert np.abs(out['dTdz[°C/km]'].values - ref['dTdz[°C/km]'].values).max() < TOLERANCE
+
+    field = dTdz_2D_cross_section(df, field = True)
+    assert np.abs(field['dTdz[°C/km]'].values - reference_field(df)).max() < TOLERANCE
+
+    # the same profiles as an array, with the depths out of order
+    perm = rng.permutation(DEPTHS.size)
+    grads = dTdz_profiles(temps[:, perm], DEPTHS[perm], field = True)
+    assert np.abs(grads[:, np.argsort(perm)] - np.gradient(temps, DEPTHS, axis = 1) * 1000).max() < TOLERANCE
+    assert np.abs(dTdz_profiles(temps[:, perm], DEPTHS[perm]) - (temps[:, -1] - temps[:, 0]) / DEPTHS[-1] * 1000).max() < TOLERANCE
+
+def test_single_depth():
+    # one row per profile: no gradient
+    df = pd.DataFrame({'# Lon': [-115, -114], 'Lat': [40, 41], 'Depth(m)': [1000, 1000], 'Temperature(°C)': [30, 40]})
+    assert np.isnan(dTdz_2D_cross_section(df, field = True)['dTdz[°C/km]']).all()
+    assert np.isnan(dTdz_profiles([[30], [40]], [1000], field = True)).all()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+#  test_depth_profiles.py
+#
+#  Profiles of many sites in one interpolation: the batched query must give the single-site profiles within
+#  TOLERANCE (°C) for both interpolation engines, the per-site files of the command line must be identical to
+#  the files of single-site runs, and the long table must hold every site and depth.
+#  Run: python -m pytest tests/test_depth_profiles.py
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyctm import query_1D_vertical_profile, query_1D_vertical_profiles
+from pyctm.query_1d_depth_profile import call_func
+
+# largest difference to the single-site profiles (°C)
+TOLERANCE = 1e-9
+
+# source layouts with different dimension orders, and Boyd (2019) with its surface layer
+MODELS = ('Lee_2026', 'Shinevar_2018', 'Boyd_2019')
+ENGINES = ('xarray', 'fast')
+
+SITES = pd.DataFrame({'lat': [38, 40.3, 35.1, 44.9], 'lon': [-117, -113.2, -120.9, -110.1], 'name': ['a', 'b', 'c', 'edge']})
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_profiles_match_single_sites(models, modelname, engine):
+    xi = query_1D_vertical_profiles(SITES['lat'], SITES['lon'], np.arange(0, 40001, 500.0), modelname, models[modelname],
+                                    engine = engine, names = SITES['name'])
+    assert xi['temperature[°C]'].dims == ('site', 'depth[m]')
+    assert list(xi['site'].values) == list(SITES['name'])
+
+    for k, site in SITES.iterrows():
+        df = query_1D_vertical_profile(site['lat'], site['lon'], 0, 40000, 500, modelname, models[modelname], engine = engine)
+        assert np.allclose(xi['depth[m]'], df['depth[m]'])
+        assert np.abs(xi['temperature[°C]'].values[k] - df['temperature[°C]'].values).max() < TOLERANCE
+        assert xi['longitude[°]'].values[k] == site['lon'] and xi['latitude[°]'].values[k] == site['lat']
+
+def test_invalid_sites(models):
+    with pytest.raises(ValueError, match = 'Duplicate site names'):
+        query_1D_vertical_profiles([38, 39], [-117, -116], [0, 1000], 'Lee_2026', models['Lee_2026'], names = ['a', 'a'])
+    with pytest.raises(ValueError):
+        query_1D_vertical_profiles([38, 50], [-117, -116], [0, 1000], 'Lee_2026', models['Lee_2026'])
+
+def test_files_layout(models, tmp_path):
+    infile = str(tmp_path / 'sites.csv')
+    SITES.to_csv(infile, index = False)
+    model = ['--modelname', 'Boyd_2019', '--modelpath', models['Boyd_2019']]
+    depths = ['--z_start', '0', '--z_end', '20000', '--z_step', '1000']
+
+    call_func(['--infile', infile, '--outpath', str(tmp_path / 'matprops.csv')] + depths + model)
+    for _, site in SITES.iterrows():
+        single = str(tmp_path / 'single_matprops.csv')
+        call_func(['--lat', str(site['lat']), '--lon', str(site['lon']), '--outpath', single] + depths + model)
+        for final in ('', '_final'):
+            with open(tmp_path / 'matprops{:}_{:}.csv'.format(final, site['name'])) as f1, \
+                 open(tmp_path / 'single_matprops{:}.csv'.format(final)) as f2:
+                assert f1.read() == f2.read()
+
+def test_long_layout(models, tmp_path):
+    infile = str(tmp_path / 'sites.csv')
+    SITES.to_csv(infile, index = False)
+    outpath = str(tmp_path / 'long.csv')
+    call_func(['--infile', infile, '--z_list', '0,1000,5000,20000', '--layout', 'long', '--outpath', outpath,
+               '--modelname', 'Lee_2026', '--modelpath', models['Lee_2026']])
+
+    with open(outpath) as f:
+        head = [line for line in f if line.startswith('# ') and ':' in line]
+    assert head[0] == '# Title: CTM 1D Profiles\n'
+    assert '# Sites: 4\n' in head and '# End_depth(m): 20000.000\n' in head
+
+    df = pd.read_csv(outpath, skiprows = len(head))
+    assert list(df.columns) == ['# Site', 'Lon', 'Lat', 'Depth(m)', 'Temperature(°C)']
+    assert len(df) == 16 and list(df['# Site'].unique()) == list(SITES['name'])
+    assert list(df['Depth(m)'][:4]) == [0, 1000, 5000, 20000]
+
+    xi = query_1D_vertical_profiles(SITES['lat'], SITES['lon'], [0, 1000, 5000, 20000], 'Lee_2026', models['Lee_2026'])
+    assert np.abs(df['Temperature(°C)'].values - xi['temperature[°C]'].values.ravel()).max() < 1e-5
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+#  test_float32.py
+#
+#  Accuracy of the float32 mode: the queries of models opened with dtype='float32' must agree with the
+#  float64 queries within TOLERANCE (°C) for both interpolation engines, keep float32 results, and the binary
+#  outputs must read back the same values.
+#  Run: python -m pytest tests/test_float32.py
+#
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyctm import (query_0D_points, query_1D_vertical_profile, query_2D_vertical_cross_section, query_2D_horizontal_stack,
+                   read_binary_output)
+from pyctm.query_0d_point import query_0D_points_file
+from pyctm.query_2d_horizontal_slice import write_horizontal_stack
+
+# largest difference to float64 (°C); float32 keeps about 7 significant digits of temperatures up to 1500 °C
+TOLERANCE = 1e-3
+
+# source layouts with different dimension orders, and Boyd (2019) with its surface layer
+MODELS = ('Lee_2026', 'Shinevar_2018', 'Boyd_2019')
+ENGINES = ('xarray', 'fast')
+
+# random points inside the synthetic models
+def random_points(n = 2000):
+    rng = np.random.default_rng(0)
+    return rng.uniform(31, 44, n), rng.uniform(-124, -111, n), rng.uniform(0, 50000, n)
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_points(models, modelname, engine):
+    lats, lons, deps = random_points()
+    df64 = query_0D_points(lats, lons, deps, modelname, models[modelname], engine = engine)
+    df32 = query_0D_points(lats, lons, deps, modelname, models[modelname], engine = engine, dtype = 'float32')
+    assert df32['temperature[°C]'].dtype == np.float32
+    assert np.abs(df32['temperature[°C]'].values - df64['temperature[°C]'].values).max() < TOLERANCE
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_profile_and_cross_section(models, modelname, engine):
+    for query, args in ((query_1D_vertical_profile, (40, -115, 0, 40000, 500)),
+                        (query_2D_vertical_cross_section, (35, -120, 42, -113, 0, 40000))):
+        df64 = query(*args, modelname, models[modelname], engine = engine)
+        df32 = query(*args, modelname, models[modelname], engine = engine, dtype = 'float32')
+        assert df32['temperature[°C]'].dtype == np.float32
+        assert np.allclose(df32['depth[m]'], df64['depth[m]'])
+        assert np.abs(df32['temperature[°C]'].values - df64['temperature[°C]'].values).max() < TOLERANCE
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_horizontal_stack(models, modelname, engine, tmp_path):
+    args = (32, -123, 43, -112, [0, 1000, 12500, 40000], modelname, models[modelname])
+    xi64 = query_2D_horizontal_stack(*args, engine = engine)
+    xi32 = query_2D_horizontal_stack(*args, engine = engine, dtype = 'float32')
+    t64, t32 = xi64['temperature[°C]'], xi32['temperature[°C]']
+    assert t32.dtype == np.float32
+    assert t32.nbytes * 2 == t64.nbytes
+    assert np.abs(t32.values - t64.values).max() < TOLERANCE
+
+    # binary output: the (depth, latitude, longitude) grid, half the size of float64
+    for dtype, xi in (('float64', xi64), ('float32', xi32)):
+        write_horizontal_stack(xi, str(tmp_path / (dtype + '.bin')), modelname, 'binary')
+    grid, meta = read_binary_output(str(tmp_path / 'float32.bin'))
+    assert grid.dtype == np.float32
+    assert meta['dims'] == ['depth[m]', 'latitude[°]', 'longitude[°]']
+    assert np.array_equal(grid, t32.transpose(*meta['dims']).values)
+    assert np.allclose(meta['axes']['depth[m]'], [0, 1000, 12500, 40000])
+    assert os.path.getsize(tmp_path / 'float32.bin') * 2 == os.path.getsize(tmp_path / 'float64.bin')
+
+def test_points_file_binary(models, tmp_path):
+    lats, lons, deps = random_points(25000)
+    infile = str(tmp_path / 'points.csv')
+    pd.DataFrame({'lat': lats, 'lon': lons, 'z': deps}).to_csv(infile, index = False)
+
+    # streamed in several chunks
+    outpath = str(tmp_path / 'points.bin')
+    npts = query_0D_points_file(infile, outpath, 'Lee_2026', models['Lee_2026'], chunksize = 10000, dtype = 'float32')
+    rows, meta = read_binary_output(outpath)
+    assert npts == 25000 and rows.shape == (25000, 4) and rows.dtype == np.float32
+    assert meta['columns'] == ['lon', 'lat', 'Z', 'temp']
+
+    df64 = query_0D_points(lats, lons, deps, 'Lee_2026', models['Lee_2026'])
+    assert np.abs(rows[:, 3] - df64['temperature[°C]'].values).max() < TOLERANCE
+    assert np.abs(rows[:, 0] - lons).max() < 1e-4
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+#  test_grid_interpolator.py
+#
+#  Accuracy of the fast interpolation engine: GridInterpolator must agree with xarray's Dataset.interp within
+#  TOLERANCE (°C) on uniform grids (index arithmetic) and non-uniform grids (binary search), at the grid
+#  nodes, on the edges of the model and with its surface layer, and give NaN outside the model like xarray.
+#  Run: python -m pytest tests/test_grid_interpolator.py
+#
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pyctm import GridInterpolator
+from pyctm.surface_layer import with_surface_layer
+
+# documented agreement with xarray's linear interpolation (see grid_interpolator.py)
+TOLERANCE = 1e-9
+
+## Normalized model with a random temperature field, in the (depth, latitude, longitude) order of Lee (2026)
+#  - inputs: whether the axes are uniform, depth of the first stored layer (m)
+#  - returns: Xarray Dataset
+def random_model(uniform, top = 0.0):
+    rng = np.random.default_rng(1)
+    lons = np.linspace(-125, -110, 31)
+    lats = np.linspace(30, 45, 26)
+    deps = np.linspace(top, 60000, 21)
+    if not uniform:
+        # stretched axes: steps growing along the axis
+        lons = -125 + 15 * np.linspace(0, 1, 31)**1.5
+        lats = 30 + 15 * np.sqrt(np.linspace(0, 1, 26))
+        deps = top + (60000 - top) * np.linspace(0, 1, 21)**2
+    temp = 15 + 0.025 * deps[:, None, None] + rng.normal(0, 20, (deps.size, lats.size, lons.size))
+    return xr.Dataset({"temperature[°C]": (("depth[m]", "latitude[°]", "longitude[°]"), temp)},
+                      coords = {"longitude[°]": lons, "latitude[°]": lats, "depth[m]": deps})
+
+# random points inside the model, plus its corners
+def model_points(xdata, n = 5000):
+    rng = np.random.default_rng(0)
+    lons, lats, deps = [xdata[name].values for name in ("longitude[°]", "latitude[°]", "depth[m]")]
+    pts = [rng.uniform(lons[0], lons[-1], n), rng.uniform(lats[0], lats[-1], n), rng.uniform(deps[0], deps[-1], n)]
+    corners = np.array(np.meshgrid([lons[0], lons[-1]], [lats[0], lats[-1]], [deps[0], deps[-1]], indexing = 'ij'))
+    return [np.concatenate([p, c.ravel()]) for p, c in zip(pts, corners)]
+
+# pointwise indexers, like the point queries
+def pointwise(lons, lats, deps):
+    return {"longitude[°]": xr.DataArray(lons, dims = "points"),
+            "latitude[°]": xr.DataArray(lats, dims = "points"),
+            "depth[m]": xr.DataArray(deps, dims = "points")}
+
+# interpolate with both engines
+def both(xdata, indexers, surface = None):
+    fast = GridInterpolator(xdata, surface = surface).interp(indexers)["temperature[°C]"]
+    ref = with_surface_layer(xdata, surface).interp(indexers)["temperature[°C]"]
+    assert fast.dims == ref.dims
+    return fast.values, ref.values
+
+@pytest.mark.parametrize('uniform', (True, False))
+def test_axis_lookup(uniform):
+    interp = GridInterpolator(random_model(uniform))
+    assert all(axis.uniform == uniform for axis in interp.axes.values())
+
+@pytest.mark.parametrize('uniform', (True, False))
+def test_points(uniform):
+    xdata = random_model(uniform)
+    fast, ref = both(xdata, pointwise(*model_points(xdata)))
+    assert not np.isnan(ref).any()
+    assert np.abs(fast - ref).max() < TOLERANCE
+
+@pytest.mark.parametrize('uniform', (True, False))
+def test_grid_nodes_and_edges(uniform):
+    xdata = random_model(uniform)
+    lons, lats, deps = [xdata[name].values for name in ("longitude[°]", "latitude[°]", "depth[m]")]
+
+    # all nodes, including the last node of each axis (upper edge of the last cell)
+    fast, ref = both(xdata, {"longitude[°]": lons, "latitude[°]": lats, "depth[m]": deps})
+    assert np.abs(fast - ref).max() < TOLERANCE
+    assert np.abs(fast - xdata["temperature[°C]"].values).max() < TOLERANCE
+
+    # faces of the model, with scalar and orthogonal indexers
+    for z in (deps[0], deps[-1]):
+        fast, ref = both(xdata, {"longitude[°]": np.linspace(lons[0], lons[-1], 57), "latitude[°]": lats[-1], "depth[m]": z})
+        assert np.abs(fast - ref).max() < TOLERANCE
+
+@pytest.mark.parametrize('uniform', (True, False))
+def test_out_of_bounds(uniform):
+    xdata = random_model(uniform)
+    lons, lats, deps = [xdata[name].values for name in ("longitude[°]", "latitude[°]", "depth[m]")]
+    eps = 1e-6
+    pts = np.array([[lons[0] - eps, lats[5], deps[5]],
+                    [lons[-1] + eps, lats[5], deps[5]],
+                    [lons[5], lats[0] - eps, deps[5]],
+                    [lons[5], lats[-1] + 1, deps[5]],
+                    [lons[5], lats[5], deps[0] - 1],
+                    [lons[5], lats[5], deps[-1] + eps],
+                    [lons[5], lats[5], np.nan],
+                    [lons[5], lats[5], deps[5]]])
+    fast, ref = both(xdata, pointwise(*pts.T))
+    assert np.array_equal(np.isnan(fast), np.isnan(ref))
+    assert np.isnan(fast[:-1]).all()
+    assert abs(fast[-1] - ref[-1]) < TOLERANCE
+
+@pytest.mark.parametrize('uniform', (True, False))
+def test_surface_layer(uniform):
+    xdata = random_model(uniform, top = 500.0)
+    lons, lats, deps = model_points(xdata)
+    deps = np.linspace(0, 2000, lons.size)
+    fast, ref = both(xdata, pointwise(lons, lats, deps), surface = 0.0)
+    assert not np.isnan(ref).any()
+    assert np.abs(fast - ref).max() < TOLERANCE
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+#  test_horizontal_slice.py
+#
+#  Horizontal slices on the model nodes ('--spacing native'): the sample points must be the nodes inside the
+#  box in the order of the query, the values read at the nodes must equal the synthetic field and the
+#  interpolated slice at the same points for both interpolation engines, and boxes holding fewer than 2 nodes
+#  on an axis must be refused before anything is written.
+#  Run: python -m pytest tests/test_horizontal_slice.py
+#
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic_models import synthetic_temperature
+from pyctm import query_2D_horizontal_slice, query_2D_horizontal_stack
+from pyctm.query_2d_horizontal_slice import call_func
+
+# largest difference to the synthetic field and to the interpolated slice (°C); the field is linear in depth
+TOLERANCE = 1e-9
+
+# source layout with the model nodes, and Boyd (2019) with its surface layer
+MODELS = ('Lee_2026', 'Boyd_2019')
+ENGINES = ('xarray', 'fast')
+
+# box on the 0.25° nodes of the synthetic models
+BOX = (40, -115, 41, -114)
+NODES = np.arange(0, 1.01, 0.25)
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_native_nodes(models, modelname, engine):
+    df = query_2D_horizontal_slice(*BOX, 3000, modelname, models[modelname], engine = engine, spacing = 'native').to_dataframe()
+    assert np.allclose(np.unique(df['longitude[°]']), -115 + NODES) and np.allclose(np.unique(df['latitude[°]']), 40 + NODES)
+    assert len(df) == 25
+
+    # the stored values, interpolated in depth only
+    ref = np.array([synthetic_temperature([lon], [lat], [3000])[0, 0, 0] for lon, lat in zip(df['longitude[°]'], df['latitude[°]'])])
+    assert np.abs(df['temperature[°C]'].values - ref).max() < TOLERANCE
+
+    # the same points through the interpolation
+    di = query_2D_horizontal_slice(*BOX, 3000, modelname, models[modelname], engine = engine, spacing = 0.25).to_dataframe()
+    assert np.abs(df['temperature[°C]'].values - di['temperature[°C]'].values).max() < TOLERANCE
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_native_order(models, engine):
+    # from the end to the start of the box, in a stack of slices
+    xi = query_2D_horizontal_stack(41, -114, 40, -115, [3000, 5000], 'Lee_2026', models['Lee_2026'], engine = engine, spacing = 'native')
+    assert np.allclose(xi['longitude[°]'], -114 - NODES) and np.allclose(xi['latitude[°]'], 41 - NODES)
+    temps = xi['temperature[°C]'].transpose('depth[m]', 'latitude[°]', 'longitude[°]').values
+    ref = synthetic_temperature(-114 - NODES, 41 - NODES, [3000, 5000]).transpose(2, 1, 0)
+    assert np.abs(temps - ref).max() < TOLERANCE
+
+def test_native_header(models, tmp_path):
+    outpath = str(tmp_path / 'hslice_data.csv')
+    call_func(['--lat_start', '40', '--lon_start', '-115', '--lat_end', '41', '--lon_end', '-114', '--z', '3000', '--spacing', 'native',
+               '--modelname', 'Boyd_2019', '--modelpath', models['Boyd_2019'], '--outpath', outpath])
+    with open(str(tmp_path / 'hslice_data_final.csv')) as f:
+        head = [line for line in f if line.startswith('# ') and ':' in line]
+    assert '# Spacing(degree): 0.250000\n' in head and '# Total_pts: 25\n' in head
+    assert len(pd.read_csv(outpath, skiprows = len(head))) == 25
+
+# boxes between the nodes of an axis, or holding one node of an axis
+@pytest.mark.parametrize('box', ((40.1, -115, 40.2, -114), (40, -114.9, 41, -114.6), (40.2, -115, 40.3, -114)))
+def test_native_too_few_nodes(models, tmp_path, box):
+    with pytest.raises(ValueError, match = 'fewer than 2 model nodes'):
+        query_2D_horizontal_slice(*box, 3000, 'Lee_2026', models['Lee_2026'], spacing = 'native')
+
+    outpath = str(tmp_path / 'hslice_data.csv')
+    argv = ['--lat_start', str(box[0]), '--lon_start', str(box[1]), '--lat_end', str(box[2]), '--lon_end', str(box[3])]
+    with pytest.raises(ValueError, match = 'fewer than 2 model nodes'):
+        call_func(argv + ['--z', '3000', '--spacing', 'native', '--modelname', 'Lee_2026', '--modelpath', models['Lee_2026'],
+                          '--outpath', outpath])
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+#  test_model_registry.py
+#
+#  Model registry: entries keyed by (model name, path, modification time, data type), least-recently-used
+#  eviction by count and size, reopening of rewritten files, data types of registered handles, and models
+#  kept open by hold scopes while they are evicted.
+#  Run: python -m pytest tests/test_model_registry.py
+#
+
+import os
+
+import numpy as np
+
+from synthetic_models import write_synthetic_model
+from pyctm import ModelRegistry, query_0D_points
+
+def test_key(models):
+    reg = ModelRegistry()
+    path = models['Lee_2026']
+    model = reg.get('Lee_2026', path)
+    assert model.key == ('Lee_2026', os.path.abspath(path), os.stat(path).st_mtime_ns, None)
+    assert model.key in reg
+
+    # same file by another path: a hit; another data type: a separate entry
+    assert reg.get('Lee_2026', os.path.relpath(path)) is model
+    model32 = reg.get('Lee_2026', path, 'float32')
+    assert model32 is not model and model32.key == model.key[:3] + ('float32',)
+    assert reg.get('Lee_2026', path, np.float32) is model32
+    assert reg.stats() == {"hits": 2, "misses": 2, "evictions": 0, "entries": 2, "nbytes": model.nbytes + model32.nbytes}
+
+def test_lru_eviction(models):
+    reg = ModelRegistry(max_entries = 2)
+    lee = reg.get('Lee_2026', models['Lee_2026'])
+    s18 = reg.get('Shinevar_2018', models['Shinevar_2018'])
+
+    # using Lee (2026) makes Shinevar (2018) the least recently used
+    reg.get('Lee_2026', models['Lee_2026'])
+    boyd = reg.get('Boyd_2019', models['Boyd_2019'])
+    assert lee.key in reg and boyd.key in reg and s18.key not in reg
+    assert reg.stats()['evictions'] == 1 and len(reg) == 2
+
+    # size limit below one model: only the most recently used one is kept
+    reg.configure(max_bytes = 1)
+    assert len(reg) == 1 and boyd.key in reg
+    assert reg.stats()['evictions'] == 2
+
+    reg.clear()
+    assert len(reg) == 0 and reg.stats()['hits'] == 0
+
+def test_reopen_on_mtime_change(models, tmp_path):
+    path = write_synthetic_model('Lee_2026', str(tmp_path / 'lee.nc'))
+    reg = ModelRegistry()
+    old = reg.get('Lee_2026', path)
+
+    # rewritten file (new modification time): reopened, and the stale entry is dropped
+    stat = os.stat(path)
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    new = reg.get('Lee_2026', path)
+    assert new is not old and new.mtime == stat.st_mtime_ns + 10**9
+    assert old.key not in reg and len(reg) == 1
+    assert reg.stats()['misses'] == 2
+
+def test_handle_dtype(models):
+    reg = ModelRegistry()
+    model = reg.register('Shinevar_2018', models['Shinevar_2018'])
+    assert model.xdata['temperature[°C]'].dtype == np.float64
+
+    # a float32 request on a float64 handle gets a cast handle, the same one each time
+    model32 = reg.get('Shinevar_2018', model, 'float32')
+    assert model32 is not model and model32.dtype == 'float32'
+    assert model32.xdata['temperature[°C]'].dtype == np.float32
+    assert reg.get('Shinevar_2018', model, 'float32') is model32
+    assert reg.get('Shinevar_2018', model) is model and reg.get('Shinevar_2018', model, 'float64') is model
+    assert model.xdata['temperature[°C]'].dtype == np.float64
+
+    # the queries on the handle follow the requested type
+    df = query_0D_points([40], [-115], [1000], 'Shinevar_2018', model, dtype = 'float32')
+    assert df['temperature[°C]'].dtype == np.float32
+
+def test_hold(models):
+    reg = ModelRegistry(max_entries = 1)
+    with reg.hold():
+        lee = reg.get('Lee_2026', models['Lee_2026'])
+        reg.get('Shinevar_2018', models['Shinevar_2018'])
+
+        # evicted, but kept open until the end of the scope
+        assert lee.evicted and lee.users == 1
+        assert np.isfinite(lee.xdata['temperature[°C]'].values).all()
+    assert lee.users == 0 and lee.key not in reg
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+#  test_profiling.py
+#
+#  Stage timings: a profiled block reports only the stages of its own thread, so concurrent queries (e.g. of the
+#  query server) do not mix or turn on profiling for each other, and the stages run by the worker threads of a
+#  model comparison are reported with those of the caller.
+#  Run: python -m pytest tests/test_profiling.py
+#
+
+import json
+import threading
+
+from pyctm import profiling, profile_stage, collect_profile, propagate_profile, compare_models
+
+MODELS = ('Lee_2026', 'Boyd_2019')
+
+# stage names of a JSON report
+def report_stages(path):
+    with open(path) as f:
+        return set(json.load(f)['stages'])
+
+def test_concurrent_blocks(tmp_path):
+    barrier = threading.Barrier(3)
+    active = {}
+
+    # one thread profiles its stages, the other runs while it does without profiling
+    def profiled():
+        with profiling(str(tmp_path / 'profiled.json')):
+            with profile_stage('a'):
+                barrier.wait()
+                barrier.wait()
+    def plain():
+        barrier.wait()
+        active['plain'] = profile_stage('b') is not profile_stage('b')
+        with profile_stage('b'):
+            pass
+        barrier.wait()
+
+    threads = [threading.Thread(target = profiled), threading.Thread(target = plain)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    assert report_stages(tmp_path / 'profiled.json') == {'a'}
+    assert not active['plain']
+
+def test_propagate_profile():
+    def stage():
+        with profile_stage('worker'):
+            pass
+
+    with collect_profile() as records:
+        with profile_stage('caller'):
+            run = propagate_profile(stage)
+            thread = threading.Thread(target = run)
+            thread.start()
+            thread.join()
+    assert [record['stage'] for record in records] == ['caller/worker', 'caller']
+
+    # nothing collected here: the function is returned as it is
+    assert propagate_profile(stage) is stage
+
+def test_compare_worker_stages(models, tmp_path):
+    path = str(tmp_path / 'compare.json')
+    with profiling(path):
+        compare_models('point', [(name, models[name]) for name in MODELS], {'lat': 40, 'lon': -115, 'z': 1000}, workers = 2)
+    assert {'geometry', 'model', 'interp'} <= report_stages(path)
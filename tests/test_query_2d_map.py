@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+#  test_query_2d_map.py
+#
+#  Map products: isotherm depths and column temperatures of known columns (including columns that never reach
+#  the isotherm, or are already above it at their top), and maps of the synthetic models that must agree with
+#  vertical profiles at the same points within TOLERANCE for both interpolation engines.
+#  Run: python -m pytest tests/test_query_2d_map.py
+#
+
+import numpy as np
+import pytest
+
+from pyctm import query_2D_map, query_1D_vertical_profile, isotherm_depths
+from pyctm.query_2d_map import column_temperatures, isotherm_name, dTdz_name
+
+# largest difference to the profiles (m for depths, °C/km for gradients)
+TOLERANCE = 1e-6
+
+MODELS = ('Lee_2026', 'Boyd_2019')
+ENGINES = ('xarray', 'fast')
+
+# depths and columns: 10 + 0.025 °C/m, 20 + 0.05 °C/m, and a column with an inversion
+DEPTHS = np.arange(0, 11000, 1000.0)
+COLUMNS = np.array([10 + 0.025 * DEPTHS,
+                    20 + 0.05 * DEPTHS,
+                    np.where(DEPTHS < 3000, 100 - 0.01 * DEPTHS, 40 + 0.02 * DEPTHS)])
+
+def test_isotherm_depths():
+    # linear between the nodes
+    assert np.allclose(isotherm_depths(COLUMNS, DEPTHS, 110), [4000, 1800, 3500])
+    assert np.allclose(isotherm_depths(COLUMNS[:2], DEPTHS, 115), [4200, 1900])
+
+    # never reached: NaN
+    z = isotherm_depths(COLUMNS, DEPTHS, 300)
+    assert np.isnan(z[0]) and np.isnan(z[2]) and np.isclose(z[1], 5600)
+    assert np.isnan(isotherm_depths(COLUMNS, DEPTHS, 1000)).all()
+
+    # reached exactly at the top, or already above the isotherm at the top
+    z = isotherm_depths(COLUMNS, DEPTHS, 20)
+    assert np.isclose(z[0], 400) and z[1] == 0 and np.isnan(z[2])
+
+    # any leading shape
+    z = isotherm_depths(COLUMNS.reshape(3, 1, -1), DEPTHS, 110)
+    assert z.shape == (3, 1) and np.allclose(z[:, 0], isotherm_depths(COLUMNS, DEPTHS, 110))
+
+def test_column_temperatures():
+    T = column_temperatures(COLUMNS, DEPTHS, [0, 500, 3000, 9999, 10000])
+    assert T.shape == (3, 5)
+    assert np.allclose(T[0], 10 + 0.025 * np.array([0, 500, 3000, 9999, 10000]))
+    assert np.allclose(T[2], [100, 95, 100, 40 + 0.02 * 9999, 240])
+    assert np.allclose(column_temperatures(COLUMNS, DEPTHS, 2500), [[72.5], [145], [90]])
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('modelname', MODELS)
+def test_map_matches_profiles(models, modelname, engine):
+    xm = query_2D_map(40, -115, 41, -114, modelname, models[modelname], isotherms = [200, 5000], dTdz_range = (0, 10000),
+                      engine = engine, spacing = 0.25)
+    z200, z5000, dTdz = (xm[isotherm_name(200)], xm[isotherm_name(5000)], xm[dTdz_name(0, 10000)])
+    assert z200.dims == ('latitude[°]', 'longitude[°]') and z200.shape == (5, 5)
+    assert np.isnan(z5000).all()
+
+    for lat, lon in ((40, -115), (40.5, -114.25), (41, -114)):
+        df = query_1D_vertical_profile(lat, lon, 0, 60000, 100, modelname, models[modelname], engine = engine)
+        T, z = df['temperature[°C]'].values, df['depth[m]'].values
+
+        # the temperature at the mapped isotherm depth, and the gradient between the two depths
+        z_iso = float(z200.sel({'latitude[°]': lat, 'longitude[°]': lon}))
+        assert abs(np.interp(z_iso, z, T) - 200) < 1e-3
+        grad = (np.interp(10000, z, T) - np.interp(0, z, T)) / 10
+        assert abs(float(dTdz.sel({'latitude[°]': lat, 'longitude[°]': lon})) - grad) < TOLERANCE
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+#
+#  test_result_cache.py
+#
+#  Result cache: keys of equal and changed requests (parameters, model file, surface layer), hits and misses,
+#  least-recently-used eviction, replacement of entries without partial results, entries removed by another
+#  process while they are read, and stored results read back without pickle as they were written.
+#  Run: python -m pytest tests/test_result_cache.py
+#
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyctm import ResultCache, QueryResult, query_1D_vertical_profile, query_2D_vertical_cross_section, set_surface_layer, SURFACE_LAYERS
+from pyctm import write_csv_output
+from pyctm.result_cache import cached_outputs, FRAME_FILE
+
+# write a text file
+def write_text(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+def read_text(path):
+    with open(path) as f:
+        return f.read()
+
+def test_keys(models, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    path = models['Lee_2026']
+    key = cache.key('Lee_2026', path, 'profile', {'lat': 40, 'zs': [0, 1000]}, 'csv')
+
+    # the same request written differently
+    assert cache.key('Lee_2026', path, 'profile', {'zs': np.array([0.0, 1000.0]), 'lat': 40.0}, 'csv') == key
+
+    # other parameters, output format, model name or model file
+    assert cache.key('Lee_2026', path, 'profile', {'lat': 41, 'zs': [0, 1000]}, 'csv') != key
+    assert cache.key('Lee_2026', path, 'profile', {'lat': 40, 'zs': [0, 1000]}, 'binary') != key
+    assert cache.key('Shinevar_2018', path, 'profile', {'lat': 40, 'zs': [0, 1000]}, 'csv') != key
+    stat = os.stat(path)
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    try:
+        assert cache.key('Lee_2026', path, 'profile', {'lat': 40, 'zs': [0, 1000]}, 'csv') != key
+    finally:
+        os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+
+def test_surface_layer_key(models, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    args = ('Boyd_2019', models['Boyd_2019'], 'profile', {'lat': 40}, 'csv')
+    key = cache.key(*args)
+    depth = SURFACE_LAYERS['Boyd_2019']
+    try:
+        set_surface_layer('Boyd_2019', 100.0)
+        assert cache.key(*args) != key
+        set_surface_layer('Boyd_2019', None)
+        assert cache.key(*args) != key
+    finally:
+        set_surface_layer('Boyd_2019', depth)
+    assert cache.key(*args) == key
+
+def test_hits_and_misses(models, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    calls = []
+    def query(**kwargs):
+        calls.append(kwargs)
+        return query_1D_vertical_profile(**kwargs)
+
+    params = dict(lat = 40, lon = -115, z_start = 0, z_end = 20000, z_step = 1000)
+    df1 = cache.query(query, 'Lee_2026', models['Lee_2026'], **params)
+    df2 = cache.query(query, 'Lee_2026', models['Lee_2026'], **params)
+    assert len(calls) == 1
+    assert np.array_equal(df1['temperature[°C]'], df2['temperature[°C]'])
+    cache.query(query, 'Lee_2026', models['Lee_2026'], **dict(params, z_end = 30000))
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+
+def test_cached_outputs(tmp_path):
+    directory = str(tmp_path / 'cache')
+    outpath = str(tmp_path / 'data.csv')
+    calls = []
+    def write():
+        calls.append(1)
+        write_text(outpath, 'result')
+
+    args = (directory, 'Lee_2026', write_text(tmp_path / 'model.nc', 'model'), 'profile', {'lat': 40}, {'dummy': outpath})
+    assert not cached_outputs(*args, write)
+    os.remove(outpath)
+    assert cached_outputs(*args, write)
+    assert read_text(outpath) == 'result' and len(calls) == 1
+
+def test_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes = 2500)
+    src = write_text(tmp_path / 'out.txt', 'x' * 1000)
+    for key in ('k1', 'k2'):
+        cache.put_files(key, {'out': src})
+    assert cache.get_files('k1', {'out': src})
+
+    # k2 is the least recently used; the entry just stored is kept even when larger than the limit
+    cache.put_files('k3', {'out': src})
+    assert cache.stats()['evictions'] == 1
+    assert cache.get_files('k1', {'out': src}) and not cache.get_files('k2', {'out': src})
+    big = write_text(tmp_path / 'big.txt', 'x' * 5000)
+    cache.put_files('k4', {'out': big})
+    assert cache.stats()['entries'] == 1 and cache.get_files('k4', {'out': big})
+
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.stats()['hits'] == 0
+
+def test_replacement(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    old = write_text(tmp_path / 'old.txt', 'old')
+    new = write_text(tmp_path / 'new.txt', 'new result')
+    cache.put_files('k1', {'out': old})
+
+    # a newer result for the key replaces the entry as a whole, with no temporary entry left behind
+    cache.put_files('k1', {'out': new, 'other': old})
+    out = str(tmp_path / 'out.txt')
+    assert cache.get_files('k1', {'out': out})
+    assert read_text(out) == 'new result'
+    assert os.listdir(os.path.join(cache.directory, 'tmp')) == []
+    assert cache.stats()['entries'] == 1
+
+    # a failed write leaves the stored entry as it was
+    def fail(tmp):
+        write_text(os.path.join(tmp, 'out'), 'partial')
+        raise OSError('disk full')
+    with pytest.raises(OSError):
+        cache._store('k1', fail)
+    assert cache.get_files('k1', {'out': out}) and read_text(out) == 'new result'
+    assert os.listdir(os.path.join(cache.directory, 'tmp')) == []
+
+def test_entry_removed_while_read(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    src = write_text(tmp_path / 'out.txt', 'result')
+    cache.put_files('k1', {'out': src})
+    cache.put_frame('k2', QueryResult({'a': [1.0]}))
+
+    # another process evicts the entry between the lookup and the copy
+    lookup = cache._lookup
+    def evicted(key, names):
+        path = lookup(key, names)
+        shutil.rmtree(path)
+        return path
+    monkeypatch.setattr(cache, '_lookup', evicted)
+    assert not cache.get_files('k1', {'out': str(tmp_path / 'copy.txt')})
+    assert cache.get_frame('k2') is None
+    assert not os.path.exists(tmp_path / 'copy.txt')
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (0, 2)
+
+def test_frame_round_trip(models, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    params = dict(lat_start = 40, lon_start = -115, lat_end = 41, lon_end = -113, z_start = 0, z_end = 20000, ntrack = 11,
+                  ndep = 11, dtype = 'float32')
+    df = query_2D_vertical_cross_section(modelname = 'Boyd_2019', modelpath = models['Boyd_2019'], **params)
+    key = cache.key('Boyd_2019', models['Boyd_2019'], 'xsection', params, 'columns')
+    cache.put_frame(key, df)
+    out = cache.get_frame(key)
+
+    # columns, grid and header statistics with their types
+    assert isinstance(out, QueryResult) and out.columns == df.columns
+    assert (out.dims, out.shape) == (df.dims, df.shape) and list(out.axes) == list(df.axes)
+    assert all(np.array_equal(out.data[name], df.data[name]) and out.data[name].dtype == df.data[name].dtype for name in df.columns)
+    assert all(np.array_equal(out.axes[name], df.axes[name]) for name in df.axes)
+    assert list(out.stats) == list(df.stats)
+    for name, val in df.stats.items():
+        assert np.array_equal(out.stats[name], val) and type(out.stats[name]) == type(val)
+
+    # the same CSV file
+    rename = {'longitude[°]': '# Lon', 'latitude[°]': 'Lat', 'depth[m]': 'Depth(m)', 'temperature[°C]': 'Temperature(°C)'}
+    for name, result in (('direct', df), ('cached', out)):
+        write_csv_output(result.rename(columns = rename), str(tmp_path / (name + '.csv')), '2D_vertical', 'Boyd_2019')
+    assert read_text(tmp_path / 'direct.csv') == read_text(tmp_path / 'cached.csv')
+
+    # the arrays are read without pickle
+    path = os.path.join(cache._path(key), FRAME_FILE)
+    with np.load(path, allow_pickle = False) as arrays:
+        assert all(arrays[name].dtype != object for name in arrays.files)
+
+def test_frame_objects(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    sites = np.array(['a', 'bb', 'c'], dtype = object)
+    result = QueryResult({'# Site': sites, 'Temperature(°C)': [1.0, 2.0, 3.0]}, stats = {'nsite': 3, 'T_max': np.float32(3)})
+    cache.put_frame('k1', result)
+    out = cache.get_frame('k1')
+    assert out.data['# Site'].dtype == object and list(out.data['# Site']) == list(sites)
+    assert out.stats == {'nsite': 3, 'T_max': 3} and type(out.stats['nsite']) is int and out.stats['T_max'].dtype == np.float32
+
+    # DataFrames are given back as DataFrames
+    frame = pd.DataFrame({'# Site': sites, 'Depth(m)': [0, 1000, 2000]})
+    cache.put_frame('k2', frame)
+    pd.testing.assert_frame_equal(cache.get_frame('k2'), frame)
+
+    with pytest.raises(ValueError, match = 'Undefined query result'):
+        cache.put_frame('k3', {'a': 1})
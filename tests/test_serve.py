@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#
+#  test_serve.py
+#
+#  Query server and batch runner from the package: a request must write the same files as the query script,
+#  invalid arguments must give the script's usage, message and exit code through the server and the client,
+#  and 'ctm batch' must run a manifest from any directory, in this process and on a process pool.
+#  Run: python -m pytest tests/test_serve.py
+#
+
+import json
+
+import pytest
+
+from pyctm.__main__ import main
+from pyctm.ctm_serve import run_request
+from pyctm import ctm_client
+
+PROFILE = ['--lat', '40', '--lon', '-115', '--z_start', '0', '--z_end', '20000', '--z_step', '1000']
+
+def read_text(path):
+    with open(path) as f:
+        return f.read()
+
+def test_request_output(models, tmp_path):
+    model = ['--modelname', 'Lee_2026', '--modelpath', models['Lee_2026']]
+    main(['profile'] + PROFILE + model + ['--outpath', str(tmp_path / 'direct.csv')])
+    response = run_request({'command': 'query_1d_depth_profile', 'argv': PROFILE + model + ['--outpath', str(tmp_path / 'served.csv')]})
+    assert response['status'] == 'ok'
+    assert read_text(tmp_path / 'direct.csv') == read_text(tmp_path / 'served.csv')
+
+def test_invalid_arguments(capsys, monkeypatch):
+    response = run_request({'command': 'query_0d_point', 'argv': ['--lat', 'x']})
+    assert response['status'] == 'error' and response['exit_code'] == 2
+    assert response['stderr'].startswith('usage: query_0d_point.py')
+    assert response['error'] == "query_0d_point.py: error: argument --lat: invalid float value: 'x'"
+    assert run_request({'command': 'point', 'argv': ['--help']})['stdout'].startswith('usage: ctm point')
+
+    # the client prints them and exits with the same code
+    monkeypatch.setattr(ctm_client, 'send_request', lambda request, *args: run_request(request))
+    with pytest.raises(SystemExit) as e:
+        ctm_client.call_func(['query_0d_point.py', '--lat', 'x'])
+    assert e.value.code == 2
+    assert capsys.readouterr().err == response['stderr']
+
+@pytest.mark.parametrize('workers', (0, 2))
+def test_batch(models, tmp_path, monkeypatch, workers):
+    manifest = str(tmp_path / 'jobs.jsonl')
+    with open(manifest, 'w') as f:
+        for k, name in enumerate(('Lee_2026', 'Boyd_2019')):
+            args = {'lat': 40, 'lon': -115, 'z': 1000 * (k + 1), 'modelname': name, 'modelpath': models[name],
+                    'outpath': str(tmp_path / (name + '.json'))}
+            f.write(json.dumps({'id': name, 'command': 'point', 'args': args}) + '\n')
+        f.write(json.dumps({'id': 'bad', 'command': 'point', 'argv': ['--lat', 'x']}) + '\n')
+
+    # from another directory than ctm_plotting
+    monkeypatch.chdir(tmp_path)
+    assert main(['batch', '--manifest', manifest, '--workers', str(workers)]) == 1
+    with open(str(tmp_path / 'jobs.report.jsonl')) as f:
+        records = {rec['id']: rec for rec in map(json.loads, f)}
+    assert records['Lee_2026']['status'] == records['Boyd_2019']['status'] == 'ok'
+    assert records['bad']['status'] == 'error' and 'invalid float value' in records['bad']['error']
+    assert (tmp_path / 'Lee_2026.json').exists() and (tmp_path / 'Boyd_2019.json').exists()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#
+#  test_shared_model.py
+#
+#  Shared-memory models: queries of pool workers on an attached model must equal the queries on the model file,
+#  the block must stay while workers are attached after the loader closed it and be removed when the last one
+#  releases it, also after a pool whose workers were terminated (a plain 'with Pool(...)'), without resource
+#  tracker warnings, and attached handles must report the surface layer the loader shared.
+#  Run: python -m pytest tests/test_shared_model.py
+#
+
+import multiprocessing
+import os
+import subprocess
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+# repository root, on the import path of the processes started by the tests
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+from pyctm import share_model, attach_shared_model, query_0D_points, AttachedCTM, get_model
+from pyctm.result_cache import model_config
+
+MODELS = ('Lee_2026', 'Boyd_2019')
+
+# random points inside the synthetic models, down from the surface
+def random_points(n = 500):
+    rng = np.random.default_rng(0)
+    return rng.uniform(31, 44, n), rng.uniform(-124, -111, n), rng.uniform(0, 50000, n)
+
+# query in a worker process on its attached model
+def worker_query(args):
+    info, engine = args
+    model = attach_shared_model(info)
+    lats, lons, deps = random_points()
+    return query_0D_points(lats, lons, deps, info.modelname, model, engine = engine)['temperature[°C]'].values
+
+# whether a shared memory block still exists
+def block_exists(name):
+    try:
+        shm = shared_memory.SharedMemory(name = name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+@pytest.mark.parametrize('modelname', MODELS)
+def test_worker_queries(models, modelname):
+    lats, lons, deps = random_points()
+    shared = share_model(modelname, models[modelname])
+    try:
+        with multiprocessing.get_context('spawn').Pool(2, initializer = attach_shared_model, initargs = (shared.info,)) as pool:
+            results = pool.map(worker_query, [(shared.info, 'xarray'), (shared.info, 'fast')])
+            pool.close()
+            pool.join()
+    finally:
+        shared.close()
+    assert not block_exists(shared.info.shmname)
+
+    ref = query_0D_points(lats, lons, deps, modelname, models[modelname])['temperature[°C]'].values
+    for temps in results:
+        assert np.abs(temps - ref).max() < 1e-9
+
+# worker holding the block: attaches, waits until the loader has closed it, then queries and releases it
+def worker_hold(info, ready, done, out):
+    model = attach_shared_model(info)
+    ready.set()
+    done.wait(60)
+    lats, lons, deps = random_points()
+    out.put(query_0D_points(lats, lons, deps, info.modelname, model)['temperature[°C]'].values)
+
+def test_release_after_workers(models):
+    shared = share_model('Lee_2026', models['Lee_2026'])
+
+    # in this process: the attached handle keeps the block
+    attached = AttachedCTM(shared.info)
+    shared.close()
+    assert block_exists(shared.info.shmname)
+    assert np.isfinite(attached.xdata['temperature[°C]'].values).all()
+    attached.close()
+    assert not block_exists(shared.info.shmname)
+
+    # in a worker process
+    shared = share_model('Lee_2026', models['Lee_2026'])
+    ctx = multiprocessing.get_context('spawn')
+    ready, done, out = ctx.Event(), ctx.Event(), ctx.Queue()
+    proc = ctx.Process(target = worker_hold, args = (shared.info, ready, done, out))
+    proc.start()
+    try:
+        assert ready.wait(60)
+        shared.close()
+        assert block_exists(shared.info.shmname)
+        done.set()
+        temps = out.get(timeout = 60)
+    finally:
+        done.set()
+        proc.join(60)
+    assert proc.exitcode == 0
+    assert not block_exists(shared.info.shmname)
+    lats, lons, deps = random_points()
+    assert np.abs(temps - query_0D_points(lats, lons, deps, 'Lee_2026', models['Lee_2026'])['temperature[°C]'].values).max() < 1e-9
+
+def test_forced_close(models):
+    shared = share_model('Lee_2026', models['Lee_2026'])
+    attached = AttachedCTM(shared.info)
+    shared.close(force = True)
+    assert not block_exists(shared.info.shmname)
+    attached.close()
+
+@pytest.mark.parametrize('surface', (None, False, True))
+def test_surface(models, surface):
+    with share_model('Boyd_2019', models['Boyd_2019'], surface) as shared:
+        with AttachedCTM(shared.info) as attached:
+            handle = get_model('Boyd_2019', models['Boyd_2019'])
+            if surface is None:
+                assert attached.model.surface == handle.surface == 0.0
+                assert model_config('Boyd_2019', attached.model) == model_config('Boyd_2019', handle)
+            else:
+                assert attached.model.surface == (0.0 if surface else None)
+            assert float(attached.xdata['depth[m]'].min()) == (500.0 if surface is False else 0.0)
+
+# loader run in a new process, so its resource tracker reports what it leaks when the process exits
+TERMINATE = """
+import multiprocessing, sys
+sys.path.insert(0, {root!r})
+from pyctm import share_model, attach_shared_model
+from multiprocessing import shared_memory
+
+if __name__ == '__main__':
+    shared = share_model('Lee_2026', {path!r})
+    with multiprocessing.Pool(2, initializer = attach_shared_model, initargs = (shared.info,)) as pool:
+        pool.map(abs, range(4))
+    shared.close()
+    try:
+        shared_memory.SharedMemory(name = shared.info.shmname)
+        print('leaked')
+    except FileNotFoundError:
+        print('removed')
+"""
+
+@pytest.mark.parametrize('method', ('fork', 'spawn'))
+def test_cleanup_after_terminate(models, tmp_path, method):
+    script = str(tmp_path / 'terminate.py')
+    with open(script, 'w') as f:
+        f.write(TERMINATE.format(root = ROOT, path = models['Lee_2026']).replace(
+                "multiprocessing.Pool(", "multiprocessing.get_context({!r}).Pool(".format(method)))
+    out = subprocess.run([sys.executable, script], capture_output = True, text = True, timeout = 120)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == 'removed'
+    assert 'resource_tracker' not in out.stderr and 'leaked' not in out.stderr